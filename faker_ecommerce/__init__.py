@@ -9,7 +9,8 @@ __version__ = "0.1.0"
 __author__ = "faker-ecommerce"
 
 from .config import BATCH_SIZE
+from .schema import TABLE_SCHEMAS
 from .writers import DataWriter
 
-__all__ = ["DataWriter", "BATCH_SIZE"]
+__all__ = ["DataWriter", "BATCH_SIZE", "TABLE_SCHEMAS"]
 
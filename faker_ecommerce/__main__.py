@@ -4,32 +4,18 @@ Main entry point for the faker_ecommerce package.
 Run with: uv run -m faker_ecommerce [options]
 """
 
-import random
+import os
+import sys
+import time
 
-import numpy as np
-from faker import Faker
 from sqlalchemy import create_engine
 
 from . import config
+from .checkpoint import RUN_MANIFEST, RunCheckpoint
 from .cli import parse_args, apply_presets, get_password
+from .manifest import write_shard_manifest
+from .pipeline import default_params, run_pipeline, run_table_slice, shard_rows
 from .writers import DataWriter
-from .generators import (
-    generate_categories,
-    generate_brands,
-    generate_warehouses,
-    generate_coupons,
-    generate_customers,
-    generate_addresses,
-    generate_products,
-    generate_product_images,
-    generate_inventory,
-    generate_orders_with_items,
-    generate_payments,
-    generate_shipments,
-    generate_reviews,
-    generate_wishlists,
-    generate_coupon_usage,
-)
 
 
 def main():
@@ -44,106 +30,100 @@ def main():
     # Get password if needed
     password = get_password(args)
     
-    # Initialize random seeds for reproducibility
-    fake = Faker()
-    Faker.seed(42)
-    random.seed(42)
-    np.random.seed(42)
-    
     # Determine output type
     output_type = 'postgres' if args.username else 'parquet'
     
+    # A full run or shard records its progress in a run manifest; a resumed run continues from it with the
+    # seed and parameters it was started with
+    params = default_params(args)
+    if args.shard:
+        params['rows'] = shard_rows(params, *args.shard)
+    checkpoint = None
+    if not args.table:
+        checkpoint_dir = args.checkpoint_dir or args.parquet_dir or os.path.join(
+            '.faker_ecommerce', f'{args.host}-{args.port}-{args.database}'
+        )
+        target = os.path.abspath(args.parquet_dir) if args.parquet_dir else f'{args.host}:{args.port}/{args.database}'
+        output = {
+            'output': output_type,
+            'target': target,
+            'shard': list(args.shard) if args.shard else None,
+            'pg_enums': args.pg_enums,
+            'batch_size': config.BATCH_SIZE,
+            'partition_by': args.partition_by,
+            'parquet_options': repr(args.parquet_options),
+            'table_parquet_options': repr(sorted(args.table_parquet_options.items())),
+        }
+        if args.resume:
+            try:
+                checkpoint = RunCheckpoint.resume(checkpoint_dir, output)
+            except ValueError as error:
+                sys.exit(f"error: {error}")
+            args.seed = checkpoint.seed
+            params = checkpoint.params
+        else:
+            checkpoint = RunCheckpoint.start(checkpoint_dir, args.seed, params, output)
+    
     print(f"\n🚀 Starting data generation (batch size: {config.BATCH_SIZE:,})...")
     print(f"   Output: {output_type.upper()}")
+    print(f"   Seed: {args.seed}, workers: {args.workers}")
+    if args.table:
+        print(f"   Slice: {args.table} rows {args.rows[0]:,}:{args.rows[1]:,}")
+    if args.shard:
+        print(f"   Shard: {args.shard[0]} of {args.shard[1]}")
+    if checkpoint is not None:
+        print(f"   {'Resuming' if args.resume else 'Checkpoint'}: {os.path.join(checkpoint.directory, RUN_MANIFEST)}")
     print("=" * 60)
     
     # Create writer
     if output_type == 'postgres':
         db_connection_str = f'postgresql+psycopg2://{args.username}:{password}@{args.host}:{args.port}/{args.database}'
         engine = create_engine(db_connection_str)
-        writer = DataWriter('postgres', engine=engine)
+        # A full load creates bare UNLOGGED tables and builds keys and indexes afterwards; a slice appends
+        # to tables that already have them
+        writer = DataWriter(
+            'postgres', engine=engine, pg_enums=args.pg_enums, writer_threads=args.writer_threads,
+            pg_staging=not args.table, pg_connections=args.pg_connections
+        )
     else:
-        writer = DataWriter('parquet', parquet_dir=args.parquet_dir)
+        writer = DataWriter(
+            'parquet', parquet_dir=args.parquet_dir, writer_threads=args.writer_threads,
+            partition_by=args.partition_by, partition_file_size=args.partition_file_size * 2**20,
+            parquet_options=args.parquet_options, table_parquet_options=args.table_parquet_options
+        )
         print(f"   Parquet directory: {args.parquet_dir}")
-    
-    row_counts = {}
-    
-    # 1. Categories
-    print("  Categories: generating...")
-    categories_df = generate_categories(writer)
-    row_counts['categories'] = len(categories_df)
-    print(f"  ✓ Categories: {len(categories_df)} rows")
-    
-    # 2. Brands
-    print("  Brands: generating...")
-    brands_df = generate_brands(writer)
-    row_counts['brands'] = len(brands_df)
-    print(f"  ✓ Brands: {len(brands_df)} rows")
-    
-    # 3. Warehouses
-    print("  Warehouses: generating...")
-    warehouses_df = generate_warehouses(writer)
-    row_counts['warehouses'] = len(warehouses_df)
-    print(f"  ✓ Warehouses: {len(warehouses_df)} rows")
-    
-    # 4. Coupons
-    print("  Coupons: generating...")
-    coupons_df = generate_coupons(args.coupons, writer, fake)
-    row_counts['coupons'] = len(coupons_df)
-    print(f"  ✓ Coupons: {len(coupons_df)} rows")
-    
-    # 5. Customers
-    customer_ids = generate_customers(args.customers, writer, fake)
-    row_counts['customers'] = len(customer_ids)
-    
-    # 6. Addresses
-    max_address_id = generate_addresses(customer_ids, writer, fake)
-    row_counts['addresses'] = max_address_id
-    
-    # 7. Products
-    product_ids, product_prices = generate_products(
-        args.products, categories_df, brands_df, writer, fake
-    )
-    row_counts['products'] = len(product_ids)
-    
-    # 8. Product Images
-    img_count = generate_product_images(product_ids, writer, fake)
-    row_counts['product_images'] = img_count
-    
-    # 9. Inventory
-    inv_count = generate_inventory(product_ids, writer, fake)
-    row_counts['inventory'] = inv_count
-    
-    # 10 & 11. Orders and Order Items
-    coupon_ids = coupons_df['coupon_id'].tolist() if len(coupons_df) > 0 else []
-    orders_data, orders_written, items_written = generate_orders_with_items(
-        args.orders, customer_ids, max_address_id, coupon_ids,
-        product_ids, product_prices, coupons_df, writer, fake
-    )
-    row_counts['orders'] = orders_written
-    row_counts['order_items'] = items_written
-    
-    # 12. Payments
-    pay_count = generate_payments(orders_data, writer, fake)
-    row_counts['payments'] = pay_count
-    
-    # 13. Shipments
-    ship_count = generate_shipments(orders_data, writer, fake)
-    row_counts['shipments'] = ship_count
-    
-    # 14. Reviews
-    review_count = generate_reviews(args.reviews, customer_ids, product_ids, writer, fake)
-    row_counts['product_reviews'] = review_count
-    
-    # 15. Wishlists
-    wish_count = generate_wishlists(args.wishlists, customer_ids, product_ids, writer, fake)
-    row_counts['wishlists'] = wish_count
-    
-    # 16. Coupon Usage
-    print("  Coupon Usage: generating...")
-    usage_count = generate_coupon_usage(orders_data, writer)
-    row_counts['coupon_usage'] = usage_count
-    print(f"  ✓ Coupon Usage: {usage_count} rows")
+        if args.partition_by:
+            print(f"   Partitioned by: {args.partition_by}")
+    
+    # Generate all tables, one table's row slice, or one shard; every table is seeded from the master seed
+    # A failed run publishes no Parquet file it was still writing
+    start_time = time.perf_counter()
+    try:
+        if args.table:
+            start, stop = args.rows
+            row_counts = run_table_slice(params, writer, args.seed, args.table, start, stop)
+        else:
+            row_counts = run_pipeline(params, writer, args.seed, workers=args.workers, checkpoint=checkpoint)
+    except BaseException:
+        writer.abort()
+        raise
+    
+    # Wait for queued batches to be written, then close any open output files
+    writer.close()
+    phase_stats = {'generate + load': time.perf_counter() - start_time}
+    
+    # Build keys, constraints and indexes once every PostgreSQL table is loaded
+    if writer.pg_staging and not checkpoint.finished:
+        print(f"\n   Building PostgreSQL keys and indexes ({args.pg_jobs} connections)...")
+        phase_stats.update(writer.finish_tables(row_counts, jobs=args.pg_jobs))
+        checkpoint.record_finished()
+    
+    if args.shard:
+        manifest_path = write_shard_manifest(args.parquet_dir, params, args.seed, *args.shard, row_counts)
+        print(f"\n   Shard manifest: {manifest_path}")
+    # Nothing is left to resume, and the checkpoint would sit next to the Parquet tables
+    if checkpoint is not None:
+        checkpoint.remove()
     
     # Summary
     print("\n" + "=" * 60)
@@ -157,6 +137,22 @@ def main():
     print("\n   Row counts per table:")
     for table, count in row_counts.items():
         print(f"     {table}: {count:,}")
+    
+    if writer.load_stats:
+        print("\n   PostgreSQL load throughput:")
+        for table, (rows, seconds) in writer.load_stats.items():
+            rate = rows / seconds if seconds > 0 else 0.0
+            print(f"     {table}: {rows:,} rows in {seconds:.2f}s ({rate:,.0f} rows/sec)")
+        
+        print("\n   PostgreSQL load throughput per connection:")
+        for connection, (rows, seconds) in sorted(writer.connection_stats.items()):
+            rate = rows / seconds if seconds > 0 else 0.0
+            print(f"     {connection}: {rows:,} rows in {seconds:.2f}s ({rate:,.0f} rows/sec)")
+    
+    if writer.pg_staging:
+        print("\n   PostgreSQL phases:")
+        for phase, seconds in phase_stats.items():
+            print(f"     {phase}: {seconds:.2f}s")
 
 
 if __name__ == "__main__":
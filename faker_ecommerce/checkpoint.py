@@ -0,0 +1,223 @@
+"""
+Run manifests for resuming interrupted runs.
+
+A full run records its seed, its parameters and its progress in a manifest
+in the checkpoint directory: every finished task with its row counts, and
+every finished order shard. The results later tasks need from a finished
+task (ID spaces, prices, reference tables) are pickled next to it. A run
+started with --resume reads the manifest, skips what is finished and
+generates the rest from the same seeds, so the output is the same as that
+of an uninterrupted run. Both are deleted once the run completes.
+
+Work is only recorded once its rows are committed: Parquet files are
+written under a temporary name and renamed when complete, and PostgreSQL
+batches are committed one COPY at a time. The manifest itself is replaced
+atomically, so a crash leaves either the old or the new one.
+"""
+
+import json
+import os
+import pickle
+import shutil
+from datetime import datetime
+from typing import Any, Dict, Tuple
+
+RUN_MANIFEST = '_run.json'
+RUN_MANIFEST_VERSION = 1
+
+# Subdirectory of the checkpoint directory holding the pickled task results
+RESULTS_DIR = '_run'
+
+
+def temporary_path(path: str) -> str:
+    """
+    Return the hidden name a file is written under until it is complete.
+    Query engines skip files starting with a dot, so they never read a
+    partly written file.
+    """
+    directory, name = os.path.split(path)
+    return os.path.join(directory, f'.{name}.tmp')
+
+
+def _replace_atomically(path: str, data: bytes):
+    """Write a file under its temporary name, sync it and rename it into place."""
+    tmp_path = temporary_path(path)
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _encode_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    encoded = dict(params, as_of=params['as_of'].isoformat())
+    if 'rows' in params:
+        encoded['rows'] = {name: list(rows) for name, rows in params['rows'].items()}
+    return encoded
+
+
+def _decode_params(encoded: Dict[str, Any]) -> Dict[str, Any]:
+    params = dict(encoded, as_of=datetime.fromisoformat(encoded['as_of']))
+    if 'rows' in encoded:
+        params['rows'] = {name: tuple(rows) for name, rows in encoded['rows'].items()}
+    return params
+
+
+class RunCheckpoint:
+    """Progress of a run, kept in its manifest as work finishes."""
+
+    def __init__(self, directory: str, manifest: Dict[str, Any]):
+        """
+        Initialize a checkpoint; use RunCheckpoint.start or RunCheckpoint.resume instead.
+
+        Args:
+            directory: Directory of the manifest and task results
+            manifest: Contents of the manifest
+        """
+        self.directory = directory
+        self.manifest = manifest
+
+    @classmethod
+    def start(
+        cls,
+        directory: str,
+        master_seed: int,
+        params: Dict[str, Any],
+        output: Dict[str, Any]
+    ) -> 'RunCheckpoint':
+        """
+        Start the manifest of a new run, replacing the manifest and task
+        results of an earlier run in the directory.
+
+        Args:
+            directory: Checkpoint directory
+            master_seed: Master seed of the run
+            params: Pipeline parameters of the run
+            output: Output settings that a resumed run must repeat
+        """
+        os.makedirs(os.path.join(directory, RESULTS_DIR), exist_ok=True)
+        for name in os.listdir(os.path.join(directory, RESULTS_DIR)):
+            os.remove(os.path.join(directory, RESULTS_DIR, name))
+
+        checkpoint = cls(directory, {
+            'version': RUN_MANIFEST_VERSION,
+            'seed': master_seed,
+            'params': _encode_params(params),
+            'output': output,
+            'tasks': {},
+            'order_shards': {},
+            'finished': False,
+        })
+        checkpoint._save()
+        return checkpoint
+
+    @classmethod
+    def resume(cls, directory: str, output: Dict[str, Any]) -> 'RunCheckpoint':
+        """
+        Read the manifest of an interrupted run.
+
+        Args:
+            directory: Checkpoint directory
+            output: Output settings of the resumed run, which must match the
+                interrupted run's
+
+        Raises:
+            ValueError: If there is no manifest or the output settings differ
+        """
+        path = os.path.join(directory, RUN_MANIFEST)
+        if not os.path.exists(path):
+            raise ValueError(f"No {RUN_MANIFEST} in '{directory}'; there is no run to resume")
+        with open(path) as f:
+            manifest = json.load(f)
+        if manifest.get('version') != RUN_MANIFEST_VERSION:
+            raise ValueError(f"Unsupported run manifest version in '{directory}': {manifest.get('version')}")
+
+        for key, value in output.items():
+            if manifest['output'].get(key) != value:
+                raise ValueError(
+                    f"The run in '{directory}' was started with {key} {manifest['output'].get(key)!r}, "
+                    f"not {value!r}"
+                )
+        return cls(directory, manifest)
+
+    @property
+    def seed(self) -> int:
+        """Master seed of the run."""
+        return self.manifest['seed']
+
+    @property
+    def params(self) -> Dict[str, Any]:
+        """Pipeline parameters of the run."""
+        return _decode_params(self.manifest['params'])
+
+    def task_done(self, name: str) -> bool:
+        """Whether a task has finished."""
+        return name in self.manifest['tasks']
+
+    def task(self, name: str) -> Tuple[Any, Dict[str, int]]:
+        """Return the result and row counts of a finished task."""
+        with open(self._result_path(name), 'rb') as f:
+            result = pickle.load(f)
+        return result, self.manifest['tasks'][name]
+
+    def record_task(self, name: str, result: Any, row_counts: Dict[str, int]):
+        """Record a task whose rows are all committed, with its result."""
+        _replace_atomically(self._result_path(name), pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))
+        self.manifest['tasks'][name] = dict(row_counts)
+        self._save()
+
+    def forget_task(self, name: str):
+        """Forget a finished task, so that it is run again."""
+        del self.manifest['tasks'][name]
+        self._save()
+
+    def order_shards(self) -> Dict[int, Dict[str, int]]:
+        """Return the row counts of every finished order shard."""
+        return {int(index): counts for index, counts in self.manifest['order_shards'].items()}
+
+    def record_order_shard(self, index: int, row_counts: Dict[str, int]):
+        """Record an order shard whose rows are all committed."""
+        self.manifest['order_shards'][str(index)] = dict(row_counts)
+        self._save()
+
+    def forget_order_shards(self):
+        """Forget every finished order shard, so that all are generated again."""
+        self.manifest['order_shards'] = {}
+        self._save()
+
+    def forget_order_shard(self, index: int):
+        """Forget a finished order shard, so that it is generated again."""
+        if self.manifest['order_shards'].pop(str(index), None) is not None:
+            self._save()
+
+    @property
+    def finished(self) -> bool:
+        """Whether the PostgreSQL keys and indexes have been built."""
+        return self.manifest['finished']
+
+    def record_finished(self):
+        """Record that the PostgreSQL keys and indexes have been built."""
+        self.manifest['finished'] = True
+        self._save()
+
+    def remove(self):
+        """
+        Delete the manifest and task results of a completed run, and the
+        checkpoint directory if nothing else is left in it.
+        """
+        shutil.rmtree(os.path.join(self.directory, RESULTS_DIR), ignore_errors=True)
+        manifest_path = os.path.join(self.directory, RUN_MANIFEST)
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+        try:
+            os.rmdir(self.directory)
+        except OSError:
+            pass  # The directory holds other files, e.g. the Parquet output
+
+    def _result_path(self, name: str) -> str:
+        return os.path.join(self.directory, RESULTS_DIR, f'{name}.pickle')
+
+    def _save(self):
+        data = json.dumps(self.manifest, indent=2).encode()
+        _replace_atomically(os.path.join(self.directory, RUN_MANIFEST), data)
+
@@ -6,6 +6,9 @@ import argparse
 import getpass
 
 from . import config
+from .parquet_options import CODECS, ParquetOptions, check_options, parse_columns, parse_table_options
+from .partitioning import PARTITION_SCHEMES
+from .pipeline import SLICE_TABLES
 
 
 def parse_args():
@@ -47,6 +50,42 @@ def parse_args():
         help=f"Batch size for writes (default: {config.BATCH_SIZE:,})"
     )
     
+    # Generation options
+    generation_group = parser.add_argument_group('Generation options')
+    generation_group.add_argument(
+        "--seed", type=int, default=42,
+        help="Master random seed; each table derives its own seed from it (default: 42)"
+    )
+    generation_group.add_argument(
+        "--workers", type=int, default=1,
+        help="Number of worker processes generating tables in parallel (default: 1)"
+    )
+    generation_group.add_argument(
+        "--writer-threads", type=int, default=0,
+        help="Background threads writing batches while generation continues (default: 0, write inline)"
+    )
+    generation_group.add_argument(
+        "--table", type=str, choices=sorted(SLICE_TABLES),
+        help="Generate only the --rows slice of this table (and the rows derived from it)"
+    )
+    generation_group.add_argument(
+        "--rows", type=str, metavar="START:STOP",
+        help="Rows of --table to generate, 0-based and end-exclusive (e.g. 30000000:31000000)"
+    )
+    generation_group.add_argument(
+        "--shard", type=str, metavar="I/N",
+        help="Generate shard I of N (0-based) for multi-machine runs; Parquet output only"
+    )
+    generation_group.add_argument(
+        "--resume", action="store_true",
+        help="Resume an interrupted run from its checkpoint, with the seed and sizes it was started with"
+    )
+    generation_group.add_argument(
+        "--checkpoint-dir", type=str, metavar="DIR",
+        help="Directory of the run manifest (default: the Parquet directory, or "
+             ".faker_ecommerce/HOST-PORT-DATABASE for PostgreSQL)"
+    )
+
     # Output options
     output_group = parser.add_argument_group('Output options (choose one)')
     output_group.add_argument(
@@ -65,10 +104,69 @@ def parse_args():
         "--database", type=str,
         help="PostgreSQL database name"
     )
+    output_group.add_argument(
+        "--pg-enums", action="store_true",
+        help="Declare low-cardinality columns as PostgreSQL enum types instead of TEXT"
+    )
+    output_group.add_argument(
+        "--pg-connections", type=int, default=0,
+        help="Connections loading PostgreSQL tables concurrently, each from a writer thread "
+             "(default: 0, one per --writer-threads)"
+    )
+    output_group.add_argument(
+        "--pg-jobs", type=int, default=4,
+        help="Connections building PostgreSQL keys and indexes after the load (default: 4)"
+    )
     output_group.add_argument(
         "--parquet-dir", type=str,
         help="Directory for Parquet output (enables Parquet output)"
     )
+    output_group.add_argument(
+        "--partition-by", type=str, choices=PARTITION_SCHEMES,
+        help="Write orders, order items, payments, shipments, reviews and coupon usage as Hive-partitioned "
+             "Parquet datasets, split by month or by customer hash bucket"
+    )
+    output_group.add_argument(
+        "--partition-file-size", type=int, default=config.PARTITION_FILE_SIZE // 2**20, metavar="MB",
+        help=f"Target size of a partitioned dataset's files in MB (default: {config.PARTITION_FILE_SIZE // 2**20})"
+    )
+    
+    # Parquet encoding options
+    parquet_group = parser.add_argument_group('Parquet encoding options')
+    parquet_group.add_argument(
+        "--parquet-codec", type=str, choices=CODECS, default='snappy',
+        help="Compression codec (default: snappy)"
+    )
+    parquet_group.add_argument(
+        "--parquet-level", type=int,
+        help="Compression level of zstd or lz4 (default: the codec's own)"
+    )
+    parquet_group.add_argument(
+        "--row-group-rows", type=int,
+        help="Target rows per row group (default: one row group per --batch-size batch)"
+    )
+    parquet_group.add_argument(
+        "--row-group-mb", type=int,
+        help="Target uncompressed size of a row group in MB"
+    )
+    parquet_group.add_argument(
+        "--parquet-dictionary", type=str, default='all', metavar="all|none|COL+COL",
+        help="Columns to dictionary-encode (default: all)"
+    )
+    parquet_group.add_argument(
+        "--parquet-statistics", type=str, default='all', metavar="all|none|COL+COL",
+        help="Columns to write min/max statistics for (default: all)"
+    )
+    parquet_group.add_argument(
+        "--parquet-page-index", action="store_true",
+        help="Write page indexes with per-page statistics"
+    )
+    parquet_group.add_argument(
+        "--parquet-table", type=str, action="append", default=[], metavar="TABLE:KEY=VALUE,...",
+        help="Settings of one table, e.g. orders:codec=zstd,level=9,row_group_rows=100000,sort=customer_id; "
+             "keys: codec, level, row_group_rows, row_group_mb, dictionary, statistics, page_index, sort "
+             "(repeatable)"
+    )
     
     # Presets
     preset_group = parser.add_argument_group('Size presets')
@@ -87,6 +185,45 @@ def parse_args():
 
     args = parser.parse_args()
     
+    if args.workers < 1:
+        parser.error("--workers must be at least 1.")
+    if args.writer_threads < 0:
+        parser.error("--writer-threads must not be negative.")
+    if args.pg_connections < 0:
+        parser.error("--pg-connections must not be negative.")
+    if args.pg_jobs < 1:
+        parser.error("--pg-jobs must be at least 1.")
+    
+    # Validate row slice options
+    if bool(args.table) != bool(args.rows):
+        parser.error("--table and --rows must be used together.")
+    if args.rows:
+        try:
+            start, stop = (int(bound) for bound in args.rows.split(':'))
+        except ValueError:
+            parser.error("--rows must be given as START:STOP, e.g. 0:1000000.")
+        if not 0 <= start < stop:
+            parser.error("--rows must satisfy 0 <= START < STOP.")
+        args.rows = (start, stop)
+    if args.resume and args.table:
+        parser.error("--resume cannot be combined with --table.")
+
+    # Validate shard options
+    if args.shard:
+        try:
+            index, count = (int(part) for part in args.shard.split('/'))
+        except ValueError:
+            parser.error("--shard must be given as I/N, e.g. 0/4.")
+        if not 0 <= index < count:
+            parser.error("--shard must satisfy 0 <= I < N.")
+        if args.table:
+            parser.error("--shard cannot be combined with --table.")
+        if not args.parquet_dir:
+            parser.error("--shard requires Parquet output (--parquet-dir).")
+        if args.partition_by:
+            parser.error("--shard cannot be combined with --partition-by.")
+        args.shard = (index, count)
+
     # Validate output options
     if args.username and args.parquet_dir:
         parser.error("Please choose either --username (PostgreSQL) or --parquet-dir (Parquet), not both.")
@@ -95,6 +232,31 @@ def parse_args():
             parser.error("--database is required when using PostgreSQL output.")
     elif not args.parquet_dir:
         parser.error("Please specify an output: --username for PostgreSQL or --parquet-dir for Parquet files.")
+    if args.partition_by and not args.parquet_dir:
+        parser.error("--partition-by requires Parquet output (--parquet-dir).")
+    if args.partition_file_size < 1:
+        parser.error("--partition-file-size must be at least 1 MB.")
+    
+    # Validate Parquet encoding options
+    for option in ('row_group_rows', 'row_group_mb'):
+        if getattr(args, option) is not None and getattr(args, option) < 1:
+            parser.error(f"--{option.replace('_', '-')} must be at least 1.")
+    args.parquet_options = ParquetOptions(
+        codec=args.parquet_codec,
+        level=args.parquet_level,
+        row_group_rows=args.row_group_rows,
+        row_group_bytes=args.row_group_mb * 2**20 if args.row_group_mb else None,
+        dictionary=parse_columns(args.parquet_dictionary),
+        statistics=parse_columns(args.parquet_statistics),
+        page_index=args.parquet_page_index
+    )
+    try:
+        check_options(args.parquet_options)
+        args.table_parquet_options = dict(
+            parse_table_options(spec, args.parquet_options) for spec in args.parquet_table
+        )
+    except ValueError as error:
+        parser.error(f"Invalid Parquet options: {error}")
     
     return args
 
@@ -5,6 +5,58 @@ Configuration constants for the faker_postgres package.
 # Default batch size for database inserts
 BATCH_SIZE = 10000
 
+# Show per-table progress bars (disabled in worker processes)
+SHOW_PROGRESS = True
+
+# Orders per shard; orders are generated shard by shard, each from its own
+# seed, so the output does not depend on how many workers run the shards
+ORDER_SHARD_SIZE = 100000
+
+# Rows per counter-based random block; the values of a row depend only on the
+# seed, its table and its block, so any row range can be generated directly
+ROW_BLOCK_SIZE = 10000
+
+# Batches each background writer thread holds queued before generation
+# waits for it; caps the memory of batches not yet written
+WRITE_QUEUE_SIZE = 4
+
+# Tables written as Hive-partitioned Parquet datasets with --partition-by,
+# and the date column each is split by month; order items have none and
+# follow their orders, as do the tables without a customer_id when split by
+# customer
+PARTITIONED_TABLES = {
+    'orders': 'order_date',
+    'order_items': None,
+    'payments': 'payment_date',
+    'shipments': 'shipped_date',
+    'product_reviews': 'review_date',
+    'coupon_usage': 'used_at',
+}
+
+# Hash buckets of --partition-by customer
+PARTITION_BUCKETS = 16
+
+# Target size of a file in a partitioned dataset, in bytes
+PARTITION_FILE_SIZE = 128 * 1024 * 1024
+
+# Batches of a partitioned table held back at most to fill row groups of
+# BATCH_SIZE rows per partition; bounds memory however many partitions
+PARTITION_BUFFER_BATCHES = 32
+
+# Large PostgreSQL tables whose batches are COPY'd in parallel over all
+# writer threads' connections instead of in order by one of them
+POSTGRES_CHUNKED_TABLES = ['orders', 'order_items', 'payments', 'shipments', 'product_reviews']
+
+# Memory each PostgreSQL connection may use to build an index or validate a
+# foreign key after the load
+POSTGRES_MAINTENANCE_WORK_MEM = '256MB'
+
+# Values drawn at most from a Faker provider to build its value pool (no
+# more than the table has rows); rows sample from the distinct values
+# instead of calling Faker once per row. Only low-cardinality fields are
+# pooled; see pools.py
+VALUE_POOL_SIZE = 10000
+
 # Real-world brand data organized by category
 CATEGORY_BRANDS = {
     'Electronics': {
@@ -143,6 +195,16 @@ NEGATIVE_PHRASES = [
     "Had issues from the start.", "Returning this product."
 ]
 
+# Order status, size and shipping distributions
+ORDER_STATUSES = ['pending', 'processing', 'shipped', 'delivered', 'cancelled', 'returned']
+ORDER_STATUS_WEIGHTS = [5, 10, 15, 60, 5, 5]
+ITEMS_PER_ORDER = [1, 2, 3, 4, 5]
+ITEMS_PER_ORDER_WEIGHTS = [30, 30, 20, 12, 8]
+ITEM_QUANTITIES = [1, 2, 3, 4, 5]
+ITEM_QUANTITY_WEIGHTS = [50, 25, 15, 7, 3]
+ITEM_DISCOUNT_RATES = [0.05, 0.10, 0.15, 0.20]
+SHIPPING_COSTS = [0, 4.99, 7.99, 9.99, 14.99]
+
 # Payment methods and card types
 PAYMENT_METHODS = ['credit_card', 'debit_card', 'paypal', 'apple_pay', 'google_pay', 'bank_transfer', 'gift_card']
 PAYMENT_METHOD_WEIGHTS = [35, 20, 20, 10, 8, 5, 2]
@@ -151,6 +213,40 @@ CARD_TYPES = ['Visa', 'Mastercard', 'American Express', 'Discover']
 # Email domains
 EMAIL_DOMAINS = ['gmail.com', 'yahoo.com', 'outlook.com', 'hotmail.com', 'icloud.com', 'protonmail.com']
 
+# Customer and address distributions
+CUSTOMER_GENDERS = ['Male', 'Female', 'Non-binary', 'Prefer not to say']
+CUSTOMER_GENDER_WEIGHTS = [45, 45, 5, 5]
+PREFERRED_LANGUAGES = ['en', 'es', 'fr', 'de', 'zh', 'ja', 'pt']
+ADDRESSES_PER_CUSTOMER = [1, 2, 3]
+ADDRESSES_PER_CUSTOMER_WEIGHTS = [60, 30, 10]
+ADDRESS_COUNTRIES = ['USA', 'Canada', 'UK', 'Germany', 'France', 'Australia']
+ADDRESS_COUNTRY_WEIGHTS = [70, 10, 5, 5, 5, 5]
+
+# Product, review and wishlist distributions
+IMAGES_PER_PRODUCT = [1, 2, 3, 4, 5]
+IMAGES_PER_PRODUCT_WEIGHTS = [20, 30, 30, 15, 5]
+REVIEW_RATINGS = [1, 2, 3, 4, 5]
+REVIEW_RATING_WEIGHTS = [5, 8, 15, 32, 40]
+WISHLIST_PRIORITIES = ['low', 'medium', 'high']
+WISHLIST_PRIORITY_WEIGHTS = [40, 40, 20]
+
+# Coupon distributions
+COUPON_PERCENT_VALUES = [5, 10, 15, 20, 25, 30, 40, 50]
+COUPON_PERCENT_MIN_ORDERS = [0, 25, 50, 75, 100]
+COUPON_FIXED_VALUES = [5, 10, 15, 20, 25, 50]
+COUPON_FIXED_MIN_ORDER_MULTIPLES = [2, 3, 4, 5]  # Minimum order of a fixed-amount coupon, in multiples of its value
+COUPON_MAX_USES = [None, 100, 500, 1000, 5000]
+COUPON_ACTIVE = [True, False]
+COUPON_ACTIVE_WEIGHTS = [70, 30]
+
+# Fixed dictionaries of the remaining low-cardinality columns
+BRAND_COUNTRIES = ['USA', 'Japan', 'Germany', 'South Korea', 'France', 'Italy', 'UK', 'Sweden', 'China']
+DISCOUNT_TYPES = ['percentage', 'fixed_amount']
+ADDRESS_TYPES = ['shipping', 'billing']
+CURRENCIES = ['USD']
+PAYMENT_STATUSES = ['completed', 'pending', 'refunded', 'cancelled']
+SHIPMENT_STATUSES = ['in_transit', 'out_for_delivery', 'delivered']
+
 # Dataset size presets
 PRESETS = {
     'quick': {
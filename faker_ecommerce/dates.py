@@ -0,0 +1,173 @@
+"""
+Vectorized date and timestamp sampling.
+
+Generators draw whole columns of dates at once: NumPy samples integer offsets
+from the start of a window and adds them to it, giving datetime64 columns
+that convert to Arrow dates and timestamps without creating a Python object
+per row.
+
+Windows are written in Faker's relative syntax ('-4y', '-6M', '+1M', 'now',
+'today') and resolved against the run's as-of time, so every table, shard
+and worker process of a run uses the same windows.
+"""
+
+import re
+from datetime import datetime, timezone
+from typing import Optional, Union
+
+import numpy as np
+
+# Units of Faker's relative date syntax, in microseconds; years and months
+# use Faker's average lengths
+_UNITS = {
+    'y': int(365.24 * 86400 * 10**6),
+    'M': int(30.42 * 86400 * 10**6),
+    'w': 7 * 86400 * 10**6,
+    'd': 86400 * 10**6,
+    'h': 3600 * 10**6,
+    'm': 60 * 10**6,
+    's': 10**6,
+}
+_OFFSET_PATTERN = re.compile(r'([+-]\d+)([yMwdhms])')
+
+DateSpec = Union[str, datetime, np.datetime64]
+
+
+def default_as_of() -> datetime:
+    """Return the start of the current UTC day, the default as-of time of a run."""
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    return now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def parse_offset(spec: str) -> np.timedelta64:
+    """
+    Parse a relative offset in Faker's syntax, e.g. '-4y' or '+1M+2w'.
+
+    Args:
+        spec: Signed amounts with units y (years), M (months), w, d, h,
+            m (minutes) and s
+
+    Returns:
+        Offset in microseconds
+    """
+    parts = _OFFSET_PATTERN.findall(spec)
+    if not parts or ''.join(amount + unit for amount, unit in parts) != spec:
+        raise ValueError(f"Can't parse relative date '{spec}'")
+    return np.timedelta64(sum(int(amount) * _UNITS[unit] for amount, unit in parts), 'us')
+
+
+def resolve(spec: DateSpec, as_of: datetime) -> np.datetime64:
+    """
+    Resolve a window bound to an absolute time.
+
+    Args:
+        spec: 'now', 'today', a relative offset such as '-3y', or an
+            absolute datetime
+        as_of: Time 'now' refers to
+
+    Returns:
+        Absolute time in microseconds
+    """
+    now = np.datetime64(as_of, 'us')
+    if isinstance(spec, str):
+        if spec == 'now':
+            return now
+        if spec == 'today':
+            return now.astype('datetime64[D]').astype('datetime64[us]')
+        return now + parse_offset(spec)
+    return np.datetime64(spec, 'us')
+
+
+def random_timestamps(
+    rng: np.random.Generator,
+    start: DateSpec,
+    end: DateSpec,
+    n: int,
+    as_of: Optional[datetime] = None
+) -> np.ndarray:
+    """
+    Sample timestamps uniformly between two bounds, both included.
+
+    Args:
+        rng: NumPy random generator to draw from
+        start: Start of the window
+        end: End of the window
+        n: Number of timestamps
+        as_of: Time relative bounds are resolved against
+
+    Returns:
+        datetime64[us] array
+    """
+    start, end = resolve(start, as_of), resolve(end, as_of)
+    span = int((end - start).astype(np.int64))
+    return start + rng.integers(0, span, size=n, endpoint=True).astype('timedelta64[us]')
+
+
+def random_dates(
+    rng: np.random.Generator,
+    start: DateSpec,
+    end: DateSpec,
+    n: int,
+    as_of: Optional[datetime] = None
+) -> np.ndarray:
+    """
+    Sample dates uniformly between two bounds, both included, like Faker's
+    date_between.
+
+    Args:
+        rng: NumPy random generator to draw from
+        start: Start of the window
+        end: End of the window
+        n: Number of dates
+        as_of: Time relative bounds are resolved against
+
+    Returns:
+        datetime64[D] array
+    """
+    start = resolve(start, as_of).astype('datetime64[D]')
+    end = resolve(end, as_of).astype('datetime64[D]')
+    span = int((end - start).astype(np.int64))
+    return start + rng.integers(0, span, size=n, endpoint=True).astype('timedelta64[D]')
+
+
+def random_offsets(rng: np.random.Generator, low: int, high: int, n: int, unit: str = 'D') -> np.ndarray:
+    """
+    Sample offsets between low and high units, both included, to add to a
+    date or timestamp column (e.g. the days between shipping and delivery).
+
+    Args:
+        rng: NumPy random generator to draw from
+        low: Smallest offset
+        high: Largest offset
+        n: Number of offsets
+        unit: NumPy time unit of the offsets, e.g. 'D' or 'm'
+
+    Returns:
+        timedelta64 array
+    """
+    return rng.integers(low, high, size=n, endpoint=True).astype(f'timedelta64[{unit}]')
+
+
+def dates_of_birth(
+    rng: np.random.Generator,
+    n: int,
+    as_of: datetime,
+    min_age: int = 18,
+    max_age: int = 80
+) -> np.ndarray:
+    """
+    Sample dates of birth of people between min_age and max_age years old,
+    like Faker's date_of_birth.
+
+    Args:
+        rng: NumPy random generator to draw from
+        n: Number of dates
+        as_of: Date the ages refer to
+        min_age: Youngest age
+        max_age: Oldest age
+
+    Returns:
+        datetime64[D] array
+    """
+    earliest = resolve(f'-{max_age + 1}y', as_of).astype('datetime64[D]') + np.timedelta64(1, 'D')
+    return random_dates(rng, earliest, resolve(f'-{min_age}y', as_of), n)
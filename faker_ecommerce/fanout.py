@@ -0,0 +1,71 @@
+"""
+Vectorized expansion of parent rows into 1:N child rows.
+
+Images per product, warehouses per product and addresses per customer all
+follow the same pattern: draw a child count for each parent, then emit that
+many child rows. fan_out turns parent IDs and counts into whole child
+columns at once, and distinct_choices picks options without replacement for
+every parent, e.g. the warehouses a product is stocked in.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+
+
+class FanOut(NamedTuple):
+    """Child rows of a batch of parents, one array element per child."""
+    child_ids: np.ndarray
+    parent_ids: np.ndarray
+    position: np.ndarray
+
+    @property
+    def is_first(self) -> np.ndarray:
+        """Whether each child is its parent's first (e.g. primary or default)."""
+        return self.position == 0
+
+
+def fan_out(parent_ids: np.ndarray, counts: np.ndarray, first_child_id: int = 1) -> FanOut:
+    """
+    Expand parents into their child rows.
+
+    Args:
+        parent_ids: ID of each parent
+        counts: Number of children of each parent
+        first_child_id: ID of the first child; children are numbered
+            consecutively in parent order
+
+    Returns:
+        FanOut with the child IDs, parent IDs and 0-based position of each
+        child within its parent
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    n = int(counts.sum())
+    starts = np.cumsum(counts) - counts
+    return FanOut(
+        child_ids=np.arange(first_child_id, first_child_id + n, dtype=np.int64),
+        parent_ids=np.repeat(np.asarray(parent_ids), counts),
+        position=np.arange(n, dtype=np.int64) - np.repeat(starts, counts)
+    )
+
+
+def distinct_choices(rng: np.random.Generator, n_options: int, counts: np.ndarray) -> np.ndarray:
+    """
+    Pick counts[i] distinct options out of n_options for every parent i,
+    like random.sample, for all parents at once.
+
+    Args:
+        rng: NumPy random generator to draw from
+        n_options: Number of options to choose from
+        counts: Number of options for each parent, at most n_options
+
+    Returns:
+        Chosen option indices, flattened in parent order to line up with
+        fan_out(parent_ids, counts)
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    if (counts > n_options).any():
+        raise ValueError(f"Cannot choose more than {n_options} distinct options")
+    # A random permutation of the options per parent, cut to its count
+    permutations = np.argsort(rng.random((len(counts), n_options)), axis=1)
+    return permutations[np.arange(n_options) < counts[:, None]]
@@ -5,8 +5,8 @@ Data generators for the e-commerce schema.
 from .base import generate_categories, generate_brands, generate_warehouses, generate_coupons
 from .customers import generate_customers, generate_addresses
 from .products import generate_products, generate_product_images, generate_inventory
-from .orders import generate_orders_with_items, generate_payments, generate_shipments
-from .reviews import generate_reviews, generate_wishlists, generate_coupon_usage
+from .orders import generate_orders_with_items, generate_order_shard, plan_order_shards
+from .reviews import generate_reviews, generate_wishlists
 
 __all__ = [
     'generate_categories',
@@ -19,10 +19,9 @@ __all__ = [
     'generate_product_images',
     'generate_inventory',
     'generate_orders_with_items',
-    'generate_payments',
-    'generate_shipments',
+    'generate_order_shard',
+    'plan_order_shards',
     'generate_reviews',
     'generate_wishlists',
-    'generate_coupon_usage',
 ]
 
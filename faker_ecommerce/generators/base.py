@@ -3,12 +3,20 @@ Base data generators for categories, brands, warehouses, and coupons.
 """
 
 import random
-from datetime import timedelta
+from datetime import datetime
+from typing import Optional
 
+import numpy as np
 import pandas as pd
 from faker import Faker
 
-from ..config import CATEGORY_BRANDS, WAREHOUSES, COUPON_PREFIXES
+from ..config import BRAND_COUNTRIES, CATEGORY_BRANDS, WAREHOUSES
+from ..dates import default_as_of, random_dates, random_offsets
+from ..sampling import (
+    COUPON_ACTIVE, COUPON_DISCOUNT_TYPE, COUPON_FIXED_MIN_ORDER_MULTIPLE, COUPON_FIXED_VALUE, COUPON_MAX_USES,
+    COUPON_PERCENT_MIN_ORDER, COUPON_PERCENT_VALUE, COUPON_PREFIX
+)
+from ..schema import categorize
 from ..writers import DataWriter
 
 
@@ -44,14 +52,14 @@ def generate_brands(writer: DataWriter) -> pd.DataFrame:
                 brands.append({
                     'brand_id': brand_id,
                     'brand_name': brand_name,
-                    'country_of_origin': random.choice(['USA', 'Japan', 'Germany', 'South Korea', 'France', 'Italy', 'UK', 'Sweden', 'China']),
+                    'country_of_origin': random.choice(BRAND_COUNTRIES),
                     'founded_year': random.randint(1850, 2020),
                     'website': f"https://www.{clean_name}.com"
                 })
                 seen_brands.add(brand_name)
                 brand_id += 1
     
-    df = pd.DataFrame(brands)
+    df = categorize('brands', pd.DataFrame(brands))
     writer.write_dataframe('brands', df)
     return df
 
@@ -72,43 +80,47 @@ def generate_warehouses(writer: DataWriter) -> pd.DataFrame:
             'manager_name': fake.name()
         })
     
-    df = pd.DataFrame(warehouses)
+    df = categorize('warehouses', pd.DataFrame(warehouses))
     writer.write_dataframe('warehouses', df)
     return df
 
 
-def generate_coupons(n: int, writer: DataWriter, fake: Faker) -> pd.DataFrame:
-    """Generate and write coupons."""
+def generate_coupons(n: int, writer: DataWriter, fake: Faker, as_of: Optional[datetime] = None) -> pd.DataFrame:
+    """Generate and write coupons, with dates relative to as_of (default: start of the current UTC day)."""
     coupons = []
     
+    # Validity periods are drawn for all coupons at once
+    np_rng = np.random.default_rng(random.getrandbits(64))
+    start_dates = random_dates(np_rng, '-2y', '+1M', n, as_of or default_as_of())
+    end_dates = (start_dates + random_offsets(np_rng, 7, 90, n)).tolist()
+    start_dates = start_dates.tolist()
+    
     for i in range(1, n + 1):
-        prefix = random.choice(COUPON_PREFIXES)
-        discount_type = random.choice(['percentage', 'fixed_amount'])
+        prefix = COUPON_PREFIX.draw()
+        discount_type = COUPON_DISCOUNT_TYPE.draw()
         
         if discount_type == 'percentage':
-            discount_value = random.choice([5, 10, 15, 20, 25, 30, 40, 50])
-            min_order = random.choice([0, 25, 50, 75, 100])
+            discount_value = COUPON_PERCENT_VALUE.draw()
+            min_order = COUPON_PERCENT_MIN_ORDER.draw()
         else:
-            discount_value = random.choice([5, 10, 15, 20, 25, 50])
-            min_order = discount_value * random.choice([2, 3, 4, 5])
-        
-        start_date = fake.date_between(start_date='-2y', end_date='+1m')
+            discount_value = COUPON_FIXED_VALUE.draw()
+            min_order = discount_value * COUPON_FIXED_MIN_ORDER_MULTIPLE.draw()
         
         coupons.append({
             'coupon_id': i,
             'coupon_code': f"{prefix}{discount_value}{random.randint(100, 999)}",
             'description': f"Get {discount_value}{'%' if discount_type == 'percentage' else '$'} off your order",
             'discount_type': discount_type,
-            'discount_value': discount_value,
-            'min_order_amount': min_order,
-            'max_uses': random.choice([None, 100, 500, 1000, 5000]),
+            'discount_value': float(discount_value),
+            'min_order_amount': float(min_order),
+            'max_uses': COUPON_MAX_USES.draw(),
             'times_used': 0,
-            'start_date': start_date,
-            'end_date': start_date + timedelta(days=random.randint(7, 90)),
-            'is_active': random.choices([True, False], weights=[70, 30])[0]
+            'start_date': start_dates[i - 1],
+            'end_date': end_dates[i - 1],
+            'is_active': COUPON_ACTIVE.draw()
         })
     
-    df = pd.DataFrame(coupons)
+    df = categorize('coupons', pd.DataFrame(coupons))
     writer.write_dataframe('coupons', df)
     return df
 
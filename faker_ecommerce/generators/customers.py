@@ -2,106 +2,227 @@
 Customer and address data generators.
 """
 
-import random
-from typing import List
+from datetime import datetime
+from typing import Dict, Optional, Tuple
 
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
 from faker import Faker
 from tqdm import tqdm
 
-from ..config import BATCH_SIZE, EMAIL_DOMAINS
-from ..writers import DataWriter
+from .. import config
+from ..dates import dates_of_birth, default_as_of, random_dates
+from ..fanout import fan_out
+from ..ids import IdSpace, IdsLike
+from ..pools import locale_formats, numerify, pool_size, sample_pool, value_pool
+from ..sampling import ADDRESS_COUNTRY, ADDRESSES_PER_CUSTOMER, EMAIL_DOMAIN, GENDER, LANGUAGE
+from ..schema import enum_code, to_arrow_table
+from ..seeding import block_generator, first_ids_at, row_blocks
+from ..writers import BlockBuffer, DataWriter
 
 
-def generate_customers(n: int, writer: DataWriter, fake: Faker) -> List[int]:
+# Counter-based streams drawn for each block of customers
+_VALUES, _ADDRESS_COUNTS, _ADDRESS_VALUES = range(3)
+
+_BILLING = enum_code('address_type', 'billing')
+
+
+def _customer_block(key: int, block: int, fake: Faker, as_of: datetime, pools: int) -> Dict[str, np.ndarray]:
+    """Generate the columns of a whole block of customers, with value pools of pools values."""
+    rng = block_generator(key, block, _VALUES)
+    size = config.ROW_BLOCK_SIZE
+    start = block * size + 1
+    
+    first_names = pa.array(sample_pool(value_pool(fake, 'first_name', key, pools), rng, size), pa.string())
+    last_names = pa.array(sample_pool(value_pool(fake, 'last_name', key, pools), rng, size), pa.string())
+    numbers = pc.cast(pa.array(rng.integers(1, 999, size=size, endpoint=True)), pa.string())
+    domains = pa.array(EMAIL_DOMAIN.sample(rng, size), pa.string())
+    local_parts = pc.binary_join_element_wise(pc.utf8_lower(first_names), pc.utf8_lower(last_names), '.')
+    emails = pc.binary_join_element_wise(pc.binary_join_element_wise(local_parts, numbers, ''), domains, '@')
+    
+    return {
+        'customer_id': np.arange(start, start + size, dtype=np.int64),
+        'first_name': first_names,
+        'last_name': last_names,
+        'email': emails,
+        'phone': numerify(locale_formats(fake, 'phone_number', 'formats'), rng, size),
+        'date_of_birth': dates_of_birth(rng, size, as_of, min_age=18, max_age=80),
+        'gender': GENDER.indices(rng, size),
+        'signup_date': random_dates(rng, '-5y', 'today', size, as_of),
+        'is_active': rng.random(size) < 0.9,
+        'loyalty_points': rng.integers(0, 50000, size=size, endpoint=True, dtype=np.int32),
+        'preferred_language': LANGUAGE.indices(rng, size)
+    }
+
+
+def generate_customers(
+    n: int,
+    writer: DataWriter,
+    fake: Faker,
+    rng: np.random.Generator,
+    rows: Optional[Tuple[int, int]] = None,
+    as_of: Optional[datetime] = None
+) -> IdSpace:
     """
     Generate and write customer data in batches.
     
+    Customers are drawn in blocks from counter-based random streams, so any
+    range of rows can be generated without the rows before it.
+    
     Args:
         n: Number of customers to generate
         writer: DataWriter instance
-        fake: Faker instance
+        fake: Faker instance the value pools are drawn with
+        rng: NumPy random generator the customers' key is drawn from
+        rows: Range of rows (0-based, end-exclusive) to write instead of
+            all of them; the rows are those of a full run
+        as_of: Time relative dates are resolved against (default: start
+            of the current UTC day)
         
     Returns:
-        List of customer IDs
+        IdSpace of all customer IDs, including those of rows not written
     """
-    batch = []
+    key = int(rng.integers(2**63))
+    as_of = as_of or default_as_of()
+    start, stop = rows if rows is not None else (0, n)
+    buffer = BlockBuffer('customers')
     total_written = 0
     
-    pbar = tqdm(range(1, n + 1), desc="  Customers", unit="rows", ncols=80)
-    for i in pbar:
-        first_name = fake.first_name()
-        last_name = fake.last_name()
-        domain = random.choice(EMAIL_DOMAINS)
-        batch.append({
-            'customer_id': i,
-            'first_name': first_name,
-            'last_name': last_name,
-            'email': f"{first_name.lower()}.{last_name.lower()}{random.randint(1, 999)}@{domain}",
-            'phone': fake.phone_number(),
-            'date_of_birth': fake.date_of_birth(minimum_age=18, maximum_age=80),
-            'gender': random.choices(['Male', 'Female', 'Non-binary', 'Prefer not to say'], weights=[45, 45, 5, 5])[0],
-            'signup_date': fake.date_between(start_date='-5y', end_date='today'),
-            'is_active': random.choices([True, False], weights=[90, 10])[0],
-            'loyalty_points': random.randint(0, 50000),
-            'preferred_language': random.choice(['en', 'es', 'fr', 'de', 'zh', 'ja', 'pt'])
-        })
+    pbar = tqdm(total=stop - start, desc="  Customers", unit="rows", ncols=80,
+                disable=not config.SHOW_PROGRESS)
+    for block, lo, hi in row_blocks(start, stop):
+        block_table = to_arrow_table('customers', _customer_block(key, block, fake, as_of, pool_size(n)))
+        total_written += buffer.add(writer, block_table.slice(lo, hi - lo))
         
-        if len(batch) >= BATCH_SIZE:
-            writer.write_batch('customers', batch)
-            total_written += len(batch)
-            batch = []
-            pbar.set_postfix({'written': f'{total_written:,}'})
+        pbar.update(hi - lo)
+        pbar.set_postfix({'written': f'{total_written:,}'})
+    total_written += buffer.flush(writer)
+    pbar.close()
     
-    if batch:
-        writer.write_batch('customers', batch)
-        total_written += len(batch)
+    return IdSpace.range(n)
+
+
+def _address_counts(key: int, block: int) -> np.ndarray:
+    """Draw the number of addresses (1-3) of each customer of a block."""
+    rng = block_generator(key, block, _ADDRESS_COUNTS)
+    return ADDRESSES_PER_CUSTOMER.sample(rng, config.ROW_BLOCK_SIZE)
+
+
+def _address_block(
+    key: int,
+    block: int,
+    customer_ids: np.ndarray,
+    counts: np.ndarray,
+    first_address_id: int,
+    fake: Faker,
+    pools: int
+) -> Dict[str, np.ndarray]:
+    """
+    Generate the addresses of a whole block of customers.
     
-    return list(range(1, n + 1))
+    Args:
+        key: Key of the addresses' counter-based generators
+        block: Customer block number
+        customer_ids: IDs of the block's customers
+        counts: Number of addresses of each of the block's customers
+        first_address_id: ID of the block's first address
+        fake: Faker instance the value pools are drawn with
+        pools: Number of values to draw for each value pool
+        
+    Returns:
+        Address columns of the block
+    """
+    rng = block_generator(key, block, _ADDRESS_VALUES)
+    addresses = fan_out(customer_ids, counts, first_address_id)
+    n = len(addresses.child_ids)
+    
+    # Each customer's first address is its default billing address
+    address_types = rng.integers(0, len(config.ADDRESS_TYPES), size=n)
+    address_types[addresses.is_first] = _BILLING
+    
+    # A street address is a building number and a street name, followed by an apartment or suite half the time
+    buildings = numerify(locale_formats(fake, 'address', 'building_number_formats'), rng, n)
+    streets = sample_pool(value_pool(fake, 'street_name', key, pools), rng, n)
+    street_addresses = pc.binary_join_element_wise(pa.array(buildings, pa.string()), pa.array(streets, pa.string()), ' ')
+    secondary = numerify(locale_formats(fake, 'address', 'secondary_address_formats'), rng, n)
+    with_secondary = pc.binary_join_element_wise(street_addresses, pa.array(secondary, pa.string()), ' ')
+    street_addresses = pc.if_else(pa.array(rng.random(n) < 0.5), with_secondary, street_addresses)
+    
+    return {
+        'address_id': addresses.child_ids,
+        'customer_id': addresses.parent_ids,
+        'address_type': address_types,
+        'street_address': street_addresses,
+        'city': sample_pool(value_pool(fake, 'city', key, pools), rng, n),
+        'state': sample_pool(value_pool(fake, 'state_abbr', key, pools), rng, n),
+        'postal_code': numerify(locale_formats(fake, 'address', 'postcode_formats'), rng, n),
+        'country': ADDRESS_COUNTRY.indices(rng, n),
+        'is_default': addresses.is_first
+    }
 
 
-def generate_addresses(customer_ids: List[int], writer: DataWriter, fake: Faker) -> int:
+def generate_addresses(
+    customer_ids: IdsLike,
+    writer: DataWriter,
+    fake: Faker,
+    rng: np.random.Generator,
+    rows: Optional[Tuple[int, int]] = None
+) -> Tuple[int, int]:
     """
     Generate and write customer addresses in batches.
     
+    The number of addresses of each customer comes from a stream of its
+    own, so the first address ID of any range of customers is known without
+    generating the addresses before it.
+    
     Args:
-        customer_ids: List of customer IDs
+        customer_ids: Customer IDs
         writer: DataWriter instance
-        fake: Faker instance
+        fake: Faker instance the value pools are drawn with
+        rng: NumPy random generator the addresses' key is drawn from
+        rows: Range of customer rows (0-based, end-exclusive) to write the
+            addresses of instead of all of them
         
     Returns:
-        Maximum address ID (total count)
+        Tuple of (maximum address ID over all customers, number of
+        addresses written)
     """
-    batch = []
-    addr_id = 1
+    key = int(rng.integers(2**63))
+    customer_ids = IdSpace.of(customer_ids)
+    n = len(customer_ids)
+    start, stop = rows if rows is not None else (0, n)
+    
+    def block_counts(block: int) -> Dict[str, np.ndarray]:
+        return {'addresses': _address_counts(key, block)}
+    
+    first_ids, end_ids = first_ids_at([start, n], ['addresses'], block_counts)
+    next_id = first_ids['addresses']
+    
+    buffer = BlockBuffer('addresses')
     total_written = 0
     
-    pbar = tqdm(customer_ids, desc="  Addresses", unit="customers", ncols=80)
-    for cust_id in pbar:
-        num_addresses = random.choices([1, 2, 3], weights=[60, 30, 10])[0]
-        for j in range(num_addresses):
-            addr_type = 'billing' if j == 0 else random.choice(['shipping', 'billing'])
-            batch.append({
-                'address_id': addr_id,
-                'customer_id': cust_id,
-                'address_type': addr_type,
-                'street_address': fake.street_address(),
-                'city': fake.city(),
-                'state': fake.state_abbr(),
-                'postal_code': fake.postcode(),
-                'country': random.choices(['USA', 'Canada', 'UK', 'Germany', 'France', 'Australia'], weights=[70, 10, 5, 5, 5, 5])[0],
-                'is_default': j == 0
-            })
-            addr_id += 1
+    pbar = tqdm(total=stop - start, desc="  Addresses", unit="customers", ncols=80,
+                disable=not config.SHOW_PROGRESS)
+    for block, lo, hi in row_blocks(start, stop):
+        # Only customers that exist get addresses, so a partial last block
+        # is cut before the addresses are drawn
+        block_start = block * config.ROW_BLOCK_SIZE
+        counts = _address_counts(key, block)[:min(config.ROW_BLOCK_SIZE, n - block_start)]
+        block_first_id = next_id - int(counts[:lo].sum())
         
-        if len(batch) >= BATCH_SIZE:
-            writer.write_batch('addresses', batch)
-            total_written += len(batch)
-            batch = []
-            pbar.set_postfix({'written': f'{total_written:,}'})
-    
-    if batch:
-        writer.write_batch('addresses', batch)
-        total_written += len(batch)
+        block_columns = _address_block(
+            key, block, customer_ids.ids_at(block_start, block_start + len(counts)), counts, block_first_id, fake,
+            pool_size(n)
+        )
+        kept_start, kept_stop = int(counts[:lo].sum()), int(counts[:hi].sum())
+        block_table = to_arrow_table('addresses', block_columns)
+        total_written += buffer.add(writer, block_table.slice(kept_start, kept_stop - kept_start))
+        next_id += kept_stop - kept_start
+        
+        pbar.update(hi - lo)
+        pbar.set_postfix({'written': f'{total_written:,}'})
+    total_written += buffer.flush(writer)
+    pbar.close()
     
-    return addr_id - 1
-
+    return end_ids['addresses'] - 1, total_written
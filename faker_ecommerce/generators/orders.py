@@ -2,277 +2,579 @@
 Order, order items, payments, and shipments data generators.
 """
 
-import random
-from datetime import timedelta
-from typing import Dict, List, Tuple
+from datetime import datetime, timezone
+from typing import Dict, List, NamedTuple, Optional, Tuple
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 from faker import Faker
 from tqdm import tqdm
 
-from ..config import (
-    BATCH_SIZE, SHIPPING_CARRIERS, WAREHOUSES,
-    PAYMENT_METHODS, PAYMENT_METHOD_WEIGHTS, CARD_TYPES
+from .. import config
+from ..config import SHIPPING_CARRIERS, WAREHOUSES
+from ..dates import random_offsets, random_timestamps, resolve
+from ..ids import IdSpace, IdsLike
+from ..sampling import (
+    CARD_TYPE, ITEM_DISCOUNT_RATE, ITEM_QUANTITY, ITEMS_PER_ORDER,
+    ORDER_STATUS, PAYMENT_METHOD, SHIPPING_COST
 )
-from ..writers import DataWriter
+from ..schema import enum_code, to_arrow_table
+from ..seeding import block_generator, first_ids_at, row_blocks
+from ..text import TextEngine
+from ..writers import BlockBuffer, DataWriter
+from .reviews import coupon_usage_for_orders
 
+# Window orders are placed in, relative to the as-of time
+ORDER_WINDOW = ('-4y', 'now')
 
-def generate_orders_with_items(
+
+# Tables derived from each order batch, which get their own ID sequences
+DERIVED_TABLES = ['order_items', 'payments', 'shipments', 'coupon_usage']
+
+# Counter-based streams drawn for each block of orders
+_STRUCTURE, _ORDERS, _PAYMENTS, _SHIPMENTS = range(4)
+
+# Codes of the status values orders, payments and shipments branch on
+_PENDING, _SHIPPED, _DELIVERED, _CANCELLED = (
+    enum_code('order_status', status) for status in ('pending', 'shipped', 'delivered', 'cancelled')
+)
+_PAYMENT_COMPLETED, _PAYMENT_PENDING, _PAYMENT_REFUNDED, _PAYMENT_CANCELLED = (
+    enum_code('payment_status', status) for status in ('completed', 'pending', 'refunded', 'cancelled')
+)
+_CARD_METHODS = [enum_code('payment_method', method) for method in ('credit_card', 'debit_card')]
+_USD = enum_code('currency', 'USD')
+_IN_TRANSIT, _OUT_FOR_DELIVERY, _SHIPMENT_DELIVERED = (
+    enum_code('shipment_status', status) for status in ('in_transit', 'out_for_delivery', 'delivered')
+)
+
+
+class OrderShard(NamedTuple):
+    """
+    A contiguous range of orders, with the first ID of each derived table's
+    rows so that every ID sequence stays contiguous across shards.
+    """
+    index: int
+    key: int
+    first_order_id: int
+    n_orders: int
+    first_ids: Dict[str, int]
+
+
+def _draw_structure(rng: np.random.Generator, n: int, has_coupons: bool) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Draw the values of a block of orders that decide how many rows they fan
+    out to: status, number of items and whether a coupon was used.
+    
+    These come from a stream of their own, so the row counts of any range
+    of orders can be computed without generating the rest of the orders.
+    
+    Returns:
+        Tuple of (status code, items per order, coupon used) arrays
+    """
+    status = ORDER_STATUS.indices(rng, n)
+    num_items = ITEMS_PER_ORDER.sample(rng, n)
+    has_coupon = rng.random(n) < 0.2
+    if not has_coupons:
+        has_coupon[:] = False
+    return status, num_items, has_coupon
+
+
+def _block_structure(key: int, block: int, has_coupons: bool) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Draw the structure of a whole block of orders."""
+    return _draw_structure(block_generator(key, block, _STRUCTURE), config.ROW_BLOCK_SIZE, has_coupons)
+
+
+def _fan_out(status: np.ndarray, num_items: np.ndarray, has_coupon: np.ndarray) -> Dict[str, np.ndarray]:
+    """Count the rows each order fans out to in each derived table."""
+    return {
+        'order_items': num_items,
+        'payments': status != _PENDING,
+        'shipments': np.isin(status, [_SHIPPED, _DELIVERED]),
+        'coupon_usage': has_coupon
+    }
+
+
+def plan_order_shards(
     n_orders: int,
-    customer_ids: List[int],
-    max_address_id: int,
-    coupon_ids: List[int],
-    product_ids: List[int],
-    product_prices: Dict[int, float],
-    coupons_df: pd.DataFrame,
-    writer: DataWriter,
-    fake: Faker
-) -> Tuple[List[dict], int, int]:
+    has_coupons: bool,
+    rng: np.random.Generator,
+    rows: Optional[Tuple[int, int]] = None
+) -> List[OrderShard]:
     """
-    Generate and write orders with their items together in batches.
+    Split the order rows into shards and compute where each shard's derived
+    ID sequences start.
+    
+    Shards are cut at multiples of ORDER_SHARD_SIZE, so their boundaries do
+    not depend on the number of workers. First IDs are computed from the
+    structure streams of the blocks before each shard only, which is a
+    small fraction of the work of generating the orders.
     
     Args:
-        n_orders: Number of orders to generate
-        customer_ids: List of customer IDs
-        max_address_id: Maximum address ID
-        coupon_ids: List of coupon IDs
-        product_ids: List of product IDs
-        product_prices: Dict mapping product ID to price
-        coupons_df: DataFrame of coupons
-        writer: DataWriter instance
-        fake: Faker instance
+        n_orders: Total number of orders
+        has_coupons: Whether there are coupons orders can use
+        rng: NumPy random generator the orders' key is drawn from
+        rows: Range of order rows (0-based, i.e. order_id - 1) to cover
+            instead of all of them
         
     Returns:
-        Tuple of (orders data list, orders count, items count)
+        List of shards in order_id order
+    """
+    key = int(rng.integers(2**63))
+    start, stop = rows if rows is not None else (0, n_orders)
+    
+    shard_size = config.ORDER_SHARD_SIZE
+    bounds = [start] + list(range((start // shard_size + 1) * shard_size, stop, shard_size)) + [stop]
+    
+    def block_counts(block: int) -> Dict[str, np.ndarray]:
+        return _fan_out(*_block_structure(key, block, has_coupons))
+    
+    first_ids = first_ids_at(bounds[:-1], DERIVED_TABLES, block_counts)
+    return [
+        OrderShard(index, key, shard_start + 1, shard_stop - shard_start, ids)
+        for index, (shard_start, shard_stop, ids) in enumerate(zip(bounds[:-1], bounds[1:], first_ids))
+    ]
+
+
+class OrderEngine:
     """
-    orders_batch = []
-    items_batch = []
-    
-    total_orders_written = 0
-    total_items_written = 0
-    order_item_id = 1
-    
-    orders_data = []
-    
-    # Build coupon lookup
-    coupon_lookup = {}
-    if coupons_df is not None and len(coupons_df) > 0:
-        for _, row in coupons_df.iterrows():
-            coupon_lookup[row['coupon_id']] = {
-                'discount_type': row['discount_type'],
-                'discount_value': row['discount_value']
-            }
-    
-    pbar = tqdm(range(1, n_orders + 1), desc="  Orders + Items", unit="orders", ncols=80)
-    for order_id in pbar:
-        customer_id = random.choice(customer_ids)
+    Vectorized order generator that draws a whole batch of orders at once.
+    
+    Lookups that the per-row loop used to rebuild or scan on every order
+    (product prices, coupon terms, weight lists) are compiled into NumPy
+    arrays once, and each batch is produced with array draws and array
+    arithmetic. Orders fan out to items with np.repeat, and item totals are
+    folded back into order subtotals with np.add.reduceat.
+    
+    Money is computed in int64 cents, so every order's subtotal is exactly
+    the sum of its item totals and its total exactly the sum of its parts.
+    
+    The engine holds no random state, so one engine can be built per run and
+    shipped to the processes generating the shards.
+    """
+    
+    def __init__(
+        self,
+        customer_ids: IdsLike,
+        max_address_id: int,
+        coupon_ids: IdsLike,
+        product_ids: IdsLike,
+        product_prices: np.ndarray,
+        coupons_df: pd.DataFrame,
+        as_of: datetime
+    ):
+        self.customer_ids = IdSpace.of(customer_ids)
+        self.max_address_id = max_address_id
+        self.coupon_ids = IdSpace.of(coupon_ids)
+        self.product_ids = IdSpace.of(product_ids)
+        
+        # Price in cents by product ID; -1 marks products without a known price
+        max_product_id = self.product_ids.max()
+        self.prices = np.full(max_product_id + 1, -1, dtype=np.int64)
+        known = min(len(product_prices), max_product_id + 1)
+        self.prices[:known] = product_prices[:known]
+        
+        # Coupon terms by coupon ID: a percentage, or an amount in cents
+        max_coupon_id = self.coupon_ids.max()
+        self.coupon_is_percentage = np.zeros(max_coupon_id + 1, dtype=bool)
+        self.coupon_percent = np.zeros(max_coupon_id + 1)
+        self.coupon_amount = np.zeros(max_coupon_id + 1, dtype=np.int64)
+        if coupons_df is not None and len(coupons_df) > 0:
+            ids = coupons_df['coupon_id'].to_numpy(dtype=np.int64)
+            value = coupons_df['discount_value'].to_numpy(dtype=np.float64)
+            self.coupon_is_percentage[ids] = (coupons_df['discount_type'] == 'percentage').to_numpy()
+            self.coupon_percent[ids] = value
+            self.coupon_amount[ids] = np.rint(value * 100)
         
-        shipping_addr = random.randint(1, max_address_id)
-        billing_addr_id = random.randint(1, max_address_id)
+        self.order_date_start, self.order_date_end = (resolve(bound, as_of) for bound in ORDER_WINDOW)
+    
+    @property
+    def has_coupons(self) -> bool:
+        return len(self.coupon_ids) > 0
+    
+    def generate_batch(
+        self,
+        first_order_id: int,
+        first_item_id: int,
+        structure: Tuple[np.ndarray, np.ndarray, np.ndarray],
+        rng: np.random.Generator,
+        text: TextEngine
+    ) -> Tuple[dict, dict]:
+        """
+        Generate a batch of orders and their items.
         
-        coupon_id = None
-        if random.random() < 0.2 and coupon_ids:
-            coupon_id = random.choice(coupon_ids)
+        Args:
+            first_order_id: ID of the first order in the batch
+            first_item_id: ID of the first order item in the batch
+            structure: The batch's (status code, items per order, coupon used)
+                arrays from _draw_structure
+            rng: NumPy random generator for the remaining order values
+            text: TextEngine for free-text notes
+            
+        Returns:
+            Tuple of (order columns, item columns)
+        """
+        status, num_items, has_coupon = structure
+        n = len(status)
+        order_ids = np.arange(first_order_id, first_order_id + n, dtype=np.int64)
         
-        order_date = fake.date_time_between(start_date='-4y', end_date='now')
-        status = random.choices(
-            ['pending', 'processing', 'shipped', 'delivered', 'cancelled', 'returned'],
-            weights=[5, 10, 15, 60, 5, 5]
-        )[0]
+        customer_ids = self.customer_ids.sample(rng, n)
+        shipping_addr = rng.integers(1, self.max_address_id, size=n, endpoint=True)
+        billing_addr = rng.integers(1, self.max_address_id, size=n, endpoint=True)
         
-        shipping_cost = round(random.choice([0, 4.99, 7.99, 9.99, 14.99]), 2)
+        if self.has_coupons:
+            coupon_ids = self.coupon_ids.sample(rng, n)
+        else:
+            coupon_ids = np.zeros(n, dtype=np.int64)
         
-        # Generate order items (1-5 items per order)
-        num_items = random.choices([1, 2, 3, 4, 5], weights=[30, 30, 20, 12, 8])[0]
-        subtotal = 0.0
+        order_dates = random_timestamps(rng, self.order_date_start, self.order_date_end, n)
+        shipping_cost = np.rint(SHIPPING_COST.sample(rng, n) * 100).astype(np.int64)
         
-        for _ in range(num_items):
-            product_id = random.choice(product_ids)
-            quantity = random.choices([1, 2, 3, 4, 5], weights=[50, 25, 15, 7, 3])[0]
-            
-            unit_price = product_prices.get(product_id, round(random.uniform(10, 500), 2))
-            
-            item_discount = 0
-            if random.random() < 0.15:
-                item_discount = round(unit_price * random.choice([0.05, 0.10, 0.15, 0.20]), 2)
-            
-            item_total = round((unit_price - item_discount) * quantity, 2)
-            subtotal += item_total
-            
-            items_batch.append({
-                'order_item_id': order_item_id,
-                'order_id': order_id,
-                'product_id': product_id,
-                'quantity': quantity,
-                'unit_price': unit_price,
-                'discount': item_discount,
-                'total_price': item_total
-            })
-            order_item_id += 1
+        # Fan out orders to their items (1-5 items per order)
+        n_items = int(num_items.sum())
+        item_order_ids = np.repeat(order_ids, num_items)
+        
+        product_ids = self.product_ids.sample(rng, n_items)
+        quantity = ITEM_QUANTITY.sample(rng, n_items)
+        
+        # All amounts below are in cents
+        unit_price = self.prices[product_ids]
+        unknown_price = unit_price < 0
+        if unknown_price.any():
+            unit_price[unknown_price] = np.rint(rng.uniform(10, 500, size=int(unknown_price.sum())) * 100)
+        
+        has_discount = rng.random(n_items) < 0.15
+        discount_rate = ITEM_DISCOUNT_RATE.sample(rng, n_items)
+        item_discount = np.where(has_discount, np.rint(unit_price * discount_rate), 0).astype(np.int64)
+        item_total = (unit_price - item_discount) * quantity
+        
+        # Fold item totals back into per-order subtotals
+        item_offsets = np.concatenate(([0], np.cumsum(num_items)[:-1]))
+        subtotal = np.add.reduceat(item_total, item_offsets)
         
         # Calculate order totals
-        discount_amount = 0.0
-        if coupon_id is not None and coupon_id in coupon_lookup:
-            coupon = coupon_lookup[coupon_id]
-            if coupon['discount_type'] == 'percentage':
-                discount_amount = round(subtotal * (coupon['discount_value'] / 100), 2)
-            else:
-                discount_amount = min(coupon['discount_value'], subtotal)
+        coupon_discount = np.where(
+            self.coupon_is_percentage[coupon_ids],
+            np.rint(subtotal * (self.coupon_percent[coupon_ids] / 100)),
+            np.minimum(self.coupon_amount[coupon_ids], subtotal)
+        )
+        discount_amount = np.where(has_coupon, coupon_discount, 0).astype(np.int64)
+        tax_amount = np.rint(subtotal * 0.08).astype(np.int64)
+        total_amount = subtotal - discount_amount + tax_amount + shipping_cost
         
-        tax_amount = round(subtotal * 0.08, 2)
-        total_amount = round(subtotal - discount_amount + tax_amount + shipping_cost, 2)
+        # Free-text notes on ~10% of orders
+        has_notes = rng.random(n) < 0.1
+        notes = text.optional_sentences(rng, has_notes)
         
-        order_data = {
-            'order_id': order_id,
-            'customer_id': customer_id,
+        orders = {
+            'order_id': order_ids,
+            'customer_id': customer_ids,
             'shipping_address_id': shipping_addr,
-            'billing_address_id': billing_addr_id,
-            'order_date': order_date,
+            'billing_address_id': billing_addr,
+            'order_date': order_dates,
             'status': status,
-            'subtotal': round(subtotal, 2),
+            'subtotal': subtotal,
             'discount_amount': discount_amount,
             'tax_amount': tax_amount,
             'shipping_cost': shipping_cost,
             'total_amount': total_amount,
-            'coupon_id': coupon_id,
-            'notes': fake.sentence() if random.random() < 0.1 else None
+            'coupon_id': np.ma.masked_array(coupon_ids, mask=~has_coupon),
+            'notes': notes
+        }
+        items = {
+            'order_item_id': np.arange(first_item_id, first_item_id + n_items, dtype=np.int64),
+            'order_id': item_order_ids,
+            'product_id': product_ids,
+            'quantity': quantity,
+            'unit_price': unit_price,
+            'discount': item_discount,
+            'total_price': item_total
         }
+        return orders, items
+
+
+def _uuid4_strings(rng: np.random.Generator, n: int) -> np.ndarray:
+    """Draw n random (version 4) UUID strings at once."""
+    raw = np.frombuffer(rng.bytes(16 * n), dtype=np.uint8).reshape(n, 16).copy()
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40  # Version 4
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80  # RFC 4122 variant
+    
+    hex_digits = np.frombuffer(b'0123456789abcdef', dtype='S1')
+    digits = np.empty((n, 32), dtype='S1')
+    digits[:, 0::2] = hex_digits[raw >> 4]
+    digits[:, 1::2] = hex_digits[raw & 0x0F]
+    
+    # Lay the 32 digits out as 8-4-4-4-12 groups separated by dashes
+    chars = np.full((n, 36), b'-', dtype='S1')
+    for dst, src, width in ((0, 0, 8), (9, 8, 4), (14, 12, 4), (19, 16, 4), (24, 20, 12)):
+        chars[:, dst:dst + width] = digits[:, src:src + width]
+    return chars.view('S36').ravel().astype(str)
+
+
+def payments_for_orders(orders: dict, first_payment_id: int, rng: np.random.Generator) -> dict:
+    """
+    Derive the payment rows for a batch of orders.
+    
+    Every order except pending ones gets one payment.
+    
+    Args:
+        orders: Order columns of one batch
+        first_payment_id: ID of the first payment in the batch
+        rng: NumPy random generator dedicated to payments
         
-        orders_batch.append(order_data)
-        orders_data.append(order_data)
+    Returns:
+        Payment columns
+    """
+    paid = orders['status'] != _PENDING
+    order_status = orders['status'][paid]
+    n = len(order_status)
+    
+    status = np.where(np.isin(order_status, [_SHIPPED, _DELIVERED]), _PAYMENT_COMPLETED, _PAYMENT_PENDING)
+    cancelled = order_status == _CANCELLED
+    status[cancelled] = rng.choice([_PAYMENT_REFUNDED, _PAYMENT_CANCELLED], size=int(cancelled.sum()))
+    
+    method = PAYMENT_METHOD.indices(rng, n)
+    is_card = np.isin(method, _CARD_METHODS)
+    card_type = np.zeros(n, dtype=np.int64)
+    card_type[is_card] = CARD_TYPE.indices(rng, int(is_card.sum()))
+    card_last_four = np.full(n, None, dtype=object)
+    card_last_four[is_card] = rng.integers(1000, 9999, size=int(is_card.sum()), endpoint=True).astype(str)
+    
+    payment_delay = random_offsets(rng, 1, 60, n, 'm')
+    
+    return {
+        'payment_id': np.arange(first_payment_id, first_payment_id + n, dtype=np.int64),
+        'order_id': orders['order_id'][paid],
+        'payment_method': method,
+        'card_type': np.ma.masked_array(card_type, mask=~is_card),
+        'card_last_four': card_last_four,
+        'amount': orders['total_amount'][paid],
+        'currency': np.full(n, _USD, dtype=np.int8),
+        'status': status,
+        'transaction_id': _uuid4_strings(rng, n),
+        'payment_date': orders['order_date'][paid] + payment_delay
+    }
+
+
+def shipments_for_orders(orders: dict, first_shipment_id: int, rng: np.random.Generator) -> dict:
+    """
+    Derive the shipment rows for a batch of orders.
+    
+    Shipped and delivered orders get one shipment each.
+    
+    Args:
+        orders: Order columns of one batch
+        first_shipment_id: ID of the first shipment in the batch
+        rng: NumPy random generator dedicated to shipments
         
-        # Flush batches
-        if len(orders_batch) >= BATCH_SIZE:
-            writer.write_batch('orders', orders_batch)
-            total_orders_written += len(orders_batch)
-            orders_batch = []
-            
-            writer.write_batch('order_items', items_batch)
-            total_items_written += len(items_batch)
-            items_batch = []
-            
-            pbar.set_postfix({
-                'orders': f'{total_orders_written:,}',
-                'items': f'{total_items_written:,}'
-            })
+    Returns:
+        Shipment columns
+    """
+    shipped = np.isin(orders['status'], [_SHIPPED, _DELIVERED])
+    delivered = orders['status'][shipped] == _DELIVERED
+    n = len(delivered)
+    
+    order_date = orders['order_date'][shipped].astype('datetime64[D]')
+    ship_date = order_date + random_offsets(rng, 1, 3, n)
+    
+    carrier = rng.integers(0, len(SHIPPING_CARRIERS), size=n)
+    carrier_prefix = np.array([name[:3].upper() for name in SHIPPING_CARRIERS])[carrier]
+    tracking_number = np.char.add(
+        carrier_prefix,
+        rng.integers(100000000000, 999999999999, size=n, endpoint=True).astype(str)
+    )
+    
+    delivery_date = ship_date + random_offsets(rng, 2, 7, n)
+    status = np.full(n, _SHIPMENT_DELIVERED)
+    status[~delivered] = rng.choice([_IN_TRANSIT, _OUT_FOR_DELIVERY], size=int((~delivered).sum()))
+    
+    return {
+        'shipment_id': np.arange(first_shipment_id, first_shipment_id + n, dtype=np.int64),
+        'order_id': orders['order_id'][shipped],
+        'carrier': carrier,
+        'tracking_number': tracking_number,
+        'shipped_date': ship_date,
+        'estimated_delivery': ship_date + random_offsets(rng, 3, 7, n),
+        'actual_delivery': np.ma.masked_array(delivery_date, mask=~delivered),
+        'status': status,
+        'warehouse_code': rng.integers(0, len(WAREHOUSES), size=n)
+    }
+
+
+def _order_block(
+    engine: OrderEngine,
+    key: int,
+    block: int,
+    lo: int,
+    hi: int,
+    first_ids: Dict[str, int],
+    text: TextEngine
+) -> Tuple[Dict[str, pa.Table], Dict[str, int]]:
+    """
+    Generate the orders at offsets lo:hi of a block, with their items,
+    payments, shipments and coupon usage.
     
-    # Write remaining
-    if orders_batch:
-        writer.write_batch('orders', orders_batch)
-        total_orders_written += len(orders_batch)
+    The whole block is always drawn and then cut to the requested orders,
+    so the values of an order do not depend on which rows are requested.
     
-    if items_batch:
-        writer.write_batch('order_items', items_batch)
-        total_items_written += len(items_batch)
+    Args:
+        engine: OrderEngine built for the run
+        key: Key of the orders' counter-based generators
+        block: Block number
+        lo: Offset of the first order kept
+        hi: Offset after the last order kept
+        first_ids: First ID of each derived table at offset lo
+        text: TextEngine for free-text notes
+        
+    Returns:
+        Tuple of (Arrow table per written table, first IDs after offset hi)
+    """
+    structure = _block_structure(key, block, engine.has_coupons)
+    fan_out = _fan_out(*structure)
+    block_ids = {table: first_ids[table] - int(fan_out[table][:lo].sum()) for table in DERIVED_TABLES}
     
-    return orders_data, total_orders_written, total_items_written
+    first_order_id = block * config.ROW_BLOCK_SIZE + 1
+    orders, items = engine.generate_batch(
+        first_order_id, block_ids['order_items'], structure, block_generator(key, block, _ORDERS), text
+    )
+    columns = {
+        'orders': orders,
+        'order_items': items,
+        'payments': payments_for_orders(orders, block_ids['payments'], block_generator(key, block, _PAYMENTS)),
+        'shipments': shipments_for_orders(orders, block_ids['shipments'], block_generator(key, block, _SHIPMENTS)),
+        'coupon_usage': coupon_usage_for_orders(orders, block_ids['coupon_usage'])
+    }
+    tables = {table: to_arrow_table(table, data) for table, data in columns.items()}
+    
+    if lo > 0 or hi < config.ROW_BLOCK_SIZE:
+        kept_start, kept_stop = first_order_id + lo, first_order_id + hi
+        tables = {
+            table: data.filter(pc.and_(
+                pc.greater_equal(data['order_id'], kept_start),
+                pc.less(data['order_id'], kept_stop)
+            ))
+            for table, data in tables.items()
+        }
+    
+    return tables, {table: first_ids[table] + int(fan_out[table][lo:hi].sum()) for table in DERIVED_TABLES}
 
 
-def generate_payments(orders_data: List[dict], writer: DataWriter, fake: Faker) -> int:
+def generate_order_shard(
+    engine: OrderEngine,
+    shard: OrderShard,
+    writer: DataWriter,
+    fake: Faker,
+    pbar: Optional[tqdm] = None
+) -> Dict[str, int]:
     """
-    Generate and write payments in batches.
+    Generate and write one shard of orders with their items, payments,
+    shipments and coupon usage.
+    
+    Every block of orders draws from counter-based generators keyed by the
+    shard's key and the block number, so a shard only depends on its key,
+    range and first IDs, and shards can be generated in any order and in
+    any process.
     
     Args:
-        orders_data: List of order dictionaries
+        engine: OrderEngine built for the run
+        shard: Shard from plan_order_shards
         writer: DataWriter instance
-        fake: Faker instance
+        fake: Faker instance whose lorem words are used for notes
+        pbar: Optional progress bar advanced by the orders written
         
     Returns:
-        Total number of payments generated
+        Dict mapping each written table to its row count
     """
-    batch = []
-    payment_id = 1
-    total_written = 0
-    
-    pbar = tqdm(orders_data, desc="  Payments", unit="orders", ncols=80)
-    for order in pbar:
-        if order['status'] not in ['pending']:
-            status = 'completed' if order['status'] in ['shipped', 'delivered'] else 'pending'
-            if order['status'] == 'cancelled':
-                status = random.choice(['refunded', 'cancelled'])
-            
-            method = random.choices(PAYMENT_METHODS, weights=PAYMENT_METHOD_WEIGHTS)[0]
-            
-            batch.append({
-                'payment_id': payment_id,
-                'order_id': order['order_id'],
-                'payment_method': method,
-                'card_type': random.choice(CARD_TYPES) if method in ['credit_card', 'debit_card'] else None,
-                'card_last_four': f"{random.randint(1000, 9999)}" if method in ['credit_card', 'debit_card'] else None,
-                'amount': order['total_amount'],
-                'currency': 'USD',
-                'status': status,
-                'transaction_id': fake.uuid4(),
-                'payment_date': order['order_date'] + timedelta(minutes=random.randint(1, 60))
-            })
-            payment_id += 1
+    text = TextEngine.from_faker(fake)
+    buffers = {table: BlockBuffer(table) for table in ['orders'] + DERIVED_TABLES}
+    row_counts = {table: 0 for table in buffers}
+    
+    next_ids = dict(shard.first_ids)
+    start = shard.first_order_id - 1
+    for block, lo, hi in row_blocks(start, start + shard.n_orders):
+        tables, next_ids = _order_block(engine, shard.key, block, lo, hi, next_ids, text)
+        writer.index_orders(tables['orders'], shard.index)
+        for table, data in tables.items():
+            row_counts[table] += buffers[table].add(writer, data)
         
-        if len(batch) >= BATCH_SIZE:
-            writer.write_batch('payments', batch)
-            total_written += len(batch)
-            batch = []
-            pbar.set_postfix({'written': f'{total_written:,}'})
+        if pbar is not None:
+            pbar.update(hi - lo)
     
-    if batch:
-        writer.write_batch('payments', batch)
-        total_written += len(batch)
+    for table, buffer in buffers.items():
+        row_counts[table] += buffer.flush(writer)
     
-    return total_written
+    return row_counts
 
 
-def generate_shipments(orders_data: List[dict], writer: DataWriter, fake: Faker) -> int:
+def generate_orders_with_items(
+    n_orders: int,
+    customer_ids: IdsLike,
+    max_address_id: int,
+    coupon_ids: IdsLike,
+    product_ids: IdsLike,
+    product_prices: np.ndarray,
+    coupons_df: pd.DataFrame,
+    writer: DataWriter,
+    fake: Faker,
+    rng: np.random.Generator,
+    as_of: Optional[datetime] = None,
+    rows: Optional[Tuple[int, int]] = None
+) -> Dict[str, int]:
     """
-    Generate and write shipments in batches.
+    Generate and write orders, their items, payments, shipments and coupon
+    usage in a single streaming pass.
+    
+    Each batch of orders is drawn at once by a vectorized NumPy engine, and
+    the payment, shipment and coupon usage rows are derived from that batch
+    before the next one is generated, so peak memory is bounded by the batch
+    size rather than by the number of orders. Payments and shipments draw
+    from their own random streams, so deriving them does not change the
+    orders that are drawn.
+    
+    Orders are generated in fixed-size shards of the order_id range, one
+    after another here; the pipeline runs the same shards on a process pool
+    and gets the same output.
     
     Args:
-        orders_data: List of order dictionaries
+        n_orders: Number of orders to generate
+        customer_ids: Customer IDs
+        max_address_id: Maximum address ID
+        coupon_ids: Coupon IDs
+        product_ids: Product IDs
+        product_prices: Prices in cents indexed by product ID (-1 where
+            unknown)
+        coupons_df: DataFrame of coupons
         writer: DataWriter instance
         fake: Faker instance
+        rng: NumPy random generator the shard seeds are drawn from
+        as_of: End of the order date window (default: now, UTC)
+        rows: Range of order rows (0-based, end-exclusive) to generate
+            instead of all of them; the rows and IDs are those of a full run
         
     Returns:
-        Total number of shipments generated
+        Dict mapping each written table to its row count
     """
-    batch = []
-    shipment_id = 1
-    total_written = 0
-    
-    pbar = tqdm(orders_data, desc="  Shipments", unit="orders", ncols=80)
-    for order in pbar:
-        if order['status'] in ['shipped', 'delivered']:
-            order_date = order['order_date']
-            ship_date = order_date + timedelta(days=random.randint(1, 3))
-            
-            carrier = random.choice(SHIPPING_CARRIERS)
-            
-            if order['status'] == 'delivered':
-                delivery_date = ship_date + timedelta(days=random.randint(2, 7))
-                status = 'delivered'
-            else:
-                delivery_date = None
-                status = random.choice(['in_transit', 'out_for_delivery'])
-            
-            batch.append({
-                'shipment_id': shipment_id,
-                'order_id': order['order_id'],
-                'carrier': carrier,
-                'tracking_number': f"{carrier[:3].upper()}{random.randint(100000000000, 999999999999)}",
-                'shipped_date': ship_date,
-                'estimated_delivery': ship_date + timedelta(days=random.randint(3, 7)),
-                'actual_delivery': delivery_date,
-                'status': status,
-                'warehouse_code': random.choice(WAREHOUSES)[0]
-            })
-            shipment_id += 1
-        
-        if len(batch) >= BATCH_SIZE:
-            writer.write_batch('shipments', batch)
-            total_written += len(batch)
-            batch = []
-            pbar.set_postfix({'written': f'{total_written:,}'})
+    if as_of is None:
+        as_of = datetime.now(timezone.utc).replace(tzinfo=None)
     
-    if batch:
-        writer.write_batch('shipments', batch)
-        total_written += len(batch)
+    engine = OrderEngine(
+        customer_ids, max_address_id, coupon_ids, product_ids,
+        product_prices, coupons_df, as_of
+    )
+    shards = plan_order_shards(n_orders, engine.has_coupons, rng, rows)
     
-    return total_written
-
+    row_counts = {table: 0 for table in ['orders'] + DERIVED_TABLES}
+    
+    pbar = tqdm(total=sum(shard.n_orders for shard in shards), desc="  Orders + Items", unit="orders", ncols=80,
+                disable=not config.SHOW_PROGRESS)
+    for shard in shards:
+        for table, count in generate_order_shard(engine, shard, writer, fake, pbar).items():
+            row_counts[table] += count
+        pbar.set_postfix({
+            'orders': f"{row_counts['orders']:,}",
+            'items': f"{row_counts['order_items']:,}"
+        })
+    pbar.close()
+    
+    return row_counts
@@ -2,15 +2,134 @@
 Product, product images, and inventory data generators.
 """
 
-import random
-from typing import Dict, List, Tuple
+from datetime import datetime
+from typing import Optional, Tuple
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 from faker import Faker
 from tqdm import tqdm
 
-from ..config import BATCH_SIZE, CATEGORY_BRANDS, WAREHOUSES
-from ..writers import DataWriter
+from .. import config
+from ..config import CATEGORY_BRANDS, WAREHOUSES
+from ..dates import default_as_of, random_dates
+from ..fanout import distinct_choices, fan_out
+from ..ids import IdSpace, IdsLike
+from ..sampling import IMAGES_PER_PRODUCT
+from ..schema import to_arrow_table
+from ..seeding import block_generator, row_blocks
+from ..text import TextEngine
+from ..writers import BlockBuffer, DataWriter
+
+
+class CatalogIndex:
+    """
+    Lookup arrays for drawing products, built once from CATEGORY_BRANDS.
+    
+    Brands and product templates are stored per category as contiguous
+    slices of flat arrays, so a batch of products picks its category, brand
+    and template by array indexing.
+    """
+    
+    def __init__(self, categories_df: pd.DataFrame, brands_df: pd.DataFrame):
+        """
+        Build the index.
+        
+        Args:
+            categories_df: DataFrame of categories
+            brands_df: DataFrame of brands
+        """
+        category_ids = dict(zip(categories_df['category_name'], categories_df['category_id']))
+        brand_ids = dict(zip(brands_df['brand_name'], brands_df['brand_id']))
+        
+        names = list(CATEGORY_BRANDS.keys())
+        self.category_ids = np.array([category_ids[name] for name in names], dtype=np.int64)
+        self.sku_prefixes = np.array([f"SKU-{name[:3].upper()}-" for name in names], dtype=object)
+        
+        brands = [CATEGORY_BRANDS[name]['brands'] for name in names]
+        self.brand_counts = np.array([len(b) for b in brands], dtype=np.int64)
+        self.brand_starts = np.concatenate([[0], np.cumsum(self.brand_counts)[:-1]])
+        self.brand_names = np.array([brand for b in brands for brand in b], dtype=object)
+        # Brands missing from brands_df fall back to brand 1
+        self.brand_ids = np.array([brand_ids.get(brand, 1) for b in brands for brand in b], dtype=np.int64)
+        
+        templates = [CATEGORY_BRANDS[name]['products'] for name in names]
+        self.template_counts = np.array([len(t) for t in templates], dtype=np.int64)
+        self.template_starts = np.concatenate([[0], np.cumsum(self.template_counts)[:-1]])
+        flat = [template for t in templates for template in t]
+        # Templates are split around their '{v}' version placeholder
+        self.template_heads = np.array([name.split('{v}')[0] for name, _, _ in flat], dtype=object)
+        self.template_tails = np.array([name.split('{v}', 1)[1] if '{v}' in name else '' for name, _, _ in flat], dtype=object)
+        self.template_versioned = np.array(['{v}' in name for name, _, _ in flat])
+        self.min_prices = np.array([low for _, low, _ in flat], dtype=np.float64)
+        self.max_prices = np.array([high for _, _, high in flat], dtype=np.float64)
+    
+    def draw(self, rng: np.random.Generator, n: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Draw the category, brand and template of n products.
+        
+        Returns:
+            Tuple of (category, brand, template) index arrays into the
+            index's per-category, flat brand and flat template arrays
+        """
+        category = rng.integers(len(self.category_ids), size=n)
+        brand = self.brand_starts[category] + rng.integers(0, self.brand_counts[category])
+        template = self.template_starts[category] + rng.integers(0, self.template_counts[category])
+        return category, brand, template
+
+
+def _product_block(
+    index: CatalogIndex,
+    key: int,
+    block: int,
+    text: TextEngine,
+    as_of: datetime
+) -> dict:
+    """Generate the columns of a whole block of products."""
+    rng = block_generator(key, block)
+    
+    n = config.ROW_BLOCK_SIZE
+    product_ids = np.arange(block * n + 1, (block + 1) * n + 1, dtype=np.int64)
+    category, brand, template = index.draw(rng, n)
+    
+    versions = pc.cast(pa.array(rng.integers(1, 15, size=n, endpoint=True)), pa.string())
+    versions = pc.if_else(pa.array(index.template_versioned[template]), versions, '')
+    names = pc.binary_join_element_wise(
+        pa.array(index.brand_names[brand], pa.string()),
+        pc.binary_join_element_wise(
+            pa.array(index.template_heads[template], pa.string()),
+            versions,
+            pa.array(index.template_tails[template], pa.string()),
+            ''
+        ),
+        ' '
+    )
+    
+    # Prices are in cents
+    low, high = index.min_prices[template], index.max_prices[template]
+    price = np.rint((low + rng.random(n) * (high - low)) * 100).astype(np.int64)
+    skus = pc.binary_join_element_wise(
+        pa.array(index.sku_prefixes[category], pa.string()),
+        pc.utf8_lpad(pc.cast(pa.array(product_ids), pa.string()), 6, '0'),
+        ''
+    )
+    
+    return {
+        'product_id': product_ids,
+        'product_name': names,
+        'category_id': index.category_ids[category],
+        'brand_id': index.brand_ids[brand],
+        'description': text.paragraphs(rng, n),
+        'price': price,
+        'cost_price': np.rint(price * rng.uniform(0.3, 0.6, size=n)).astype(np.int64),
+        'sku': skus,
+        'weight_kg': np.round(rng.uniform(0.1, 25.0, size=n), 2),
+        'is_active': rng.random(n) < 0.95,
+        'created_at': random_dates(rng, '-3y', 'today', n, as_of),
+        'rating_avg': np.round(rng.uniform(3.0, 5.0, size=n), 1)
+    }
 
 
 def generate_products(
@@ -18,156 +137,170 @@ def generate_products(
     categories_df: pd.DataFrame,
     brands_df: pd.DataFrame,
     writer: DataWriter,
-    fake: Faker
-) -> Tuple[List[int], Dict[int, float]]:
+    fake: Faker,
+    rng: np.random.Generator,
+    as_of: Optional[datetime] = None
+) -> Tuple[IdSpace, np.ndarray]:
     """
     Generate and write products in batches.
     
+    Products are drawn in blocks from counter-based random streams, so the
+    values do not depend on the batch size. Category, brand, template,
+    version and price are drawn for a whole block at once from a
+    CatalogIndex built before the first block.
+    
     Args:
         n: Number of products to generate
         categories_df: DataFrame of categories
         brands_df: DataFrame of brands
         writer: DataWriter instance
-        fake: Faker instance
+        fake: Faker instance whose lorem words feed the descriptions
+        rng: NumPy random generator the products' key is drawn from
+        as_of: Time relative dates are resolved against (default: start
+            of the current UTC day)
         
     Returns:
-        Tuple of (product IDs list, product prices dict)
+        Tuple of (IdSpace of product IDs, prices in cents indexed by
+        product ID, with index 0 unused)
     """
-    batch = []
+    key = int(rng.integers(2**63))
+    index = CatalogIndex(categories_df, brands_df)
+    text = TextEngine.from_faker(fake)
+    as_of = as_of or default_as_of()
+    product_prices = np.full(n + 1, -1, dtype=np.int64)
+    buffer = BlockBuffer('products')
     total_written = 0
-    category_list = list(CATEGORY_BRANDS.keys())
-    product_prices = {}
     
-    pbar = tqdm(range(1, n + 1), desc="  Products", unit="rows", ncols=80)
-    for i in pbar:
-        category_name = random.choice(category_list)
-        cat_data = CATEGORY_BRANDS[category_name]
-        
-        cat_id = categories_df[categories_df['category_name'] == category_name]['category_id'].values[0]
-        brand_name = random.choice(cat_data['brands'])
-        brand_row = brands_df[brands_df['brand_name'] == brand_name]
-        brand_id = brand_row['brand_id'].values[0] if len(brand_row) > 0 else 1
+    pbar = tqdm(total=n, desc="  Products", unit="rows", ncols=80,
+                disable=not config.SHOW_PROGRESS)
+    for block, lo, hi in row_blocks(0, n):
+        columns = _product_block(index, key, block, text, as_of)
+        first_id = block * config.ROW_BLOCK_SIZE + lo + 1
+        product_prices[first_id:first_id + hi - lo] = columns['price'][lo:hi]
+        total_written += buffer.add(writer, to_arrow_table('products', columns).slice(lo, hi - lo))
         
-        product_template, min_price, max_price = random.choice(cat_data['products'])
-        version = random.randint(1, 15)
-        product_name = product_template.format(v=version)
-        price = round(random.uniform(min_price, max_price), 2)
-        
-        product_prices[i] = price
-        
-        batch.append({
-            'product_id': i,
-            'product_name': f"{brand_name} {product_name}",
-            'category_id': cat_id,
-            'brand_id': brand_id,
-            'description': fake.paragraph(nb_sentences=3),
-            'price': price,
-            'cost_price': round(price * random.uniform(0.3, 0.6), 2),
-            'sku': f"SKU-{category_name[:3].upper()}-{i:06d}",
-            'weight_kg': round(random.uniform(0.1, 25.0), 2),
-            'is_active': random.choices([True, False], weights=[95, 5])[0],
-            'created_at': fake.date_between(start_date='-3y', end_date='today'),
-            'rating_avg': round(random.uniform(3.0, 5.0), 1)
-        })
-        
-        if len(batch) >= BATCH_SIZE:
-            writer.write_batch('products', batch)
-            total_written += len(batch)
-            batch = []
-            pbar.set_postfix({'written': f'{total_written:,}'})
-    
-    if batch:
-        writer.write_batch('products', batch)
-        total_written += len(batch)
+        pbar.update(hi - lo)
+        pbar.set_postfix({'written': f'{total_written:,}'})
+    total_written += buffer.flush(writer)
+    pbar.close()
     
-    return list(range(1, n + 1)), product_prices
+    return IdSpace.range(n), product_prices
 
 
-def generate_product_images(product_ids: List[int], writer: DataWriter, fake: Faker) -> int:
+def generate_product_images(
+    product_ids: IdsLike,
+    writer: DataWriter,
+    fake: Faker,
+    rng: np.random.Generator
+) -> int:
     """
     Generate and write product images in batches.
     
+    Each batch of products is expanded into its 1-5 images at once; the
+    first image of a product is its primary one.
+    
     Args:
-        product_ids: List of product IDs
+        product_ids: Product IDs
         writer: DataWriter instance
         fake: Faker instance
+        rng: NumPy random generator to draw from
         
     Returns:
         Total number of images generated
     """
-    batch = []
-    img_id = 1
+    product_ids = IdSpace.of(product_ids)
+    buffer = BlockBuffer('product_images')
+    next_id = 1
     total_written = 0
     
-    pbar = tqdm(product_ids, desc="  Product Images", unit="products", ncols=80)
-    for prod_id in pbar:
-        num_images = random.choices([1, 2, 3, 4, 5], weights=[20, 30, 30, 15, 5])[0]
-        for j in range(num_images):
-            batch.append({
-                'image_id': img_id,
-                'product_id': prod_id,
-                'image_url': f"https://cdn.example.com/products/{prod_id}/image_{j+1}.jpg",
-                'alt_text': f"Product {prod_id} image {j+1}",
-                'is_primary': j == 0,
-                'display_order': j + 1
-            })
-            img_id += 1
+    pbar = tqdm(total=len(product_ids), desc="  Product Images", unit="products", ncols=80,
+                disable=not config.SHOW_PROGRESS)
+    for start in range(0, len(product_ids), config.BATCH_SIZE):
+        parents = product_ids.ids_at(start, start + config.BATCH_SIZE)
+        images = fan_out(parents, IMAGES_PER_PRODUCT.sample(rng, len(parents)), next_id)
+        next_id += len(images.child_ids)
         
-        if len(batch) >= BATCH_SIZE:
-            writer.write_batch('product_images', batch)
-            total_written += len(batch)
-            batch = []
-            pbar.set_postfix({'written': f'{total_written:,}'})
-    
-    if batch:
-        writer.write_batch('product_images', batch)
-        total_written += len(batch)
+        product_strings = pc.cast(pa.array(images.parent_ids), pa.string())
+        ordinal_strings = pc.cast(pa.array(images.position + 1), pa.string())
+        columns = {
+            'image_id': images.child_ids,
+            'product_id': images.parent_ids,
+            'image_url': pc.binary_join_element_wise(
+                'https://cdn.example.com/products/', product_strings, '/image_', ordinal_strings, '.jpg', ''
+            ),
+            'alt_text': pc.binary_join_element_wise('Product', product_strings, 'image', ordinal_strings, ' '),
+            'is_primary': images.is_first,
+            'display_order': images.position + 1
+        }
+        total_written += buffer.add(writer, to_arrow_table('product_images', columns))
+        
+        pbar.update(len(parents))
+        pbar.set_postfix({'written': f'{total_written:,}'})
+    total_written += buffer.flush(writer)
+    pbar.close()
     
     return total_written
 
 
-def generate_inventory(product_ids: List[int], writer: DataWriter, fake: Faker) -> int:
+def generate_inventory(
+    product_ids: IdsLike,
+    writer: DataWriter,
+    fake: Faker,
+    rng: np.random.Generator,
+    as_of: Optional[datetime] = None
+) -> int:
     """
     Generate and write inventory in batches.
     
+    Products are expanded a block at a time into one record for each of the
+    1-4 distinct warehouses a product is stocked in. Each block draws from a
+    counter-based random stream of its own, so the records do not depend on
+    the batch size.
+    
     Args:
-        product_ids: List of product IDs
+        product_ids: Product IDs
         writer: DataWriter instance
         fake: Faker instance
+        rng: NumPy random generator the inventory's key is drawn from
+        as_of: Time relative dates are resolved against (default: start
+            of the current UTC day)
         
     Returns:
         Total number of inventory records generated
     """
-    batch = []
-    inv_id = 1
+    key = int(rng.integers(2**63))
+    product_ids = IdSpace.of(product_ids)
+    as_of = as_of or default_as_of()
+    max_warehouses = min(4, len(WAREHOUSES))
+    buffer = BlockBuffer('inventory')
+    next_id = 1
     total_written = 0
     
-    pbar = tqdm(product_ids, desc="  Inventory", unit="products", ncols=80)
-    for prod_id in pbar:
-        num_warehouses = random.randint(1, min(4, len(WAREHOUSES)))
-        warehouses = random.sample(WAREHOUSES, num_warehouses)
+    pbar = tqdm(total=len(product_ids), desc="  Inventory", unit="products", ncols=80,
+                disable=not config.SHOW_PROGRESS)
+    for block, lo, hi in row_blocks(0, len(product_ids)):
+        block_rng = block_generator(key, block)
+        block_start = block * config.ROW_BLOCK_SIZE
+        parents = product_ids.ids_at(block_start + lo, block_start + hi)
+        counts = block_rng.integers(1, max_warehouses, size=len(parents), endpoint=True)
+        records = fan_out(parents, counts, next_id)
+        n = len(records.child_ids)
+        next_id += n
         
-        for wh_code, city, state, country in warehouses:
-            batch.append({
-                'inventory_id': inv_id,
-                'product_id': prod_id,
-                'warehouse_code': wh_code,
-                'quantity_available': random.randint(0, 500),
-                'quantity_reserved': random.randint(0, 50),
-                'reorder_level': random.randint(10, 50),
-                'last_restocked': fake.date_between(start_date='-6m', end_date='today')
-            })
-            inv_id += 1
+        columns = {
+            'inventory_id': records.child_ids,
+            'product_id': records.parent_ids,
+            'warehouse_code': distinct_choices(block_rng, len(WAREHOUSES), counts),
+            'quantity_available': block_rng.integers(0, 500, size=n, endpoint=True, dtype=np.int32),
+            'quantity_reserved': block_rng.integers(0, 50, size=n, endpoint=True, dtype=np.int32),
+            'reorder_level': block_rng.integers(10, 50, size=n, endpoint=True, dtype=np.int32),
+            'last_restocked': random_dates(block_rng, '-6M', 'today', n, as_of)
+        }
+        total_written += buffer.add(writer, to_arrow_table('inventory', columns))
         
-        if len(batch) >= BATCH_SIZE:
-            writer.write_batch('inventory', batch)
-            total_written += len(batch)
-            batch = []
-            pbar.set_postfix({'written': f'{total_written:,}'})
-    
-    if batch:
-        writer.write_batch('inventory', batch)
-        total_written += len(batch)
+        pbar.update(len(parents))
+        pbar.set_postfix({'written': f'{total_written:,}'})
+    total_written += buffer.flush(writer)
+    pbar.close()
     
     return total_written
-
@@ -2,154 +2,208 @@
 Reviews, wishlists, and coupon usage data generators.
 """
 
-import random
-from typing import List
+from datetime import datetime
+from typing import Optional, Tuple
 
-import pandas as pd
+import numpy as np
+import pyarrow.compute as pc
 from faker import Faker
 from tqdm import tqdm
 
-from ..config import BATCH_SIZE, POSITIVE_PHRASES, NEUTRAL_PHRASES, NEGATIVE_PHRASES
-from ..writers import DataWriter
+from .. import config
+from ..config import POSITIVE_PHRASES, NEUTRAL_PHRASES, NEGATIVE_PHRASES
+from ..dates import default_as_of, random_dates
+from ..ids import IdSpace, IdsLike
+from ..sampling import REVIEW_RATING, WISHLIST_PRIORITY
+from ..schema import to_arrow_table
+from ..seeding import block_generator, row_blocks
+from ..text import TextEngine, phrase_choices
+from ..writers import BlockBuffer, DataWriter
+
+
+def _review_block(
+    key: int,
+    block: int,
+    customer_ids: IdSpace,
+    product_ids: IdSpace,
+    text: TextEngine,
+    as_of: datetime
+) -> dict:
+    """Generate the columns of a whole block of reviews."""
+    rng = block_generator(key, block)
+    
+    size = config.ROW_BLOCK_SIZE
+    start = block * size + 1
+    ratings = REVIEW_RATING.sample(rng, size)
+    
+    # The opening phrase follows the rating: positive for 4-5 stars,
+    # neutral for 3, negative for 1-2
+    sentiment = np.where(ratings >= 4, 0, np.where(ratings == 3, 1, 2))
+    openings = phrase_choices(rng, [POSITIVE_PHRASES, NEUTRAL_PHRASES, NEGATIVE_PHRASES], sentiment)
+    review_texts = pc.binary_join_element_wise(openings, text.sentences(rng, size, 5, 15), ' ')
+    
+    return {
+        'review_id': np.arange(start, start + size, dtype=np.int64),
+        'product_id': product_ids.sample(rng, size),
+        'customer_id': customer_ids.sample(rng, size),
+        'rating': ratings,
+        'title': text.sentences(rng, size, 3, 8, end=''),
+        'review_text': review_texts,
+        'verified_purchase': rng.random(size) < 0.8,
+        'helpful_votes': rng.integers(0, 500, size=size, endpoint=True, dtype=np.int32),
+        'review_date': random_dates(rng, '-3y', 'today', size, as_of)
+    }
 
 
 def generate_reviews(
     n: int,
-    customer_ids: List[int],
-    product_ids: List[int],
+    customer_ids: IdsLike,
+    product_ids: IdsLike,
     writer: DataWriter,
-    fake: Faker
+    fake: Faker,
+    rng: np.random.Generator,
+    rows: Optional[Tuple[int, int]] = None,
+    as_of: Optional[datetime] = None
 ) -> int:
     """
     Generate and write reviews in batches.
     
+    Reviews are drawn in blocks from counter-based random streams, so any
+    range of rows can be generated without the rows before it.
+    
     Args:
         n: Number of reviews to generate
-        customer_ids: List of customer IDs
-        product_ids: List of product IDs
+        customer_ids: Customer IDs
+        product_ids: Product IDs
         writer: DataWriter instance
-        fake: Faker instance
+        fake: Faker instance whose lorem words feed the text engine
+        rng: NumPy random generator the reviews' key is drawn from
+        rows: Range of rows (0-based, end-exclusive) to write instead of
+            all of them; the rows are those of a full run
+        as_of: Time relative dates are resolved against (default: start
+            of the current UTC day)
         
     Returns:
         Total number of reviews generated
     """
-    batch = []
+    key = int(rng.integers(2**63))
+    customer_ids = IdSpace.of(customer_ids)
+    product_ids = IdSpace.of(product_ids)
+    text = TextEngine.from_faker(fake)
+    as_of = as_of or default_as_of()
+    start, stop = rows if rows is not None else (0, n)
+    buffer = BlockBuffer('product_reviews')
     total_written = 0
     
-    pbar = tqdm(range(1, n + 1), desc="  Reviews", unit="rows", ncols=80)
-    for i in pbar:
-        rating = random.choices([1, 2, 3, 4, 5], weights=[5, 8, 15, 32, 40])[0]
-        
-        if rating >= 4:
-            base_text = random.choice(POSITIVE_PHRASES)
-        elif rating == 3:
-            base_text = random.choice(NEUTRAL_PHRASES)
-        else:
-            base_text = random.choice(NEGATIVE_PHRASES)
-        
-        review_text = f"{base_text} {fake.sentence(nb_words=random.randint(5, 15))}"
+    pbar = tqdm(total=stop - start, desc="  Reviews", unit="rows", ncols=80,
+                disable=not config.SHOW_PROGRESS)
+    for block, lo, hi in row_blocks(start, stop):
+        block_table = to_arrow_table('product_reviews', _review_block(key, block, customer_ids, product_ids, text, as_of))
+        total_written += buffer.add(writer, block_table.slice(lo, hi - lo))
         
-        batch.append({
-            'review_id': i,
-            'product_id': random.choice(product_ids),
-            'customer_id': random.choice(customer_ids),
-            'rating': rating,
-            'title': fake.sentence(nb_words=random.randint(3, 8)).rstrip('.'),
-            'review_text': review_text,
-            'verified_purchase': random.choices([True, False], weights=[80, 20])[0],
-            'helpful_votes': random.randint(0, 500),
-            'review_date': fake.date_between(start_date='-3y', end_date='today')
-        })
-        
-        if len(batch) >= BATCH_SIZE:
-            writer.write_batch('product_reviews', batch)
-            total_written += len(batch)
-            batch = []
-            pbar.set_postfix({'written': f'{total_written:,}'})
-    
-    if batch:
-        writer.write_batch('product_reviews', batch)
-        total_written += len(batch)
+        pbar.update(hi - lo)
+        pbar.set_postfix({'written': f'{total_written:,}'})
+    total_written += buffer.flush(writer)
+    pbar.close()
     
     return total_written
 
 
+def _wishlist_block(
+    key: int,
+    block: int,
+    customer_ids: IdSpace,
+    product_ids: IdSpace,
+    text: TextEngine,
+    as_of: datetime
+) -> dict:
+    """Generate the columns of a whole block of wishlist items."""
+    rng = block_generator(key, block)
+    
+    size = config.ROW_BLOCK_SIZE
+    start = block * size + 1
+    return {
+        'wishlist_id': np.arange(start, start + size, dtype=np.int64),
+        'customer_id': customer_ids.sample(rng, size),
+        'product_id': product_ids.sample(rng, size),
+        'added_date': random_dates(rng, '-2y', 'today', size, as_of),
+        'priority': WISHLIST_PRIORITY.indices(rng, size),
+        'notes': text.optional_sentences(rng, rng.random(size) < 0.2)
+    }
+
+
 def generate_wishlists(
     n: int,
-    customer_ids: List[int],
-    product_ids: List[int],
+    customer_ids: IdsLike,
+    product_ids: IdsLike,
     writer: DataWriter,
-    fake: Faker
+    fake: Faker,
+    rng: np.random.Generator,
+    rows: Optional[Tuple[int, int]] = None,
+    as_of: Optional[datetime] = None
 ) -> int:
     """
     Generate and write wishlists in batches.
     
+    Wishlist items are drawn in blocks from counter-based random streams,
+    so any range of rows can be generated without the rows before it.
+    
     Args:
         n: Number of wishlist items to generate
-        customer_ids: List of customer IDs
-        product_ids: List of product IDs
+        customer_ids: Customer IDs
+        product_ids: Product IDs
         writer: DataWriter instance
-        fake: Faker instance
+        fake: Faker instance whose lorem words feed the text engine
+        rng: NumPy random generator the wishlists' key is drawn from
+        rows: Range of rows (0-based, end-exclusive) to write instead of
+            all of them; the rows are those of a full run
+        as_of: Time relative dates are resolved against (default: start
+            of the current UTC day)
         
     Returns:
         Total number of wishlist items generated
     """
-    batch = []
+    key = int(rng.integers(2**63))
+    customer_ids = IdSpace.of(customer_ids)
+    product_ids = IdSpace.of(product_ids)
+    text = TextEngine.from_faker(fake)
+    as_of = as_of or default_as_of()
+    start, stop = rows if rows is not None else (0, n)
+    buffer = BlockBuffer('wishlists')
     total_written = 0
     
-    pbar = tqdm(range(1, n + 1), desc="  Wishlists", unit="rows", ncols=80)
-    for i in pbar:
-        batch.append({
-            'wishlist_id': i,
-            'customer_id': random.choice(customer_ids),
-            'product_id': random.choice(product_ids),
-            'added_date': fake.date_between(start_date='-2y', end_date='today'),
-            'priority': random.choices(['low', 'medium', 'high'], weights=[40, 40, 20])[0],
-            'notes': fake.sentence() if random.random() < 0.2 else None
-        })
+    pbar = tqdm(total=stop - start, desc="  Wishlists", unit="rows", ncols=80,
+                disable=not config.SHOW_PROGRESS)
+    for block, lo, hi in row_blocks(start, stop):
+        block_table = to_arrow_table('wishlists', _wishlist_block(key, block, customer_ids, product_ids, text, as_of))
+        total_written += buffer.add(writer, block_table.slice(lo, hi - lo))
         
-        if len(batch) >= BATCH_SIZE:
-            writer.write_batch('wishlists', batch)
-            total_written += len(batch)
-            batch = []
-            pbar.set_postfix({'written': f'{total_written:,}'})
-    
-    if batch:
-        writer.write_batch('wishlists', batch)
-        total_written += len(batch)
+        pbar.update(hi - lo)
+        pbar.set_postfix({'written': f'{total_written:,}'})
+    total_written += buffer.flush(writer)
+    pbar.close()
     
     return total_written
 
 
-def generate_coupon_usage(orders_data: List[dict], writer: DataWriter) -> int:
+def coupon_usage_for_orders(orders: dict, first_usage_id: int) -> dict:
     """
-    Generate and write coupon usage records.
+    Derive the coupon usage rows for a batch of orders.
     
     Args:
-        orders_data: List of order dictionaries
-        writer: DataWriter instance
+        orders: Order columns of one batch
+        first_usage_id: ID of the first usage record in the batch
         
     Returns:
-        Total number of coupon usage records generated
+        Coupon usage columns
     """
-    usage = []
-    usage_id = 1
-    
-    for order in orders_data:
-        if order['coupon_id'] is not None:
-            usage.append({
-                'usage_id': usage_id,
-                'coupon_id': order['coupon_id'],
-                'order_id': order['order_id'],
-                'customer_id': order['customer_id'],
-                'discount_applied': order['discount_amount'],
-                'used_at': order['order_date']
-            })
-            usage_id += 1
-    
-    if usage:
-        df = pd.DataFrame(usage)
-        writer.write_dataframe('coupon_usage', df)
-    
-    return len(usage)
-
+    used = ~np.ma.getmaskarray(orders['coupon_id'])
+    n = int(used.sum())
+    return {
+        'usage_id': np.arange(first_usage_id, first_usage_id + n, dtype=np.int64),
+        'coupon_id': np.ma.getdata(orders['coupon_id'])[used],
+        'order_id': orders['order_id'][used],
+        'customer_id': orders['customer_id'][used],
+        'discount_applied': orders['discount_amount'][used],
+        'used_at': orders['order_date'][used]
+    }
@@ -0,0 +1,103 @@
+"""
+Compact ID spaces passed between generators.
+
+Tables hand the IDs they generated to the tables that reference them. Most
+ID sets are contiguous ranges, so an IdSpace stores them as (start, stop)
+instead of a list of boxed ints; arbitrary ID sets fall back to a NumPy
+array. Either way sampling and length are vectorized or O(1), membership is
+O(1) or a binary search, and pickling an ID space to a worker process costs next to nothing.
+"""
+
+from typing import Iterable, Optional, Union
+
+import numpy as np
+
+
+class IdSpace:
+    """A set of integer IDs, backed by a contiguous range or a NumPy array."""
+
+    def __init__(self, start: int = 1, stop: int = 1, ids: Optional[np.ndarray] = None):
+        """
+        Initialize an ID space; use IdSpace.range or IdSpace.of instead.
+
+        Args:
+            start: First ID of a contiguous range
+            stop: ID after the last one of a contiguous range
+            ids: Explicit IDs, used instead of the range when given
+        """
+        self.start = start
+        self.stop = stop
+        self.ids = ids
+        self._sorted_ids = None  # Sorted copy of ids, made on the first membership test
+
+    @classmethod
+    def range(cls, n: int, start: int = 1) -> 'IdSpace':
+        """Return the contiguous IDs start, ..., start + n - 1."""
+        return cls(start, start + n)
+
+    @classmethod
+    def of(cls, ids: Union['IdSpace', Iterable[int]]) -> 'IdSpace':
+        """
+        Return an ID space for any collection of IDs.
+
+        ID spaces are returned as they are, and contiguous ascending IDs
+        are stored as a range.
+        """
+        if isinstance(ids, IdSpace):
+            return ids
+        if isinstance(ids, range) and ids.step == 1:
+            return cls(ids.start, max(ids.stop, ids.start))
+        ids = np.asarray(list(ids) if not isinstance(ids, np.ndarray) else ids, dtype=np.int64)
+        if len(ids) == 0:
+            return cls(1, 1)
+        if ids[-1] - ids[0] == len(ids) - 1 and (np.diff(ids) == 1).all():
+            return cls(int(ids[0]), int(ids[-1]) + 1)
+        return cls(ids=ids)
+
+    def __len__(self) -> int:
+        return self.stop - self.start if self.ids is None else len(self.ids)
+
+    def __contains__(self, value: int) -> bool:
+        if self.ids is None:
+            return self.start <= value < self.stop
+        if self._sorted_ids is None:
+            self._sorted_ids = np.sort(self.ids)
+        position = np.searchsorted(self._sorted_ids, value)
+        return bool(position < len(self._sorted_ids) and self._sorted_ids[position] == value)
+
+    def __repr__(self) -> str:
+        if self.ids is None:
+            return f"IdSpace({self.start}..{self.stop - 1})"
+        return f"IdSpace({len(self.ids)} ids)"
+
+    def max(self) -> int:
+        """Return the largest ID, or 0 for an empty space."""
+        if not len(self):
+            return 0
+        return self.stop - 1 if self.ids is None else int(self.ids.max())
+
+    def ids_at(self, start: int, stop: int) -> np.ndarray:
+        """Return the IDs at positions start to stop (end-exclusive)."""
+        if self.ids is None:
+            stop = min(stop, len(self))
+            return np.arange(self.start + start, self.start + max(stop, start), dtype=np.int64)
+        return self.ids[start:stop]
+
+    def to_numpy(self) -> np.ndarray:
+        """Return all IDs as an int64 array."""
+        return self.ids_at(0, len(self))
+
+    def sample(self, rng: np.random.Generator, n: int) -> np.ndarray:
+        """
+        Sample n IDs uniformly, with replacement.
+
+        Draws the same values as rng.choice over the same IDs as an array.
+        """
+        positions = rng.integers(0, len(self), size=n)
+        if self.ids is None:
+            return positions + self.start
+        return self.ids[positions]
+
+
+# Anything generators accept where they take IDs
+IdsLike = Union[IdSpace, Iterable[int]]
@@ -0,0 +1,237 @@
+"""
+Shard manifests and the merge step for multi-host generation.
+
+A run started with --shard I/N writes a disjoint part of every large table and
+a full copy of every reference table, plus a manifest with the row counts and
+ID ranges of its files and the content hashes of its reference tables. merge_shards checks that a set of shard directories
+fits together and combines them into one dataset: a directory per table with
+one Parquet part file per shard, linked from the shard directories instead of
+being rewritten.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from typing import Any, Dict, List, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .pipeline import SHARDED_TASKS, SLICE_TABLES
+from .schema import TABLE_SCHEMAS, get_schema
+
+MANIFEST_FILE = '_manifest.json'
+MANIFEST_VERSION = 2
+
+# Tables split between shards; every other table is a reference table
+SHARDED_TABLES = [table for task in SHARDED_TASKS for table in SLICE_TABLES.get(task, [task])]
+
+# Parameters that must match for shards to belong to the same dataset
+SIZE_PARAMS = ['customers', 'products', 'orders', 'reviews', 'wishlists', 'coupons']
+
+
+def _id_range(path: str, table_name: str) -> Optional[List[int]]:
+    """
+    Read the range of a table file's ID column (its first column) from the
+    row group statistics, without reading the data.
+    """
+    if not pa.types.is_integer(get_schema(table_name).field(0).type):
+        return None
+
+    metadata = pq.ParquetFile(path).metadata
+    lows, highs = [], []
+    for i in range(metadata.num_row_groups):
+        statistics = metadata.row_group(i).column(0).statistics
+        if statistics is None or not statistics.has_min_max:
+            return None
+        lows.append(statistics.min)
+        highs.append(statistics.max)
+    return [min(lows), max(highs)] if lows else None
+
+
+def _file_hash(path: str) -> str:
+    """Return the SHA-256 of a file's bytes, which are the same on every shard for a reference table."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_shard_manifest(
+    parquet_dir: str,
+    params: Dict[str, Any],
+    master_seed: int,
+    shard: int,
+    shards: int,
+    row_counts: Dict[str, int]
+) -> str:
+    """
+    Write the manifest of a shard's output directory.
+
+    Args:
+        parquet_dir: Directory the shard was written to
+        params: Pipeline parameters the shard was generated with
+        master_seed: Master seed of the run
+        shard: Index of the shard (0-based)
+        shards: Number of shards
+        row_counts: Rows written per table
+
+    Returns:
+        Path of the manifest
+    """
+    tables = {}
+    for table_name in TABLE_SCHEMAS:
+        file_name = f"{table_name}.parquet"
+        path = os.path.join(parquet_dir, file_name)
+        exists = os.path.exists(path)
+        sharded = table_name in SHARDED_TABLES
+        tables[table_name] = {
+            'file': file_name if exists else None,
+            'rows': row_counts.get(table_name, 0),
+            'sharded': sharded,
+            'id_range': _id_range(path, table_name) if exists else None,
+            'sha256': _file_hash(path) if exists and not sharded else None,
+        }
+
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'seed': master_seed,
+        'shard': shard,
+        'shards': shards,
+        'as_of': params['as_of'].isoformat(),
+        'sizes': {name: params[name] for name in SIZE_PARAMS},
+        'rows': {name: list(rows) for name, rows in params.get('rows', {}).items()},
+        'tables': tables,
+    }
+
+    manifest_path = os.path.join(parquet_dir, MANIFEST_FILE)
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest_path
+
+
+def read_manifest(directory: str) -> Dict[str, Any]:
+    """Read the manifest of a shard or merged output directory."""
+    manifest_path = os.path.join(directory, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        raise ValueError(f"No {MANIFEST_FILE} in '{directory}'; was it written with --shard?")
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    if manifest.get('version') != MANIFEST_VERSION:
+        raise ValueError(f"Unsupported manifest version in '{directory}': {manifest.get('version')}")
+    return manifest
+
+
+def _check_shards(manifests: List[Dict[str, Any]], shard_dirs: List[str]):
+    """Check that the manifests, in shard order, describe all shards of one dataset."""
+    first = manifests[0]
+    for directory, manifest in zip(shard_dirs, manifests):
+        for field in ['seed', 'shards', 'as_of', 'sizes']:
+            if manifest[field] != first[field]:
+                raise ValueError(
+                    f"Shard '{directory}' has {field} {manifest[field]!r}, "
+                    f"expected {first[field]!r} as in '{shard_dirs[0]}'"
+                )
+
+    indices = sorted(manifest['shard'] for manifest in manifests)
+    if indices != list(range(first['shards'])):
+        raise ValueError(f"Expected shards 0..{first['shards'] - 1} exactly once, got {indices}")
+
+    for table_name in TABLE_SCHEMAS:
+        entries = [manifest['tables'][table_name] for manifest in manifests]
+        if table_name not in SHARDED_TABLES:
+            # Reference tables must be byte for byte the same on every shard
+            for manifest, entry in zip(manifests, entries):
+                for field in ['rows', 'id_range', 'sha256']:
+                    if entry[field] != entries[0][field]:
+                        raise ValueError(
+                            f"Reference table '{table_name}' of shard {manifest['shard']} has {field} "
+                            f"{entry[field]!r}, expected {entries[0][field]!r} as in shard {manifests[0]['shard']}"
+                        )
+            continue
+
+        # The shards' ID ranges must follow each other without gaps or overlaps
+        next_id = 1
+        for manifest, entry in zip(manifests, entries):
+            if entry['id_range'] is None:
+                continue
+            low, high = entry['id_range']
+            if low != next_id or high - low + 1 != entry['rows']:
+                raise ValueError(
+                    f"Table '{table_name}' of shard {manifest['shard']} has IDs {low}..{high} "
+                    f"({entry['rows']:,} rows), expected to start at {next_id}"
+                )
+            next_id = high + 1
+
+
+def _link_or_copy(src: str, dst: str):
+    """Hard-link a file, or copy it where links are not possible."""
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+def merge_shards(shard_dirs: List[str], output_dir: str) -> Dict[str, Any]:
+    """
+    Combine the output directories of all shards into one dataset.
+
+    Every table becomes a directory of Parquet part files, one per shard
+    for the sharded tables and the copy of shard 0 for reference tables,
+    which pyarrow and most query engines read as a single table. Files are
+    hard-linked (or copied byte for byte), never decoded or rewritten.
+
+    Args:
+        shard_dirs: Output directories of the shards, in any order
+        output_dir: Directory for the merged dataset
+
+    Returns:
+        Manifest of the merged dataset
+    """
+    if not shard_dirs:
+        raise ValueError("No shard directories given")
+
+    shards = sorted(((read_manifest(directory), directory) for directory in shard_dirs),
+                    key=lambda pair: pair[0]['shard'])
+    manifests = [manifest for manifest, _ in shards]
+    _check_shards(manifests, [directory for _, directory in shards])
+
+    tables = {}
+    for table_name in TABLE_SCHEMAS:
+        sources = shards if table_name in SHARDED_TABLES else shards[:1]
+        table_dir = os.path.join(output_dir, table_name)
+        os.makedirs(table_dir, exist_ok=True)
+
+        files = []
+        for manifest, directory in sources:
+            entry = manifest['tables'][table_name]
+            if entry['file'] is None or entry['rows'] == 0:
+                continue
+            part_name = f"part-{manifest['shard']:05d}.parquet"
+            _link_or_copy(os.path.join(directory, entry['file']), os.path.join(table_dir, part_name))
+            files.append({'file': os.path.join(table_name, part_name), 'rows': entry['rows'],
+                          'id_range': entry['id_range']})
+
+        ranges = [part['id_range'] for part in files if part['id_range'] is not None]
+        tables[table_name] = {
+            'files': files,
+            'rows': sum(part['rows'] for part in files),
+            'id_range': [ranges[0][0], ranges[-1][1]] if ranges else None,
+        }
+
+    first = manifests[0]
+    merged = {
+        'version': MANIFEST_VERSION,
+        'seed': first['seed'],
+        'shards': first['shards'],
+        'as_of': first['as_of'],
+        'sizes': first['sizes'],
+        'tables': tables,
+    }
+    with open(os.path.join(output_dir, MANIFEST_FILE), 'w') as f:
+        json.dump(merged, f, indent=2)
+    return merged
@@ -0,0 +1,40 @@
+"""
+Merge the output directories of --shard runs into one dataset.
+
+Run with: uv run -m faker_ecommerce.merge --output DIR SHARD_DIR [SHARD_DIR ...]
+"""
+
+import argparse
+import sys
+
+from .manifest import merge_shards
+
+
+def main():
+    """Entry point for merging shard outputs."""
+    parser = argparse.ArgumentParser(
+        prog='faker_ecommerce.merge',
+        description="Merge the Parquet output of all --shard runs into one dataset without rewriting data files."
+    )
+    parser.add_argument(
+        "shard_dirs", nargs='+', metavar="SHARD_DIR",
+        help="Output directories of the shards (--parquet-dir of each run)"
+    )
+    parser.add_argument(
+        "--output", type=str, required=True,
+        help="Directory for the merged dataset"
+    )
+    args = parser.parse_args()
+    
+    try:
+        manifest = merge_shards(args.shard_dirs, args.output)
+    except ValueError as e:
+        sys.exit(f"❌ {e}")
+    
+    print(f"✅ Merged {manifest['shards']} shards into {args.output}")
+    for table, entry in manifest['tables'].items():
+        print(f"     {table}: {entry['rows']:,} rows in {len(entry['files'])} files")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Encoding settings for the Parquet files written.
+
+Every table is written with the same ParquetOptions unless a table has
+options of its own. The options choose the compression codec and level,
+the size of the row groups, which columns are dictionary-encoded, which
+statistics are written, and the columns rows are sorted by within each row
+group, so CPU time can be traded for file size and files can be tuned for
+the engines that scan them.
+"""
+
+from typing import Any, Dict, NamedTuple, Optional, Tuple, Union
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .schema import get_schema
+
+CODECS = ['zstd', 'snappy', 'lz4', 'none']
+
+
+class ParquetOptions(NamedTuple):
+    """Parquet writer settings for a table."""
+    codec: str = 'snappy'
+    level: Optional[int] = None  # Codec's default if None
+    row_group_rows: Optional[int] = None  # One row group per written batch if neither is set
+    row_group_bytes: Optional[int] = None  # Uncompressed Arrow size of a row group
+    dictionary: Union[bool, Tuple[str, ...]] = True  # All, none, or the named columns
+    statistics: Union[bool, Tuple[str, ...]] = True  # Min/max/null count per column chunk
+    page_index: bool = False  # Column and offset indexes with per-page statistics
+    sort_by: Tuple[str, ...] = ()  # Columns rows are sorted by within a row group
+
+    @property
+    def groups_rows(self) -> bool:
+        """Whether batches are collected into row groups of a target size."""
+        return self.row_group_rows is not None or self.row_group_bytes is not None
+
+    def writer_kwargs(self, schema: pa.Schema) -> Dict[str, Any]:
+        """Return the keyword arguments of pq.ParquetWriter for these options."""
+        kwargs = {
+            'compression': self.codec,
+            'compression_level': self.level,
+            'use_dictionary': list(self.dictionary) if isinstance(self.dictionary, tuple) else self.dictionary,
+            'write_statistics': list(self.statistics) if isinstance(self.statistics, tuple) else self.statistics,
+            'write_page_index': self.page_index,
+        }
+        if self.sort_by:
+            kwargs['sorting_columns'] = pq.SortingColumn.from_ordering(
+                schema, [(column, 'ascending') for column in self.sort_by]
+            )
+        return kwargs
+
+    def open_writer(self, where, schema: pa.Schema) -> pq.ParquetWriter:
+        """Open a ParquetWriter for a path or sink with these options."""
+        return pq.ParquetWriter(where, schema, **self.writer_kwargs(schema))
+
+    def sort(self, table: pa.Table) -> pa.Table:
+        """Sort the rows of a row group by sort_by, keeping ties in their order."""
+        if not self.sort_by:
+            return table
+        return table.sort_by([(column, 'ascending') for column in self.sort_by])
+
+    def row_group_full(self, num_rows: int, nbytes: int) -> bool:
+        """Whether collected rows fill a row group."""
+        if self.row_group_rows is not None and num_rows >= self.row_group_rows:
+            return True
+        return self.row_group_bytes is not None and nbytes >= self.row_group_bytes
+
+
+def check_options(options: ParquetOptions):
+    """Raise ValueError if the codec is unknown or doesn't take the compression level."""
+    if options.codec not in CODECS:
+        raise ValueError(f"Unknown codec '{options.codec}'; expected one of {', '.join(CODECS)}")
+    if options.level is not None and options.codec in ('snappy', 'none'):
+        raise ValueError(f"Codec '{options.codec}' doesn't take a compression level")
+
+
+def parse_columns(value: str) -> Union[bool, Tuple[str, ...]]:
+    """Parse 'all', 'none' or a '+'-separated list of columns."""
+    if value in ('all', 'true'):
+        return True
+    if value in ('none', 'false'):
+        return False
+    return tuple(value.split('+'))
+
+
+def _positive(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise ValueError(f"Expected a positive number, got {value}")
+    return number
+
+
+# Keys of a table's option spec and how their values are parsed into fields
+_SPEC_KEYS = {
+    'codec': ('codec', str),
+    'level': ('level', int),
+    'row_group_rows': ('row_group_rows', _positive),
+    'row_group_mb': ('row_group_bytes', lambda value: _positive(value) * 2**20),
+    'dictionary': ('dictionary', parse_columns),
+    'statistics': ('statistics', parse_columns),
+    'page_index': ('page_index', lambda value: parse_columns(value) is True),
+    'sort': ('sort_by', lambda value: tuple(value.split('+'))),
+}
+
+
+def parse_table_options(spec: str, base: ParquetOptions) -> Tuple[str, ParquetOptions]:
+    """
+    Parse a per-table option spec such as
+    'orders:codec=zstd,level=9,row_group_rows=100000,sort=customer_id+order_date'.
+
+    Columns are separated by '+'; dictionary and statistics also take 'all'
+    or 'none'. Settings the spec leaves out are taken from base.
+
+    Args:
+        spec: TABLE:KEY=VALUE,... string
+        base: Options of the tables without a spec of their own
+
+    Returns:
+        Tuple of (table name, options)
+    """
+    table_name, _, settings = spec.partition(':')
+    if not table_name or not settings:
+        raise ValueError(f"Expected TABLE:KEY=VALUE,..., got '{spec}'")
+
+    fields = {}
+    for setting in settings.split(','):
+        key, _, value = setting.partition('=')
+        if key not in _SPEC_KEYS or not value:
+            raise ValueError(f"Unknown Parquet option '{setting}'; expected one of {', '.join(_SPEC_KEYS)}")
+        field, parse = _SPEC_KEYS[key]
+        fields[field] = parse(value)
+    options = base._replace(**fields)
+    check_options(options)
+
+    columns = get_schema(table_name).names
+    for field in ('dictionary', 'statistics', 'sort_by'):
+        value = fields.get(field)
+        unknown = [column for column in value if column not in columns] if isinstance(value, tuple) else []
+        if unknown:
+            raise ValueError(f"Table '{table_name}' has no column {', '.join(unknown)}")
+    return table_name, options
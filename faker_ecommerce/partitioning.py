@@ -0,0 +1,240 @@
+"""
+Hive-partitioned Parquet datasets for the large, time-based tables.
+
+With --partition-by, each table in config.PARTITIONED_TABLES is written as a
+directory of Parquet files instead of one file, split by the month of its
+date column (year=2024/month=7) or by a hash bucket of its customer
+(customer_bucket=3), so query engines can skip the partitions a query does
+not touch. Tables that lack the column are split like the orders their rows
+belong to.
+"""
+
+import os
+import shutil
+from typing import Optional
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from . import config
+from .checkpoint import temporary_path
+from .parquet_options import ParquetOptions
+from .schema import get_schema
+
+PARTITION_SCHEMES = ['month', 'customer']
+
+
+def partition_keys(table_name: str, table: pa.Table, scheme: str) -> Optional[np.ndarray]:
+    """
+    Return the partition key of every row of a batch, or None if the table
+    has no column to derive it from and follows its orders instead.
+
+    Months are keyed as year * 12 + month - 1, customers by their bucket.
+
+    Args:
+        table_name: Name of the table
+        table: Batch of the table
+        scheme: 'month' or 'customer'
+    """
+    if scheme == 'month':
+        column = config.PARTITIONED_TABLES[table_name]
+        if column is None:
+            return None
+        dates = table[column]
+        return (pc.year(dates).to_numpy() * 12 + pc.month(dates).to_numpy() - 1).astype(np.int32)
+
+    if 'customer_id' not in table.column_names:
+        return None
+    return customer_buckets(table['customer_id'].to_numpy())
+
+
+def customer_buckets(customer_ids: np.ndarray) -> np.ndarray:
+    """
+    Hash customer IDs to config.PARTITION_BUCKETS buckets. The IDs are
+    multiplied by a large odd constant first, so consecutive customers are
+    spread over the buckets instead of cycling through them.
+    """
+    hashed = (customer_ids.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(32)
+    return (hashed % np.uint64(config.PARTITION_BUCKETS)).astype(np.int32)
+
+
+def partition_path(scheme: str, key: int) -> str:
+    """Return the Hive-style directory of a partition, relative to the table's directory."""
+    if scheme == 'month':
+        return os.path.join(f'year={key // 12}', f'month={key % 12 + 1}')
+    return f'customer_bucket={key}'
+
+
+class OrderPartitions:
+    """
+    Partition keys of the orders of one order shard, for the rows derived
+    from them. Only the current shard is kept, so the index never grows
+    beyond one shard's orders.
+    """
+
+    def __init__(self):
+        self.part = None  # Shard the indexed orders belong to
+        self.first_order_id = 0
+        self._blocks = []  # Keys of consecutive order blocks
+        self._keys = np.zeros(0, dtype=np.int32)
+
+    def add(self, order_ids: np.ndarray, keys: np.ndarray, part: int):
+        """
+        Index the keys of the next orders of a shard; orders of a new shard
+        replace the previous shard's.
+
+        Args:
+            order_ids: Consecutive order IDs
+            keys: Partition key of each order
+            part: Shard the orders belong to
+        """
+        if part != self.part:
+            self.part = part
+            self.first_order_id = int(order_ids[0]) if len(order_ids) else 0
+            self._blocks = []
+            self._keys = np.zeros(0, dtype=np.int32)
+        self._blocks.append(keys)
+
+    def lookup(self, order_ids: np.ndarray) -> np.ndarray:
+        """Return the partition keys of indexed orders."""
+        if self._blocks:
+            self._keys = np.concatenate([self._keys] + self._blocks)
+            self._blocks = []
+        return self._keys[order_ids - self.first_order_id]
+
+
+class PartitionedDataset:
+    """
+    Streams one table into a Hive-partitioned directory of Parquet files.
+
+    Each partition keeps one file open while it is written. Rows are held
+    back per partition until they fill a row group (of BATCH_SIZE rows,
+    unless the options set a target row group size), but
+    never more than PARTITION_BUFFER_BATCHES batches for the whole table:
+    beyond that the partition holding the most rows is written out. Memory
+    therefore stays bounded however many partitions there are. A file is
+    closed and the partition continues in a new one once it reaches
+    file_size bytes.
+
+    Files are named after the first ID written to the dataset, so datasets
+    appended to by different writers never collide. Every file is written
+    under a temporary name until the dataset is closed, and only then
+    renamed to its final name.
+    """
+
+    def __init__(
+        self,
+        table_name: str,
+        table_dir: str,
+        scheme: str,
+        file_size: int,
+        options: Optional[ParquetOptions] = None
+    ):
+        """
+        Initialize an empty dataset writer.
+
+        Args:
+            table_name: Name of the table
+            table_dir: Directory of the dataset
+            scheme: 'month' or 'customer'
+            file_size: Target size of a file in bytes
+            options: Encoding settings of the files
+        """
+        self.table_name = table_name
+        self.table_dir = table_dir
+        self.scheme = scheme
+        self.file_size = file_size
+        self.options = options or ParquetOptions()
+        self.prefix = None  # First ID written
+        self.files = {}  # Open (sink, ParquetWriter, path) per partition
+        self.file_counts = {}  # Files started per partition
+        self.closed_files = []  # Paths of the files closed but not yet renamed
+        self.pending = {}  # Batches held back per partition
+        self.pending_rows = {}
+
+    def write(self, table: pa.Table, keys: np.ndarray):
+        """
+        Split a batch by partition and write it.
+
+        Args:
+            table: Batch of the table
+            keys: Partition key of each row
+        """
+        if table.num_rows == 0:
+            return
+        if self.prefix is None:
+            self.prefix = table.column(0)[0].as_py()
+
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        bounds = np.flatnonzero(np.diff(sorted_keys)) + 1
+        for start, stop in zip(np.r_[0, bounds], np.r_[bounds, len(order)]):
+            key = int(sorted_keys[start])
+            self.pending.setdefault(key, []).append(table.take(order[start:stop]))
+            self.pending_rows[key] = self.pending_rows.get(key, 0) + int(stop - start)
+            if self._row_group_full(key):
+                self._write_partition(key)
+
+        while sum(self.pending_rows.values()) > config.PARTITION_BUFFER_BATCHES * config.BATCH_SIZE:
+            self._write_partition(max(self.pending_rows, key=self.pending_rows.get))
+
+    def _row_group_full(self, key: int) -> bool:
+        if not self.options.groups_rows:
+            return self.pending_rows[key] >= config.BATCH_SIZE
+        return self.options.row_group_full(self.pending_rows[key], sum(t.nbytes for t in self.pending[key]))
+
+    def _write_partition(self, key: int):
+        """Write the rows held back for a partition as one row group."""
+        tables = self.pending.pop(key)
+        self.pending_rows.pop(key)
+
+        if key not in self.files:
+            directory = os.path.join(self.table_dir, partition_path(self.scheme, key))
+            os.makedirs(directory, exist_ok=True)
+            count = self.file_counts.get(key, 0)
+            self.file_counts[key] = count + 1
+            path = os.path.join(directory, f'part-{self.prefix:012d}-{count:03d}.parquet')
+            sink = pa.OSFile(temporary_path(path), 'wb')
+            self.files[key] = (sink, self.options.open_writer(sink, get_schema(self.table_name)), path)
+
+        sink, pq_writer, _ = self.files[key]
+        pq_writer.write_table(self.options.sort(pa.concat_tables(tables).combine_chunks()))
+        if sink.tell() >= self.file_size:
+            self._close_file(key)
+
+    def _close_file(self, key: int):
+        sink, pq_writer, path = self.files.pop(key)
+        pq_writer.close()
+        sink.close()
+        self.closed_files.append(path)
+
+    def close(self):
+        """Write every held-back row, close all files and rename them to their final names."""
+        for key in sorted(self.pending):
+            self._write_partition(key)
+        for key in list(self.files):
+            self._close_file(key)
+        for path in self.closed_files:
+            os.replace(temporary_path(path), path)
+        self.closed_files = []
+
+    def abort(self):
+        """Close all files without publishing them, deleting what was written to them."""
+        for key in list(self.files):
+            sink, pq_writer, path = self.files.pop(key)
+            try:
+                pq_writer.close()
+                sink.close()
+            except Exception:
+                pass  # The file is deleted anyway
+            self.closed_files.append(path)
+        for path in self.closed_files:
+            os.remove(temporary_path(path))
+        self.pending, self.pending_rows, self.closed_files = {}, {}, []
+
+
+def clear_dataset(table_dir: str):
+    """Remove a table's dataset directory, so a new run does not mix with old files."""
+    if os.path.isdir(table_dir):
+        shutil.rmtree(table_dir)
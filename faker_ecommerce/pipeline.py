@@ -0,0 +1,568 @@
+"""
+Table generation pipeline with optional process-pool parallelism.
+
+Generation is split into tasks, one per table (orders also writes its items,
+payments, shipments and coupon usage). Each task is seeded from the master
+seed and its own name, and only receives the results of the tasks it depends
+on, so tasks without dependencies between them can run in any order and in
+any process while producing byte-identical output.
+
+Orders, which make up most of the rows, are further split into fixed-size
+shards of the order_id range that run as pool tasks of their own.
+
+Finished tasks and order shards are recorded in a RunCheckpoint if one is
+given, and skipped when an interrupted run is resumed.
+"""
+
+import copy
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from . import config
+from faker import Faker
+
+from .checkpoint import RunCheckpoint
+from .dates import default_as_of
+from .ids import IdSpace
+from .schema import TABLE_SCHEMAS
+from .seeding import derive_seed, seed_generators
+from .writers import DataWriter, NullWriter
+from .generators.orders import DERIVED_TABLES, OrderEngine, OrderShard
+from .generators import (
+    generate_categories,
+    generate_brands,
+    generate_warehouses,
+    generate_coupons,
+    generate_customers,
+    generate_addresses,
+    generate_products,
+    generate_product_images,
+    generate_inventory,
+    generate_orders_with_items,
+    generate_order_shard,
+    plan_order_shards,
+    generate_reviews,
+    generate_wishlists,
+)
+
+
+class TableTask(NamedTuple):
+    """A unit of generation work and the tasks whose results it needs."""
+    depends: Tuple[str, ...]
+    run: Callable[..., Tuple[Any, Dict[str, int]]]
+
+
+def _categories(params, inputs, writer, fake, rng):
+    df = generate_categories(writer)
+    return df, {'categories': len(df)}
+
+
+def _brands(params, inputs, writer, fake, rng):
+    df = generate_brands(writer)
+    return df, {'brands': len(df)}
+
+
+def _warehouses(params, inputs, writer, fake, rng):
+    df = generate_warehouses(writer)
+    return df, {'warehouses': len(df)}
+
+
+def _coupons(params, inputs, writer, fake, rng):
+    df = generate_coupons(params['coupons'], writer, fake, params['as_of'])
+    return df, {'coupons': len(df)}
+
+
+def _rows(params: Dict[str, Any], name: str) -> Optional[Tuple[int, int]]:
+    """Return the row range a task is restricted to, if any."""
+    return params.get('rows', {}).get(name)
+
+
+def _customers(params, inputs, writer, fake, rng):
+    customer_ids = generate_customers(
+        params['customers'], writer, fake, rng, _rows(params, 'customers'), params['as_of']
+    )
+    start, stop = _rows(params, 'customers') or (0, len(customer_ids))
+    return customer_ids, {'customers': stop - start}
+
+
+def _addresses(params, inputs, writer, fake, rng):
+    max_address_id, count = generate_addresses(inputs['customers'], writer, fake, rng, _rows(params, 'addresses'))
+    return max_address_id, {'addresses': count}
+
+
+def _products(params, inputs, writer, fake, rng):
+    product_ids, product_prices = generate_products(
+        params['products'], inputs['categories'], inputs['brands'], writer, fake, rng, params['as_of']
+    )
+    return (product_ids, product_prices), {'products': len(product_ids)}
+
+
+def _product_images(params, inputs, writer, fake, rng):
+    product_ids, _ = inputs['products']
+    return None, {'product_images': generate_product_images(product_ids, writer, fake, rng)}
+
+
+def _inventory(params, inputs, writer, fake, rng):
+    product_ids, _ = inputs['products']
+    return None, {'inventory': generate_inventory(product_ids, writer, fake, rng, params['as_of'])}
+
+
+def _orders(params, inputs, writer, fake, rng):
+    coupons_df = inputs['coupons']
+    coupon_ids = IdSpace.of(coupons_df['coupon_id'].to_numpy()) if len(coupons_df) > 0 else IdSpace.range(0)
+    product_ids, product_prices = inputs['products']
+    row_counts = generate_orders_with_items(
+        params['orders'], inputs['customers'], inputs['addresses'], coupon_ids,
+        product_ids, product_prices, coupons_df, writer, fake, rng,
+        as_of=params['as_of'], rows=_rows(params, 'orders')
+    )
+    return None, row_counts
+
+
+def _order_engine(params: Dict[str, Any], inputs: Dict[str, Any]) -> OrderEngine:
+    """Build the order engine from the results of the orders task's dependencies."""
+    coupons_df = inputs['coupons']
+    coupon_ids = IdSpace.of(coupons_df['coupon_id'].to_numpy()) if len(coupons_df) > 0 else IdSpace.range(0)
+    product_ids, product_prices = inputs['products']
+    return OrderEngine(
+        inputs['customers'], inputs['addresses'], coupon_ids, product_ids,
+        product_prices, coupons_df, params['as_of']
+    )
+
+
+def _orders_rng(master_seed: int):
+    """
+    Return the generator _run_task hands the orders task, which the orders'
+    key is drawn from, so shards planned outside the task match its own.
+    """
+    _, rng = seed_generators(derive_seed(master_seed, 'orders'))
+    return rng
+
+
+def _reviews(params, inputs, writer, fake, rng):
+    product_ids, _ = inputs['products']
+    count = generate_reviews(
+        params['reviews'], inputs['customers'], product_ids, writer, fake, rng,
+        _rows(params, 'product_reviews'), params['as_of']
+    )
+    return None, {'product_reviews': count}
+
+
+def _wishlists(params, inputs, writer, fake, rng):
+    product_ids, _ = inputs['products']
+    count = generate_wishlists(
+        params['wishlists'], inputs['customers'], product_ids, writer, fake, rng,
+        _rows(params, 'wishlists'), params['as_of']
+    )
+    return None, {'wishlists': count}
+
+
+# Tables that can be generated for any row range, and the tables written with them
+SLICE_TABLES = {
+    'customers': ['customers'],
+    'orders': ['orders'] + DERIVED_TABLES,
+    'product_reviews': ['product_reviews'],
+    'wishlists': ['wishlists'],
+}
+
+# Tasks whose rows are split between shards, and the size parameter they
+# are split by; addresses follow the customers they belong to
+SHARDED_TASKS = {
+    'customers': 'customers',
+    'addresses': 'customers',
+    'orders': 'orders',
+    'product_reviews': 'reviews',
+    'wishlists': 'wishlists',
+}
+
+# Per-table and per-connection load statistics a pool task hands back
+LoadStats = Tuple[Dict[str, Tuple[int, float]], Dict[str, Tuple[int, float]]]
+
+# Tasks in the order they are scheduled when their dependencies are ready
+TASKS = {
+    'categories': TableTask((), _categories),
+    'brands': TableTask((), _brands),
+    'warehouses': TableTask((), _warehouses),
+    'coupons': TableTask((), _coupons),
+    'customers': TableTask((), _customers),
+    'addresses': TableTask(('customers',), _addresses),
+    'products': TableTask(('categories', 'brands'), _products),
+    'orders': TableTask(('customers', 'addresses', 'coupons', 'products'), _orders),
+    'product_images': TableTask(('products',), _product_images),
+    'inventory': TableTask(('products',), _inventory),
+    'product_reviews': TableTask(('customers', 'products'), _reviews),
+    'wishlists': TableTask(('customers', 'products'), _wishlists),
+}
+
+
+def _run_task(
+    name: str,
+    params: Dict[str, Any],
+    inputs: Dict[str, Any],
+    writer: DataWriter,
+    master_seed: int
+) -> Tuple[Any, Dict[str, int]]:
+    """Seed the random sources for a task from its name and run it."""
+    fake, rng = seed_generators(derive_seed(master_seed, name))
+    task = TASKS[name]
+    return task.run(params, {dep: inputs[dep] for dep in task.depends}, writer, fake, rng)
+
+
+def _run_task_in_worker(
+    name: str,
+    params: Dict[str, Any],
+    inputs: Dict[str, Any],
+    writer: DataWriter,
+    master_seed: int
+) -> Tuple[Any, Dict[str, int], LoadStats]:
+    """Run a task with its own copy of the writer, in a pool process or inline."""
+    try:
+        result, row_counts = _run_task(name, params, inputs, writer, master_seed)
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close()
+    return result, row_counts, (writer.load_stats, writer.connection_stats)
+
+
+def _run_order_shard_in_worker(
+    engine: OrderEngine,
+    shard: OrderShard,
+    writer: DataWriter
+) -> Tuple[Dict[str, int], LoadStats]:
+    """Generate one order shard through a shard writer, in a pool process or inline."""
+    try:
+        row_counts = generate_order_shard(engine, shard, writer, Faker())
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close()
+    return row_counts, (writer.load_stats, writer.connection_stats)
+
+
+def _run_order_shard_direct(
+    engine: OrderEngine,
+    shard: OrderShard,
+    writer: DataWriter
+) -> Tuple[Dict[str, int], LoadStats]:
+    """
+    Generate one order shard straight into the run's writer, which keeps
+    its files open for the next shard; its load statistics are already the
+    writer's own.
+    """
+    return generate_order_shard(engine, shard, writer, Faker()), ({}, {})
+
+
+def _init_worker(batch_size: int):
+    """Apply the parent's settings in a freshly started pool process."""
+    config.BATCH_SIZE = batch_size
+    config.SHOW_PROGRESS = False
+
+
+class _InlineExecutor:
+    """Executor running every task in this process as it is submitted, for a single worker."""
+    
+    def submit(self, fn: Callable, *args) -> Future:
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except BaseException as error:
+            future.set_exception(error)
+        return future
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+def _unfinished_ranges(shards: List[OrderShard], finished: Set[int]) -> Dict[str, List[Tuple[int, Optional[int]]]]:
+    """
+    Return the ID ranges of each order table's rows in the shards that have
+    not finished, merging the ranges of consecutive shards.
+    """
+    ranges = {table: [] for table in ['orders'] + DERIVED_TABLES}
+    for position, shard in enumerate(shards):
+        if shard.index in finished:
+            continue
+        following = shards[position + 1] if position + 1 < len(shards) else None
+        starts = dict(shard.first_ids, orders=shard.first_order_id)
+        stops = dict(following.first_ids, orders=following.first_order_id) if following else {}
+        for table, start in starts.items():
+            stop = stops.get(table)
+            table_ranges = ranges[table]
+            if table_ranges and table_ranges[-1][1] == start:
+                table_ranges[-1] = (table_ranges[-1][0], stop)
+            else:
+                table_ranges.append((start, stop))
+    return ranges
+
+
+def _forget_lost_work(checkpoint: RunCheckpoint, writer: DataWriter):
+    """
+    Forget the finished tasks and order shards whose rows a PostgreSQL crash
+    has lost, so that they are generated again. Staging tables stay UNLOGGED
+    until finish_tables, and crash recovery empties unlogged tables, so a
+    table holding fewer rows than the checkpoint records has lost them.
+    """
+    stored = writer.table_row_counts(TABLE_SCHEMAS)
+    for name in TASKS:
+        if name == 'orders' or not checkpoint.task_done(name):
+            continue
+        if any(stored[table] < count for table, count in checkpoint.task(name)[1].items()):
+            print(f"  ⚠ {name}: rows lost in a PostgreSQL crash, generating again")
+            checkpoint.forget_task(name)
+    
+    # Rows of unfinished shards may still be there, so the order tables hold at least the finished shards' rows
+    shard_counts = checkpoint.order_shards().values()
+    if any(stored[table] < sum(counts.get(table, 0) for counts in shard_counts) for table in ['orders'] + DERIVED_TABLES):
+        print("  ⚠ orders: rows lost in a PostgreSQL crash, generating every shard again")
+        checkpoint.forget_order_shards()
+        if checkpoint.task_done('orders'):
+            checkpoint.forget_task('orders')
+
+
+def run_pipeline(
+    params: Dict[str, Any],
+    writer: DataWriter,
+    master_seed: int,
+    workers: int = 1,
+    checkpoint: Optional[RunCheckpoint] = None
+) -> Dict[str, int]:
+    """
+    Generate all 16 tables.
+
+    Tasks are scheduled as soon as the tasks they depend on have finished,
+    and each writes through its own copy of the writer. With one worker
+    every task runs in this process, one after another; with more they run
+    on a process pool. Order shards are loaded into PostgreSQL directly. For
+    Parquet, a single worker writes them one after another straight to the
+    output files; more workers write them to part files that are merged in
+    order_id order as the shards finish. The output is the same for any
+    number of workers.
+
+    With a checkpoint, every task and order shard is recorded once its rows
+    are committed, and the tasks and shards it already records are skipped;
+    rows an interrupted shard left in PostgreSQL are removed before it is
+    generated again, and work whose rows the UNLOGGED staging tables lost
+    in a server crash is done again. Parquet order shards are only kept
+    until they are merged, since their rows are committed with the tables.
+
+    Args:
+        params: Table sizes ('customers', 'products', 'orders', 'reviews',
+            'wishlists', 'coupons') and 'as_of', the end of the order window
+        writer: DataWriter instance
+        master_seed: Seed every table's seed is derived from
+        workers: Number of worker processes
+        checkpoint: Progress of the run, to record to and resume from
+
+    Returns:
+        Dict mapping each table to its row count, in schema order
+    """
+    results = {}
+    row_counts = {}
+
+    def record(name: str, result: Any, counts: Dict[str, int], resumed: bool = False):
+        results[name] = result
+        row_counts.update(counts)
+        for table, count in counts.items():
+            print(f"  {'↷' if resumed else '✓'} {table}: {count:,} rows{' (resumed)' if resumed else ''}")
+        if checkpoint is not None and not resumed:
+            checkpoint.record_task(name, result, counts)
+    
+    order_tables = ['orders'] + DERIVED_TABLES
+    order_counts = {table: 0 for table in order_tables}
+    order_shards = []
+    finished_shards = set()
+    merged_shards = 0
+    direct = False  # Whether the shards are written straight to the output, without part files to merge
+    
+    def merge_finished_shards():
+        # Merge finished shards into the output in shard order, and publish the tables after the last one
+        nonlocal merged_shards
+        while merged_shards < len(order_shards) and order_shards[merged_shards].index in finished_shards:
+            index = order_shards[merged_shards].index
+            if checkpoint is not None and writer.output_type == 'parquet':
+                # Merging removes the part files, and the merged rows are only kept once the tables are closed
+                checkpoint.forget_order_shard(index)
+            if not direct:
+                writer.merge_shard(index, order_tables)
+            merged_shards += 1
+        if merged_shards == len(order_shards):
+            writer.close_tables(order_tables)
+            record('orders', None, order_counts)
+    
+    pending = dict(TASKS)
+    if checkpoint is not None and writer.pg_staging and not checkpoint.finished:
+        _forget_lost_work(checkpoint, writer)
+    if checkpoint is not None:
+        for name in list(pending):
+            if checkpoint.task_done(name):
+                del pending[name]
+                record(name, *checkpoint.task(name), resumed=True)
+    
+    queued = []  # (name, shard index, function, arguments) of the pool tasks to submit
+    running = {}
+    if workers > 1:
+        executor = ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(config.BATCH_SIZE,)
+        )
+    else:
+        executor = _InlineExecutor()
+    with executor as pool:
+        while pending or queued or running:
+            ready = [name for name, task in pending.items()
+                     if all(dep in results for dep in task.depends)]
+            for name in ready:
+                del pending[name]
+                inputs = {dep: results[dep] for dep in TASKS[name].depends}
+                if name != 'orders':
+                    args = (name, params, inputs, copy.copy(writer), master_seed)
+                    queued.append((name, None, _run_task_in_worker, args))
+                    continue
+                
+                # Fan orders out to one pool task per shard, skipping the shards an interrupted run finished
+                engine = _order_engine(params, inputs)
+                order_shards = plan_order_shards(
+                    params['orders'], engine.has_coupons, _orders_rng(master_seed), _rows(params, 'orders')
+                )
+                done_shards = checkpoint.order_shards() if checkpoint is not None else {}
+                # Parquet order tables are rebuilt from the part files of every shard, finished ones included
+                writer.prepare_tables(order_tables, replace=not done_shards or writer.output_type == 'parquet')
+                if done_shards:
+                    writer.discard_rows(_unfinished_ranges(order_shards, set(done_shards)))
+                # A single worker writes Parquet shards one after another straight to the output files, instead
+                # of encoding them twice through part files
+                direct = workers == 1 and writer.output_type == 'parquet' and not done_shards
+                for shard in order_shards:
+                    if shard.index in done_shards:
+                        for table, count in done_shards[shard.index].items():
+                            order_counts[table] += count
+                        finished_shards.add(shard.index)
+                        continue
+                    if direct:
+                        queued.append((name, shard.index, _run_order_shard_direct, (engine, shard, writer)))
+                        continue
+                    args = (engine, shard, writer.shard_writer(shard.index))
+                    queued.append((name, shard.index, _run_order_shard_in_worker, args))
+                merge_finished_shards()
+            
+            # A single worker runs one task at a time, so each is recorded as soon as it has finished
+            while queued and (workers > 1 or not running):
+                name, shard_index, function, args = queued.pop(0)
+                running[pool.submit(function, *args)] = (name, shard_index)
+            
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, shard_index = running.pop(future)
+                if shard_index is None:
+                    result, counts, load_stats = future.result()
+                    writer.add_load_stats(*load_stats)
+                    record(name, result, counts)
+                    continue
+                
+                counts, load_stats = future.result()
+                writer.add_load_stats(*load_stats)
+                for table, count in counts.items():
+                    order_counts[table] += count
+                finished_shards.add(shard_index)
+                if checkpoint is not None and not direct:
+                    checkpoint.record_order_shard(shard_index, counts)
+                merge_finished_shards()
+    
+    writer.remove_shard_files()
+    return {table: row_counts[table] for table in TABLE_SCHEMAS if table in row_counts}
+
+
+def run_table_slice(
+    params: Dict[str, Any],
+    writer: DataWriter,
+    master_seed: int,
+    table: str,
+    start: int,
+    stop: int
+) -> Dict[str, int]:
+    """
+    Generate rows start:stop of a table without generating the rows before
+    them.
+    
+    The rows, and their IDs, are those of the same rows in a full run with
+    the same master seed, so slices can be used to rerun a failed range,
+    spot-check a large dataset or split generation across machines. The
+    tables the slice depends on are regenerated in memory but not written.
+    PostgreSQL tables are created if missing and appended to otherwise.
+    
+    Args:
+        params: Pipeline parameters, as for run_pipeline
+        writer: DataWriter instance
+        master_seed: Seed every table's seed is derived from
+        table: Table to slice, one of SLICE_TABLES
+        start: First row (0-based)
+        stop: Row after the last one
+        
+    Returns:
+        Dict mapping each written table to its row count
+    """
+    if table not in SLICE_TABLES:
+        raise ValueError(f"Row slices are not supported for table '{table}'")
+    
+    # Regenerate the tables the slice depends on, transitively
+    needed = set()
+    stack = list(TASKS[table].depends)
+    while stack:
+        name = stack.pop()
+        if name not in needed:
+            needed.add(name)
+            stack.extend(TASKS[name].depends)
+    
+    results = {}
+    null_writer = NullWriter()
+    for name in TASKS:
+        if name in needed:
+            results[name], _ = _run_task(name, params, results, null_writer, master_seed)
+    
+    writer.prepare_tables(SLICE_TABLES[table], replace=False)
+    _, row_counts = _run_task(table, dict(params, rows={table: (start, stop)}), results, writer, master_seed)
+    
+    for name, count in row_counts.items():
+        print(f"  ✓ {name}: {count:,} rows")
+    return row_counts
+
+
+def shard_rows(params: Dict[str, Any], shard: int, shards: int) -> Dict[str, Tuple[int, int]]:
+    """
+    Split the rows of the large tables between shards.
+    
+    Each sharded task gets a contiguous, disjoint range of its rows, so the
+    shards together cover every row exactly once.
+    
+    Args:
+        params: Pipeline parameters
+        shard: Index of the shard (0-based)
+        shards: Number of shards
+        
+    Returns:
+        Row range (0-based, end-exclusive) of each sharded task, to be
+        passed to run_pipeline as params['rows']
+    """
+    rows = {}
+    for name, size_param in SHARDED_TASKS.items():
+        n = params[size_param]
+        rows[name] = (n * shard // shards, n * (shard + 1) // shards)
+    return rows
+
+
+def default_params(args) -> Dict[str, Any]:
+    """Build pipeline parameters from parsed command-line arguments."""
+    # Anchor every date window at the start of the current UTC day, so runs
+    # on the same day see the same windows regardless of scheduling
+    return {
+        'customers': args.customers,
+        'products': args.products,
+        'orders': args.orders,
+        'reviews': args.reviews,
+        'wishlists': args.wishlists,
+        'coupons': args.coupons,
+        'as_of': default_as_of(),
+    }
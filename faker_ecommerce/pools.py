@@ -0,0 +1,103 @@
+"""
+Pools of Faker values for vectorized generation.
+
+Faker providers produce a few tens of thousands of values per second, far too
+slow to call once per row for millions of rows. A value pool draws a set of
+distinct values from a provider once per seed; whole batches then pick their
+values by NumPy index sampling from the pool. Pools suit low-cardinality
+fields such as names and cities. High-cardinality fields are built from parts
+instead: random digits filled into the locale's formats (numerify), combined
+with pooled values where needed, so they don't repeat every few thousand rows.
+"""
+
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+from faker import Faker
+
+from . import config
+from .seeding import derive_seed
+
+# Pools already drawn in this process, by (provider, seed, size)
+_POOLS: Dict[Tuple[str, int, int], np.ndarray] = {}
+
+
+def value_pool(fake: Faker, provider: str, seed: int, size: int = None) -> np.ndarray:
+    """
+    Return the pool of distinct values of a Faker provider for a seed.
+    
+    The pool is drawn on first use and cached, so blocks, shards and worker
+    processes that use the same seed sample from the same pool.
+    
+    Args:
+        fake: Faker instance to draw with; it is reseeded
+        provider: Name of the Faker provider method, e.g. 'first_name'
+        seed: Seed of the pool, usually the key of the table using it
+        size: Number of values to draw before deduplication
+            (default: config.VALUE_POOL_SIZE); see pool_size
+        
+    Returns:
+        Object array of distinct values, in the order first drawn
+    """
+    size = size or config.VALUE_POOL_SIZE
+    cache_key = (provider, seed, size)
+    pool = _POOLS.get(cache_key)
+    if pool is None:
+        fake.seed_instance(derive_seed(seed, provider))
+        draw = getattr(fake, provider)
+        values = list(dict.fromkeys(draw() for _ in range(size)))
+        pool = np.empty(len(values), dtype=object)
+        pool[:] = values
+        _POOLS[cache_key] = pool
+    return pool
+
+
+def pool_size(rows: int) -> int:
+    """
+    Return the size of the pools of a table of rows rows: no more values
+    than rows, so small runs don't pay for drawing a full pool.
+    """
+    return max(1, min(rows, config.VALUE_POOL_SIZE))
+
+
+def locale_formats(fake: Faker, provider: str, attribute: str) -> Sequence[str]:
+    """
+    Return formats a Faker provider of the Faker's (first) locale builds
+    values from, e.g. locale_formats(fake, 'phone_number', 'formats').
+    """
+    return getattr(fake.factories[0].provider(f'faker.providers.{provider}'), attribute)
+
+
+def numerify(formats: Sequence[str], rng: np.random.Generator, n: int) -> np.ndarray:
+    """
+    Fill n formats, picked uniformly, with random digits like Faker's
+    numerify: '#' becomes a digit 0-9, '%' 1-9 and '$' 2-9.
+    
+    Args:
+        formats: Formats to pick from, e.g. ('###-###-####', '(###)###-####')
+        rng: NumPy random generator
+        n: Number of values
+        
+    Returns:
+        Object array of n strings
+    """
+    choices = rng.integers(len(formats), size=n)
+    values = np.empty(n, dtype=object)
+    for i, template in enumerate(formats):
+        rows = np.flatnonzero(choices == i)
+        if len(rows) == 0:
+            continue
+        chars = np.frombuffer(template.encode(), dtype=np.uint8)
+        filled = np.tile(chars, (len(rows), 1))
+        for symbol, low in [('#', 0), ('%', 1), ('$', 2)]:
+            positions = np.flatnonzero(chars == ord(symbol))
+            if len(positions):
+                digits = rng.integers(low, 10, size=(len(rows), len(positions)), dtype=np.uint8)
+                filled[:, positions] = ord('0') + digits
+        values[rows] = np.char.decode(filled.view(f'S{len(chars)}').ravel(), 'utf-8')
+    return values
+
+
+def sample_pool(pool: np.ndarray, rng: np.random.Generator, n: int) -> np.ndarray:
+    """Sample n values uniformly, with replacement, from a pool."""
+    return pool[rng.integers(len(pool), size=n)]
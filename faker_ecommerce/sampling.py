@@ -0,0 +1,85 @@
+"""
+Weighted categorical sampling shared by the generators.
+
+Each distribution is compiled once into a cumulative distribution table.
+Vectorized generators draw whole columns from it with a single NumPy
+searchsorted. Code drawing one value at a time can use the scalar fast
+path, a bisect over the same table, instead of random.choices rebuilding
+its cumulative weights for every call.
+"""
+
+import bisect
+import random
+from typing import Any, Optional, Sequence
+
+import numpy as np
+
+from . import config
+
+
+class Categorical:
+    """A weighted distribution over a fixed list of values."""
+    
+    def __init__(self, values: Sequence[Any], weights: Optional[Sequence[float]] = None):
+        """
+        Compile a distribution.
+        
+        Args:
+            values: Values to sample from
+            weights: Relative weight of each value (default: uniform)
+        """
+        if weights is None:
+            weights = [1] * len(values)
+        if len(weights) != len(values) or not len(values):
+            raise ValueError("A distribution needs one weight per value and at least one value")
+        weights = np.asarray(weights, dtype=np.float64)
+        if (weights < 0).any() or weights.sum() <= 0:
+            raise ValueError("Weights must be non-negative with a positive sum")
+        
+        self.values = np.asarray(values, dtype=object if isinstance(values[0], str) else None)
+        self.probabilities = weights / weights.sum()
+        self.cdf = np.cumsum(weights) / weights.sum()
+        self.cdf[-1] = 1.0
+        self._value_list = list(values)
+        self._cdf_list = self.cdf.tolist()
+    
+    def __len__(self) -> int:
+        return len(self._value_list)
+    
+    def indices(self, rng: np.random.Generator, n: int) -> np.ndarray:
+        """Draw the indices of n values."""
+        return np.searchsorted(self.cdf, rng.random(n), side='right')
+    
+    def sample(self, rng: np.random.Generator, n: int) -> np.ndarray:
+        """Draw n values as an array."""
+        return self.values[self.indices(rng, n)]
+    
+    def draw(self, rnd: Any = random) -> Any:
+        """Draw a single value, from the global random module by default."""
+        return self._value_list[bisect.bisect_right(self._cdf_list, rnd.random())]
+
+
+# Distributions from config, compiled once at import
+ORDER_STATUS = Categorical(config.ORDER_STATUSES, config.ORDER_STATUS_WEIGHTS)
+ITEMS_PER_ORDER = Categorical(config.ITEMS_PER_ORDER, config.ITEMS_PER_ORDER_WEIGHTS)
+ITEM_QUANTITY = Categorical(config.ITEM_QUANTITIES, config.ITEM_QUANTITY_WEIGHTS)
+ITEM_DISCOUNT_RATE = Categorical(config.ITEM_DISCOUNT_RATES)
+SHIPPING_COST = Categorical(config.SHIPPING_COSTS)
+PAYMENT_METHOD = Categorical(config.PAYMENT_METHODS, config.PAYMENT_METHOD_WEIGHTS)
+CARD_TYPE = Categorical(config.CARD_TYPES)
+EMAIL_DOMAIN = Categorical(config.EMAIL_DOMAINS)
+GENDER = Categorical(config.CUSTOMER_GENDERS, config.CUSTOMER_GENDER_WEIGHTS)
+LANGUAGE = Categorical(config.PREFERRED_LANGUAGES)
+ADDRESSES_PER_CUSTOMER = Categorical(config.ADDRESSES_PER_CUSTOMER, config.ADDRESSES_PER_CUSTOMER_WEIGHTS)
+ADDRESS_COUNTRY = Categorical(config.ADDRESS_COUNTRIES, config.ADDRESS_COUNTRY_WEIGHTS)
+IMAGES_PER_PRODUCT = Categorical(config.IMAGES_PER_PRODUCT, config.IMAGES_PER_PRODUCT_WEIGHTS)
+REVIEW_RATING = Categorical(config.REVIEW_RATINGS, config.REVIEW_RATING_WEIGHTS)
+WISHLIST_PRIORITY = Categorical(config.WISHLIST_PRIORITIES, config.WISHLIST_PRIORITY_WEIGHTS)
+COUPON_PREFIX = Categorical(config.COUPON_PREFIXES)
+COUPON_DISCOUNT_TYPE = Categorical(config.DISCOUNT_TYPES)
+COUPON_PERCENT_VALUE = Categorical(config.COUPON_PERCENT_VALUES)
+COUPON_PERCENT_MIN_ORDER = Categorical(config.COUPON_PERCENT_MIN_ORDERS)
+COUPON_FIXED_VALUE = Categorical(config.COUPON_FIXED_VALUES)
+COUPON_FIXED_MIN_ORDER_MULTIPLE = Categorical(config.COUPON_FIXED_MIN_ORDER_MULTIPLES)
+COUPON_MAX_USES = Categorical(config.COUPON_MAX_USES)
+COUPON_ACTIVE = Categorical(config.COUPON_ACTIVE, config.COUPON_ACTIVE_WEIGHTS)
@@ -0,0 +1,597 @@
+"""
+Arrow schema registry for the 16 e-commerce tables.
+
+Every batch is built directly against the schema declared here, so column
+types and nullability are fixed up front instead of being re-inferred by
+pandas/pyarrow from the values of each batch.
+
+Low-cardinality string columns are dictionary-encoded against a fixed
+dictionary from config, so generators can emit integer codes and every
+batch, file and shard shares the same dictionary.
+"""
+
+from typing import Any, Iterable, List, Mapping, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from . import config
+
+# Anything DataWriter.write_batch accepts as a batch
+BatchData = Union[List[dict], Mapping[str, Any], pa.RecordBatch, pa.Table, pd.DataFrame]
+
+# Shared column types
+ID = pa.int64()
+MONEY = pa.decimal128(12, 2)  # Generated as int64 cents
+ENUM = pa.dictionary(pa.int8(), pa.string())  # Low-cardinality string columns
+DATE = pa.date32()
+TIMESTAMP = pa.timestamp('us')
+
+# Fixed dictionaries of the ENUM columns, by PostgreSQL enum type name; a
+# column's codes index into its type's values
+ENUM_TYPES = {
+    'brand_country': config.BRAND_COUNTRIES,
+    'country': config.ADDRESS_COUNTRIES,
+    'warehouse_code': [code for code, _, _, _ in config.WAREHOUSES],
+    'discount_type': config.DISCOUNT_TYPES,
+    'gender': config.CUSTOMER_GENDERS,
+    'language': config.PREFERRED_LANGUAGES,
+    'address_type': config.ADDRESS_TYPES,
+    'order_status': config.ORDER_STATUSES,
+    'payment_method': config.PAYMENT_METHODS,
+    'card_type': config.CARD_TYPES,
+    'currency': config.CURRENCIES,
+    'payment_status': config.PAYMENT_STATUSES,
+    'carrier': config.SHIPPING_CARRIERS,
+    'shipment_status': config.SHIPMENT_STATUSES,
+    'wishlist_priority': config.WISHLIST_PRIORITIES,
+}
+_DICTIONARIES = {name: pa.array(values, pa.string()) for name, values in ENUM_TYPES.items()}
+
+
+def _required(name: str, type_: pa.DataType, enum: Optional[str] = None) -> pa.Field:
+    return pa.field(name, type_, nullable=False, metadata={'enum': enum} if enum else None)
+
+
+def _optional(name: str, type_: pa.DataType, enum: Optional[str] = None) -> pa.Field:
+    return pa.field(name, type_, nullable=True, metadata={'enum': enum} if enum else None)
+
+
+TABLE_SCHEMAS = {
+    'categories': pa.schema([
+        _required('category_id', ID),
+        _required('category_name', pa.string()),
+        _optional('parent_category_id', ID),
+        _required('description', pa.string()),
+    ]),
+    'brands': pa.schema([
+        _required('brand_id', ID),
+        _required('brand_name', pa.string()),
+        _required('country_of_origin', ENUM, 'brand_country'),
+        _required('founded_year', pa.int16()),
+        _required('website', pa.string()),
+    ]),
+    'warehouses': pa.schema([
+        _required('warehouse_code', ENUM, 'warehouse_code'),
+        _required('warehouse_name', pa.string()),
+        _required('city', pa.string()),
+        _required('state', pa.string()),
+        _required('country', ENUM, 'country'),
+        _required('capacity_sqft', pa.int32()),
+        _required('manager_name', pa.string()),
+    ]),
+    'coupons': pa.schema([
+        _required('coupon_id', ID),
+        _required('coupon_code', pa.string()),
+        _required('description', pa.string()),
+        _required('discount_type', ENUM, 'discount_type'),
+        _required('discount_value', MONEY),
+        _required('min_order_amount', MONEY),
+        _optional('max_uses', pa.int32()),
+        _required('times_used', pa.int32()),
+        _required('start_date', DATE),
+        _required('end_date', DATE),
+        _required('is_active', pa.bool_()),
+    ]),
+    'customers': pa.schema([
+        _required('customer_id', ID),
+        _required('first_name', pa.string()),
+        _required('last_name', pa.string()),
+        _required('email', pa.string()),
+        _required('phone', pa.string()),
+        _required('date_of_birth', DATE),
+        _required('gender', ENUM, 'gender'),
+        _required('signup_date', DATE),
+        _required('is_active', pa.bool_()),
+        _required('loyalty_points', pa.int32()),
+        _required('preferred_language', ENUM, 'language'),
+    ]),
+    'addresses': pa.schema([
+        _required('address_id', ID),
+        _required('customer_id', ID),
+        _required('address_type', ENUM, 'address_type'),
+        _required('street_address', pa.string()),
+        _required('city', pa.string()),
+        _required('state', pa.string()),
+        _required('postal_code', pa.string()),
+        _required('country', ENUM, 'country'),
+        _required('is_default', pa.bool_()),
+    ]),
+    'products': pa.schema([
+        _required('product_id', ID),
+        _required('product_name', pa.string()),
+        _required('category_id', ID),
+        _required('brand_id', ID),
+        _required('description', pa.string()),
+        _required('price', MONEY),
+        _required('cost_price', MONEY),
+        _required('sku', pa.string()),
+        _required('weight_kg', pa.float64()),
+        _required('is_active', pa.bool_()),
+        _required('created_at', DATE),
+        _required('rating_avg', pa.float64()),
+    ]),
+    'product_images': pa.schema([
+        _required('image_id', ID),
+        _required('product_id', ID),
+        _required('image_url', pa.string()),
+        _required('alt_text', pa.string()),
+        _required('is_primary', pa.bool_()),
+        _required('display_order', pa.int16()),
+    ]),
+    'inventory': pa.schema([
+        _required('inventory_id', ID),
+        _required('product_id', ID),
+        _required('warehouse_code', ENUM, 'warehouse_code'),
+        _required('quantity_available', pa.int32()),
+        _required('quantity_reserved', pa.int32()),
+        _required('reorder_level', pa.int32()),
+        _required('last_restocked', DATE),
+    ]),
+    'orders': pa.schema([
+        _required('order_id', ID),
+        _required('customer_id', ID),
+        _required('shipping_address_id', ID),
+        _required('billing_address_id', ID),
+        _required('order_date', TIMESTAMP),
+        _required('status', ENUM, 'order_status'),
+        _required('subtotal', MONEY),
+        _required('discount_amount', MONEY),
+        _required('tax_amount', MONEY),
+        _required('shipping_cost', MONEY),
+        _required('total_amount', MONEY),
+        _optional('coupon_id', ID),
+        _optional('notes', pa.string()),
+    ]),
+    'order_items': pa.schema([
+        _required('order_item_id', ID),
+        _required('order_id', ID),
+        _required('product_id', ID),
+        _required('quantity', pa.int16()),
+        _required('unit_price', MONEY),
+        _required('discount', MONEY),
+        _required('total_price', MONEY),
+    ]),
+    'payments': pa.schema([
+        _required('payment_id', ID),
+        _required('order_id', ID),
+        _required('payment_method', ENUM, 'payment_method'),
+        _optional('card_type', ENUM, 'card_type'),
+        _optional('card_last_four', pa.string()),
+        _required('amount', MONEY),
+        _required('currency', ENUM, 'currency'),
+        _required('status', ENUM, 'payment_status'),
+        _required('transaction_id', pa.string()),
+        _required('payment_date', TIMESTAMP),
+    ]),
+    'shipments': pa.schema([
+        _required('shipment_id', ID),
+        _required('order_id', ID),
+        _required('carrier', ENUM, 'carrier'),
+        _required('tracking_number', pa.string()),
+        _required('shipped_date', DATE),
+        _required('estimated_delivery', DATE),
+        _optional('actual_delivery', DATE),
+        _required('status', ENUM, 'shipment_status'),
+        _required('warehouse_code', ENUM, 'warehouse_code'),
+    ]),
+    'product_reviews': pa.schema([
+        _required('review_id', ID),
+        _required('product_id', ID),
+        _required('customer_id', ID),
+        _required('rating', pa.int8()),
+        _required('title', pa.string()),
+        _required('review_text', pa.string()),
+        _required('verified_purchase', pa.bool_()),
+        _required('helpful_votes', pa.int32()),
+        _required('review_date', DATE),
+    ]),
+    'wishlists': pa.schema([
+        _required('wishlist_id', ID),
+        _required('customer_id', ID),
+        _required('product_id', ID),
+        _required('added_date', DATE),
+        _required('priority', ENUM, 'wishlist_priority'),
+        _optional('notes', pa.string()),
+    ]),
+    'coupon_usage': pa.schema([
+        _required('usage_id', ID),
+        _required('coupon_id', ID),
+        _required('order_id', ID),
+        _required('customer_id', ID),
+        _required('discount_applied', MONEY),
+        _required('used_at', TIMESTAMP),
+    ]),
+}
+
+
+# Primary key column of each table
+PRIMARY_KEYS = {
+    'categories': 'category_id',
+    'brands': 'brand_id',
+    'warehouses': 'warehouse_code',
+    'coupons': 'coupon_id',
+    'customers': 'customer_id',
+    'addresses': 'address_id',
+    'products': 'product_id',
+    'product_images': 'image_id',
+    'inventory': 'inventory_id',
+    'orders': 'order_id',
+    'order_items': 'order_item_id',
+    'payments': 'payment_id',
+    'shipments': 'shipment_id',
+    'product_reviews': 'review_id',
+    'wishlists': 'wishlist_id',
+    'coupon_usage': 'usage_id',
+}
+
+# Foreign keys as (table, column, referenced table); each references the
+# referenced table's primary key
+FOREIGN_KEYS = [
+    ('categories', 'parent_category_id', 'categories'),
+    ('addresses', 'customer_id', 'customers'),
+    ('products', 'category_id', 'categories'),
+    ('products', 'brand_id', 'brands'),
+    ('product_images', 'product_id', 'products'),
+    ('inventory', 'product_id', 'products'),
+    ('inventory', 'warehouse_code', 'warehouses'),
+    ('orders', 'customer_id', 'customers'),
+    ('orders', 'shipping_address_id', 'addresses'),
+    ('orders', 'billing_address_id', 'addresses'),
+    ('orders', 'coupon_id', 'coupons'),
+    ('order_items', 'order_id', 'orders'),
+    ('order_items', 'product_id', 'products'),
+    ('payments', 'order_id', 'orders'),
+    ('shipments', 'order_id', 'orders'),
+    ('shipments', 'warehouse_code', 'warehouses'),
+    ('product_reviews', 'product_id', 'products'),
+    ('product_reviews', 'customer_id', 'customers'),
+    ('wishlists', 'customer_id', 'customers'),
+    ('wishlists', 'product_id', 'products'),
+    ('coupon_usage', 'coupon_id', 'coupons'),
+    ('coupon_usage', 'order_id', 'orders'),
+    ('coupon_usage', 'customer_id', 'customers'),
+]
+
+# Secondary indexes as (table, column): the foreign key columns of the large
+# tables, which joins and cascades look rows up by, and order dates
+INDEXES = [
+    ('addresses', 'customer_id'),
+    ('orders', 'customer_id'),
+    ('orders', 'order_date'),
+    ('order_items', 'order_id'),
+    ('order_items', 'product_id'),
+    ('payments', 'order_id'),
+    ('shipments', 'order_id'),
+    ('product_reviews', 'product_id'),
+    ('product_reviews', 'customer_id'),
+    ('wishlists', 'customer_id'),
+    ('wishlists', 'product_id'),
+    ('coupon_usage', 'order_id'),
+]
+
+
+def get_schema(table_name: str) -> pa.Schema:
+    """Return the Arrow schema registered for a table."""
+    try:
+        return TABLE_SCHEMAS[table_name]
+    except KeyError:
+        raise ValueError(f"No schema registered for table '{table_name}'") from None
+
+
+def enum_type(field: pa.Field) -> Optional[str]:
+    """Return the enum type of a column, or None if it has no fixed dictionary."""
+    if field.metadata and b'enum' in field.metadata:
+        return field.metadata[b'enum'].decode()
+    return None
+
+
+def enum_code(enum: str, value: str) -> int:
+    """Return the code of a value in an enum type's dictionary."""
+    return ENUM_TYPES[enum].index(value)
+
+
+def _encode_enum(values: Any, type_: pa.DataType, enum: str) -> pa.DictionaryArray:
+    """
+    Encode one column against its enum type's fixed dictionary.
+
+    Integer NumPy arrays (optionally masked) are taken as codes as they are;
+    strings and dictionary arrays over other dictionaries are looked up by
+    value.
+    """
+    dictionary = _DICTIONARIES[enum]
+    if isinstance(values, pa.ChunkedArray):
+        values = values.combine_chunks()
+    if isinstance(values, pa.DictionaryArray):
+        if values.dictionary.equals(dictionary):
+            return pa.DictionaryArray.from_arrays(values.indices.cast(type_.index_type), dictionary)
+        values = values.dictionary_decode()
+    if isinstance(values, np.ndarray) and values.dtype.kind in 'iu':
+        return pa.DictionaryArray.from_arrays(pa.array(values, type_.index_type), dictionary)
+
+    if not isinstance(values, pa.Array):
+        values = pa.array(values, pa.string())
+    codes = pc.index_in(values, value_set=dictionary)
+    if codes.null_count != values.null_count:
+        unknown = pc.unique(values.filter(pc.and_(pc.is_null(codes), pc.is_valid(values))))
+        raise ValueError(f"Values {unknown.to_pylist()} are not in enum type '{enum}'")
+    return pa.DictionaryArray.from_arrays(codes.cast(type_.index_type), dictionary)
+
+
+def _decimal_array(values: Any, type_: pa.DataType) -> pa.Array:
+    """
+    Convert one column to a decimal array.
+
+    Integer NumPy arrays hold units of the type's scale, e.g. cents for
+    MONEY, and are wrapped as decimals without converting each value;
+    float arrays are rounded to the scale. Masked and NaN values are null.
+    """
+    if not isinstance(values, np.ndarray):
+        values = pa.array(values)
+        if not (pa.types.is_integer(values.type) or pa.types.is_floating(values.type)):
+            return values.cast(type_)
+        mask = values.is_null().to_numpy(zero_copy_only=False)
+        values = np.ma.masked_array(values.fill_null(0).to_numpy(), mask=mask)
+    if values.dtype.kind == 'f':
+        values = np.ma.masked_invalid(values)
+    mask = np.ma.getmaskarray(values) if np.ma.isMaskedArray(values) else None
+    data = np.ma.getdata(values)
+    if data.dtype.kind == 'f':
+        data = np.rint(np.where(mask, 0, data) * 10 ** type_.scale)
+    elif data.dtype.kind not in 'iu':
+        return pa.array(values, type=type_)
+
+    # Decimal128 values are 16-byte little-endian two's complement integers
+    units = np.empty((len(data), 2), dtype=np.int64)
+    units[:, 0] = data
+    units[:, 1] = units[:, 0] >> 63
+    validity = None
+    if mask is not None and mask.any():
+        validity = pa.py_buffer(np.packbits(~mask, bitorder='little'))
+    return pa.Array.from_buffers(type_, len(data), [validity, pa.py_buffer(units)])
+
+
+def to_arrow_array(values: Any, type_: pa.DataType, enum: Optional[str] = None) -> pa.Array:
+    """
+    Convert one column's values to an Arrow array of the given type.
+
+    Accepts Arrow arrays, NumPy arrays and plain Python sequences. Columns
+    of an enum type are encoded against its fixed dictionary; other
+    dictionary-encoded columns are encoded on the way in. Integer values of
+    decimal columns are units of the decimal's scale (cents for MONEY).
+    """
+    if enum is not None:
+        return _encode_enum(values, type_, enum)
+    if isinstance(values, (pa.Array, pa.ChunkedArray)):
+        return values if values.type == type_ else values.cast(type_)
+    if pa.types.is_decimal(type_):
+        return _decimal_array(values, type_)
+    if pa.types.is_dictionary(type_):
+        return pa.array(values, type=type_.value_type).cast(type_)
+    return pa.array(values, type=type_)
+
+
+def _encode_enums(table: pa.Table, schema: pa.Schema) -> pa.Table:
+    """Re-encode the enum columns of a table against their fixed dictionaries."""
+    for i, field in enumerate(schema):
+        enum = enum_type(field)
+        if enum is None:
+            continue
+        column = table.column(i)
+        if all(chunk.dictionary.equals(_DICTIONARIES[enum]) for chunk in column.chunks):
+            continue
+        table = table.set_column(i, field, _encode_enum(column, field.type, enum))
+    return table
+
+
+def to_arrow_table(table_name: str, data: BatchData) -> pa.Table:
+    """
+    Build an Arrow table for a batch against the table's registered schema.
+
+    Columnar batches (a mapping of column name to array, a RecordBatch or a
+    Table) are converted column by column without going through rows. Lists
+    of row dictionaries are still accepted as a compatibility path.
+
+    Args:
+        table_name: Name of the table
+        data: Mapping of column name to values, RecordBatch, Table,
+            DataFrame or list of row dictionaries
+
+    Returns:
+        Arrow table with exactly the registered columns and types
+    """
+    schema = get_schema(table_name)
+    if isinstance(data, pa.RecordBatch):
+        data = pa.Table.from_batches([data])
+    if isinstance(data, pa.Table):
+        return _encode_enums(data.select(schema.names).cast(schema), schema)
+    if isinstance(data, pd.DataFrame):
+        data = {name: data[name] for name in data.columns}
+    if isinstance(data, Mapping):
+        unknown = set(data) - set(schema.names)
+        missing = set(schema.names) - set(data)
+        if unknown or missing:
+            raise ValueError(
+                f"Columns for table '{table_name}' do not match its schema "
+                f"(missing: {sorted(missing)}, unknown: {sorted(unknown)})"
+            )
+        arrays = [to_arrow_array(data[field.name], field.type, enum_type(field)) for field in schema]
+        return pa.Table.from_arrays(arrays, schema=schema)
+    return _encode_enums(pa.Table.from_pylist(data, schema=schema), schema)
+
+
+def categorize(table_name: str, df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert the enum columns of a table's DataFrame to pandas Categoricals
+    over their fixed dictionaries.
+
+    Args:
+        table_name: Name of the table
+        df: DataFrame of the table's rows
+
+    Returns:
+        The DataFrame, converted in place
+    """
+    for field in get_schema(table_name):
+        enum = enum_type(field)
+        if enum is not None and field.name in df:
+            df[field.name] = pd.Categorical(df[field.name], categories=ENUM_TYPES[enum])
+    return df
+
+
+def _postgres_type(type_: pa.DataType) -> str:
+    """Map an Arrow type to the PostgreSQL column type used for it."""
+    if pa.types.is_dictionary(type_):
+        return _postgres_type(type_.value_type)
+    if pa.types.is_int8(type_) or pa.types.is_int16(type_):
+        return 'SMALLINT'
+    if pa.types.is_int32(type_):
+        return 'INTEGER'
+    if pa.types.is_int64(type_):
+        return 'BIGINT'
+    if pa.types.is_floating(type_):
+        return 'DOUBLE PRECISION'
+    if pa.types.is_decimal(type_):
+        return f'NUMERIC({type_.precision},{type_.scale})'
+    if pa.types.is_boolean(type_):
+        return 'BOOLEAN'
+    if pa.types.is_date(type_):
+        return 'DATE'
+    if pa.types.is_timestamp(type_):
+        return 'TIMESTAMP'
+    if pa.types.is_string(type_):
+        return 'TEXT'
+    raise ValueError(f"No PostgreSQL type mapping for Arrow type {type_}")
+
+
+def postgres_create_table(
+    table_name: str,
+    if_not_exists: bool = False,
+    enums: bool = False,
+    unlogged: bool = False
+) -> str:
+    """
+    Return the CREATE TABLE statement for a table's registered schema.
+
+    Keys, constraints and indexes are not part of it; see
+    postgres_primary_key, postgres_foreign_keys and postgres_indexes.
+
+    Args:
+        table_name: Name of the table
+        if_not_exists: Keep an existing table instead of failing
+        enums: Declare enum columns with their PostgreSQL enum types, which
+            postgres_create_enum_types creates, instead of TEXT
+        unlogged: Create an UNLOGGED table, which is loaded without writing
+            WAL and made durable later with SET LOGGED
+    """
+    def column_type(field: pa.Field) -> str:
+        enum = enum_type(field) if enums else None
+        return f'"{enum}"' if enum else _postgres_type(field.type)
+
+    columns = ',\n    '.join(
+        f'"{field.name}" {column_type(field)}{"" if field.nullable else " NOT NULL"}'
+        for field in get_schema(table_name)
+    )
+    exists_clause = 'IF NOT EXISTS ' if if_not_exists else ''
+    unlogged_clause = 'UNLOGGED ' if unlogged else ''
+    return f'CREATE {unlogged_clause}TABLE {exists_clause}"{table_name}" (\n    {columns}\n)'
+
+
+def postgres_create_enum_types(table_name: str) -> List[str]:
+    """
+    Return statements creating the PostgreSQL enum types a table's columns
+    use. Types that already exist, e.g. created for another table or by a
+    concurrent writer, are kept as they are.
+    """
+    statements = []
+    for enum in dict.fromkeys(filter(None, map(enum_type, get_schema(table_name)))):
+        labels = ', '.join("'" + value.replace("'", "''") + "'" for value in ENUM_TYPES[enum])
+        statements.append(
+            f'DO $$ BEGIN CREATE TYPE "{enum}" AS ENUM ({labels}); '
+            f'EXCEPTION WHEN duplicate_object OR unique_violation THEN NULL; END $$'
+        )
+    return statements
+
+
+def postgres_primary_key(table_name: str) -> str:
+    """Return the statement adding a table's primary key."""
+    return f'ALTER TABLE "{table_name}" ADD PRIMARY KEY ("{PRIMARY_KEYS[table_name]}")'
+
+
+def postgres_foreign_keys(table_names: Iterable[str]) -> List[Tuple[str, str, str]]:
+    """
+    Return the foreign keys between the given tables.
+
+    Each key is added NOT VALID, which only takes a brief lock, and checked
+    separately by VALIDATE CONSTRAINT, which lets other work on the tables
+    run meanwhile.
+
+    Returns:
+        List of (table, ADD CONSTRAINT statement, VALIDATE CONSTRAINT
+        statement)
+    """
+    table_names = set(table_names)
+    keys = []
+    for table_name, column, referenced in FOREIGN_KEYS:
+        if table_name not in table_names or referenced not in table_names:
+            continue
+        name = f'{table_name}_{column}_fkey'
+        keys.append((
+            table_name,
+            f'ALTER TABLE "{table_name}" ADD CONSTRAINT "{name}" FOREIGN KEY ("{column}") '
+            f'REFERENCES "{referenced}" ("{PRIMARY_KEYS[referenced]}") NOT VALID',
+            f'ALTER TABLE "{table_name}" VALIDATE CONSTRAINT "{name}"'
+        ))
+    return keys
+
+
+def postgres_indexes(table_names: Iterable[str]) -> List[str]:
+    """Return the statements creating the secondary indexes of the given tables."""
+    table_names = set(table_names)
+    return [
+        f'CREATE INDEX "{table_name}_{column}_idx" ON "{table_name}" ("{column}")'
+        for table_name, column in INDEXES if table_name in table_names
+    ]
+
+
+def postgres_drop_keys(table_names: Iterable[str]) -> List[str]:
+    """
+    Return the statements dropping the keys and indexes that the statements
+    above add to the given tables, if they exist, foreign keys first.
+    """
+    table_names = set(table_names)
+    statements = [
+        f'ALTER TABLE "{table_name}" DROP CONSTRAINT IF EXISTS "{table_name}_{column}_fkey"'
+        for table_name, column, _ in FOREIGN_KEYS if table_name in table_names
+    ]
+    statements += [
+        f'DROP INDEX IF EXISTS "{table_name}_{column}_idx"'
+        for table_name, column in INDEXES if table_name in table_names
+    ]
+    statements += [
+        f'ALTER TABLE "{table_name}" DROP CONSTRAINT IF EXISTS "{table_name}_pkey"'
+        for table_name in PRIMARY_KEYS if table_name in table_names
+    ]
+    return statements
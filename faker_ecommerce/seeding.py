@@ -0,0 +1,132 @@
+"""
+Deterministic seeding of the random number generators used by the generators.
+
+Each table is generated from its own seed, derived from the master seed and
+the table's name, so its output does not depend on which other tables were
+generated before it, in which process, or in which order.
+
+Tables that support random access draw from counter-based generators instead
+of one sequential stream: rows are grouped into fixed-size blocks, and each
+block gets a Philox generator keyed by the table's key with the block number
+in its counter, so any block can be generated without its predecessors.
+"""
+
+import random
+import zlib
+from typing import Callable, Dict, Iterator, List, Tuple
+
+import numpy as np
+from faker import Faker
+
+from . import config
+
+
+def derive_seed(master_seed: int, name: str) -> int:
+    """
+    Derive an independent 64-bit seed for a named stream from the master seed.
+
+    Args:
+        master_seed: Seed of the whole run
+        name: Name of the stream (usually a table name)
+
+    Returns:
+        Derived seed
+    """
+    entropy = [master_seed, zlib.crc32(name.encode('utf-8'))]
+    low, high = np.random.SeedSequence(entropy).generate_state(2, dtype=np.uint32)
+    return int(low) | (int(high) << 32)
+
+
+def seed_generators(seed: int) -> Tuple[Faker, np.random.Generator]:
+    """
+    Reset every random source the generators draw from to a given seed.
+
+    Seeds the global `random` module, the legacy global NumPy state and
+    Faker's shared random instance, then returns a fresh Faker instance and
+    NumPy Generator for the caller.
+
+    Args:
+        seed: Seed to apply
+
+    Returns:
+        Tuple of (Faker instance, NumPy random generator)
+    """
+    random.seed(seed)
+    np.random.seed(seed % 2**32)
+    Faker.seed(seed)
+    return Faker(), np.random.default_rng(seed)
+
+
+def block_generator(key: int, block: int, stream: int = 0) -> np.random.Generator:
+    """
+    Return the counter-based generator for one block of rows.
+    
+    Args:
+        key: Key of the table (up to 128 bits)
+        block: Block number
+        stream: Number of the stream within the block, for values that must
+            not shift when the number of draws from another stream changes
+            
+    Returns:
+        NumPy random generator over Philox keyed by the table's key, with
+        the counter starting at (block, stream)
+    """
+    return np.random.Generator(np.random.Philox(key=key, counter=[0, block, stream, 0]))
+
+
+def row_blocks(start: int, stop: int) -> Iterator[Tuple[int, int, int]]:
+    """
+    Split a row range into the blocks that cover it.
+    
+    Args:
+        start: First row (0-based)
+        stop: Row after the last one
+        
+    Yields:
+        Tuples of (block, first row kept, row after the last kept), with the
+        rows given as offsets within the block
+    """
+    block_size = config.ROW_BLOCK_SIZE
+    for block in range(start // block_size, -(-stop // block_size)):
+        block_start = block * block_size
+        yield block, max(start - block_start, 0), min(stop - block_start, block_size)
+
+
+def first_ids_at(
+    rows: List[int],
+    tables: List[str],
+    block_counts: Callable[[int], Dict[str, np.ndarray]]
+) -> List[Dict[str, int]]:
+    """
+    Compute where the ID sequences of child tables start at given rows of
+    their parent table, e.g. the first order_item_id of an order.
+    
+    Only the per-row child counts of the blocks before each row are needed,
+    which are usually drawn from a cheap stream of their own.
+    
+    Args:
+        rows: Parent rows (0-based, ascending)
+        tables: Child tables
+        block_counts: Function returning, for a block, the number of child
+            rows of each of its parent rows, per child table
+            
+    Returns:
+        First ID (1-based) of each child table at each row
+    """
+    block_size = config.ROW_BLOCK_SIZE
+    next_ids = {table: 1 for table in tables}
+    block = 0
+    result = []
+    for row in rows:
+        while (block + 1) * block_size <= row:
+            for table, counts in block_counts(block).items():
+                next_ids[table] += int(counts.sum())
+            block += 1
+        
+        ids = dict(next_ids)
+        offset = row - block * block_size
+        if offset:
+            for table, counts in block_counts(block).items():
+                ids[table] += int(counts[:offset].sum())
+        result.append(ids)
+    return result
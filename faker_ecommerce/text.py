@@ -0,0 +1,144 @@
+"""
+Vectorized free text for reviews, descriptions and notes.
+
+Faker builds sentences one at a time, which makes free-text columns the most
+expensive columns of several tables. The text engine builds a whole batch of
+sentences at once from a tokenized vocabulary: NumPy draws the sentence
+lengths and word indices, and Arrow joins the words of every sentence into
+strings.
+"""
+
+from typing import List, Sequence
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from faker import Faker
+
+
+def _join(offsets: np.ndarray, values: pa.Array, separator: str) -> pa.Array:
+    """Join consecutive runs of strings, delimited by offsets, into one string each."""
+    lists = pa.ListArray.from_arrays(pa.array(offsets, pa.int32()), values)
+    return pc.binary_join(lists, separator)
+
+
+class TextEngine:
+    """
+    Generate batches of sentences and paragraphs from a word list.
+
+    A sentence is a capitalized first word, further words and a full stop,
+    the same template Faker's lorem provider uses, so the output reads like
+    fake.sentence() and fake.paragraph().
+    """
+
+    def __init__(self, words: Sequence[str]):
+        """
+        Initialize the engine.
+
+        Args:
+            words: Vocabulary sentences are drawn from
+        """
+        words = list(words)
+        self.n_words = len(words)
+        # Capitalized forms follow the plain words, so a sentence's first
+        # word is picked by offsetting its index
+        self.tokens = pa.array(words + [word.capitalize() for word in words], pa.string())
+
+    @classmethod
+    def from_faker(cls, fake: Faker) -> 'TextEngine':
+        """Build an engine over the lorem word list of a Faker instance's locale."""
+        return cls(fake.get_words_list())
+
+    def sentences(
+        self,
+        rng: np.random.Generator,
+        n: int,
+        min_words: int = 4,
+        max_words: int = 8,
+        end: str = '.'
+    ) -> pa.Array:
+        """
+        Generate a batch of sentences.
+
+        Args:
+            rng: NumPy random generator to draw from
+            n: Number of sentences
+            min_words: Minimum number of words per sentence
+            max_words: Maximum number of words per sentence
+            end: Text appended to every sentence
+
+        Returns:
+            Arrow string array of n sentences
+        """
+        lengths = rng.integers(min_words, max_words, size=n, endpoint=True)
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+
+        indices = rng.integers(self.n_words, size=int(offsets[-1]))
+        indices[offsets[:-1]] += self.n_words
+        text = _join(offsets, self.tokens.take(indices), ' ')
+        return pc.binary_join_element_wise(text, end, '') if end else text
+
+    def paragraphs(
+        self,
+        rng: np.random.Generator,
+        n: int,
+        min_sentences: int = 2,
+        max_sentences: int = 4,
+        min_words: int = 4,
+        max_words: int = 8
+    ) -> pa.Array:
+        """
+        Generate a batch of paragraphs.
+
+        Args:
+            rng: NumPy random generator to draw from
+            n: Number of paragraphs
+            min_sentences: Minimum number of sentences per paragraph
+            max_sentences: Maximum number of sentences per paragraph
+            min_words: Minimum number of words per sentence
+            max_words: Maximum number of words per sentence
+
+        Returns:
+            Arrow string array of n paragraphs
+        """
+        counts = rng.integers(min_sentences, max_sentences, size=n, endpoint=True)
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        sentences = self.sentences(rng, int(offsets[-1]), min_words, max_words)
+        return _join(offsets, sentences, ' ')
+
+    def optional_sentences(self, rng: np.random.Generator, present: np.ndarray, **kwargs) -> pa.Array:
+        """
+        Generate sentences for the rows where present is set and nulls elsewhere.
+
+        Args:
+            rng: NumPy random generator to draw from
+            present: Boolean mask of the rows that get a sentence
+            **kwargs: Length options passed to sentences()
+
+        Returns:
+            Arrow string array with one value per row of the mask
+        """
+        sentences = self.sentences(rng, int(present.sum()), **kwargs)
+        indices = np.cumsum(present) - 1
+        return sentences.take(pa.array(indices, mask=~present))
+
+
+def phrase_choices(rng: np.random.Generator, phrase_sets: List[Sequence[str]], labels: np.ndarray) -> pa.Array:
+    """
+    Pick one phrase per row from the phrase set selected by its label.
+
+    Args:
+        rng: NumPy random generator to draw from
+        phrase_sets: Phrase lists, indexed by label
+        labels: Phrase set of each row
+
+    Returns:
+        Arrow string array with one phrase per row
+    """
+    sizes = np.array([len(phrases) for phrases in phrase_sets])
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    phrases = pa.array([phrase for phrases in phrase_sets for phrase in phrases], pa.string())
+    indices = starts[labels] + (rng.random(len(labels)) * sizes[labels]).astype(np.int64)
+    return phrases.take(indices)
@@ -2,14 +2,73 @@
 Data writers for PostgreSQL and Parquet output formats.
 """
 
+import copy
+import io
+import multiprocessing
 import os
+import queue
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from sqlalchemy import create_engine
+
+from . import config
+from .checkpoint import temporary_path
+from .parquet_options import ParquetOptions
+from .partitioning import OrderPartitions, PartitionedDataset, clear_dataset, partition_keys
+from .schema import (
+    FOREIGN_KEYS, TABLE_SCHEMAS, BatchData, get_schema, postgres_create_enum_types, postgres_create_table,
+    postgres_drop_keys, postgres_foreign_keys, postgres_indexes, postgres_primary_key, to_arrow_table
+)
+
+# Subdirectory of the Parquet directory holding shard part files until they are merged
+SHARD_DIR = '_shards'
 
 
 class DataWriter:
-    """Abstraction for writing data to PostgreSQL or Parquet files."""
+    """
+    Abstraction for writing data to PostgreSQL or Parquet files.
+    
+    By default batches are written inline. With writer_threads > 0 they are
+    put on bounded queues instead and written by background threads, so
+    generation continues while Parquet encoding or COPY runs (both release
+    the GIL). Each table is always written by the same thread, through a
+    copy of the writer of its own, so its batches keep their order; flush
+    and close wait for the queues to drain.
+    
+    For PostgreSQL every thread loads over a connection of its own, so the
+    threads form a pool of connections loading tables concurrently. The
+    batches of the large tables in config.POSTGRES_CHUNKED_TABLES are
+    spread over all threads as chunks that are COPY'd in parallel, since
+    the order of rows within a table doesn't matter there.
+    
+    Parquet files are written under a hidden temporary name and renamed
+    when they are closed, so a run that is killed never leaves a partly
+    written file under a table's name.
+    """
     
-    def __init__(self, output_type: str, engine=None, parquet_dir: str = None):
+    def __init__(
+        self,
+        output_type: str,
+        engine=None,
+        parquet_dir: str = None,
+        pg_enums: bool = False,
+        writer_threads: int = 0,
+        pg_staging: bool = False,
+        pg_connections: int = 0,
+        partition_by: Optional[str] = None,
+        partition_file_size: int = config.PARTITION_FILE_SIZE,
+        parquet_options: Optional[ParquetOptions] = None,
+        table_parquet_options: Optional[Dict[str, ParquetOptions]] = None
+    ):
         """
         Initialize the DataWriter.
         
@@ -17,49 +76,107 @@ class DataWriter:
             output_type: Either 'postgres' or 'parquet'
             engine: SQLAlchemy engine (required for postgres)
             parquet_dir: Directory path for parquet files (required for parquet)
+            pg_enums: Create PostgreSQL enum types for the dictionary-encoded
+                columns instead of loading them as TEXT
+            writer_threads: Number of background threads writing batches;
+                0 writes them inline
+            pg_staging: Create replaced PostgreSQL tables UNLOGGED, to be
+                keyed, indexed and made durable by finish_tables
+            pg_connections: Number of connections loading PostgreSQL tables
+                concurrently, one per background thread; overrides
+                writer_threads for PostgreSQL output if non-zero
+            partition_by: Write the tables in config.PARTITIONED_TABLES as
+                Hive-partitioned Parquet datasets, split by 'month' or
+                'customer'
+            partition_file_size: Target size of a partitioned dataset's
+                files in bytes
+            parquet_options: Encoding settings of the Parquet files
+            table_parquet_options: Encoding settings of particular tables,
+                replacing parquet_options for them
         """
         self.output_type = output_type
         self.engine = engine
         self.parquet_dir = parquet_dir
+        self.pg_enums = pg_enums
+        if output_type == 'postgres' and pg_connections:
+            writer_threads = pg_connections
+        self.writer_threads = writer_threads
+        self.pg_staging = pg_staging
+        self.partition_by = partition_by if output_type == 'parquet' else None
+        self.partition_file_size = partition_file_size
+        self.parquet_options = parquet_options or ParquetOptions()
+        self.table_parquet_options = dict(table_parquet_options or {})
         self.table_first_write = {}  # Track first write per table
+        self.parquet_writers = {}  # Open ParquetWriter per table
+        self.pending_row_groups = {}  # Batches collected into the next row group per table
+        self.datasets = {}  # Open PartitionedDataset per partitioned table
+        self._order_partitions = OrderPartitions()  # Partitions of the current order shard's orders
+        self.load_stats = {}  # Rows and seconds spent loading per table
+        self.connection_stats = {}  # Rows and seconds spent loading per connection
+        self._chunks = {}  # Number of batches handed out per PostgreSQL table
+        self._pg_connection = None  # Raw psycopg2 connection used for COPY
+        self.shard = None  # Shard index of a copy made by shard_writer
+        self._queues = []  # Bounded queue of each background thread
+        self._threads = []
+        self._thread_writers = []  # Writer each background thread writes through
+        self._write_error = None  # First exception raised by a background thread
         
         if output_type == 'parquet' and parquet_dir:
             os.makedirs(parquet_dir, exist_ok=True)
     
-    def write_batch(self, table_name: str, data: list) -> int:
+    def write_batch(self, table_name: str, data: BatchData) -> int:
         """
         Write a batch of data to the destination.
         
         Args:
             table_name: Name of the table/file
-            data: List of dictionaries containing the data
+            data: Columnar batch (mapping of column name to array, or a
+                pyarrow RecordBatch/Table), or a list of row dictionaries
             
         Returns:
             Number of rows written
         """
-        if not data:
+        table = to_arrow_table(table_name, data)
+        if table.num_rows == 0:
             return 0
         
-        df = pd.DataFrame(data)
-        
         if self.output_type == 'postgres':
-            is_first = table_name not in self.table_first_write
-            if_exists = 'replace' if is_first else 'append'
-            df.to_sql(table_name, self.engine, if_exists=if_exists, index=False)
-            self.table_first_write[table_name] = True
-        else:  # parquet
-            file_path = os.path.join(self.parquet_dir, f"{table_name}.parquet")
-            if table_name not in self.table_first_write:
-                # First write - create new file
-                df.to_parquet(file_path, index=False, engine='pyarrow')
-                self.table_first_write[table_name] = True
+            chunk = self._chunks.get(table_name, 0)
+            self._chunks[table_name] = chunk + 1
+            if self.writer_threads:
+                self._enqueue(table_name, '_load_chunk', table, chunk)
             else:
-                # Append to existing file
-                existing_df = pd.read_parquet(file_path)
-                combined_df = pd.concat([existing_df, df], ignore_index=True)
-                combined_df.to_parquet(file_path, index=False, engine='pyarrow')
+                self._load_chunk(table_name, table, chunk)
+        elif self._is_partitioned(table_name):
+            keys = partition_keys(table_name, table, self.partition_by)
+            if keys is None:
+                keys = self._order_partitions.lookup(table['order_id'].to_numpy())
+            if self.writer_threads:
+                self._enqueue(table_name, '_write_partitions', table, keys)
+            else:
+                self._write_partitions(table_name, table, keys)
+        elif self.writer_threads:
+            self._enqueue(table_name, 'write_batch', table)
+        else:  # parquet
+            self._append_row_group(table_name, table)
         
-        return len(df)
+        return table.num_rows
+    
+    def _load_chunk(self, table_name: str, table: pa.Table, chunk: int):
+        """
+        COPY one batch of a table into PostgreSQL, creating the table with
+        its first batch. A failure is raised with the table and chunk.
+        """
+        is_first = table_name not in self.table_first_write
+        try:
+            self._copy_table(table_name, table, create_table=is_first)
+        except Exception as error:
+            shard = f" of shard {self.shard}" if self.shard is not None else ""
+            raise RuntimeError(
+                f"Loading chunk {chunk}{shard} of table '{table_name}' ({table.num_rows:,} rows) "
+                f"failed on connection {self._connection_name()}: {error}"
+            ) from error
+        self.table_first_write[table_name] = True
     
     def write_dataframe(self, table_name: str, df: pd.DataFrame) -> int:
         """
@@ -72,12 +189,755 @@ class DataWriter:
         Returns:
             Number of rows written
         """
-        if self.output_type == 'postgres':
-            df.to_sql(table_name, self.engine, if_exists='replace', index=False)
+        table = to_arrow_table(table_name, df)
+        
+        if self.writer_threads:
+            self._enqueue(table_name, 'write_dataframe', table)
+        elif self.output_type == 'postgres':
+            self._copy_table(table_name, table, create_table=True)
         else:  # parquet
             file_path = os.path.join(self.parquet_dir, f"{table_name}.parquet")
-            df.to_parquet(file_path, index=False, engine='pyarrow')
+            options = self.options_for(table_name)
+            with options.open_writer(temporary_path(file_path), table.schema) as pq_writer:
+                self._write_row_groups(pq_writer, options, table, final=True)
+            os.replace(temporary_path(file_path), file_path)
         
         self.table_first_write[table_name] = True
+        return table.num_rows
+    
+    def _append_row_group(self, table_name: str, table: pa.Table):
+        """
+        Append a batch to a table's Parquet file as a new row group.
+        
+        The file is opened with the table's registered schema on the first
+        batch and kept open, so each append only encodes the new rows instead
+        of re-reading the whole file.
+        
+        With a target row group size, batches are collected until they fill
+        a row group. Shard part files always get one row group per batch and
+        default settings; merging them applies the table's options, so the
+        final file doesn't depend on how the table was sharded.
+        """
+        options = self.options_for(table_name) if self.shard is None else ParquetOptions()
+        pq_writer = self.parquet_writers.get(table_name)
+        if pq_writer is None:
+            file_path = self._file_path(table_name)
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            pq_writer = options.open_writer(temporary_path(file_path), get_schema(table_name))
+            self.parquet_writers[table_name] = pq_writer
+            self.table_first_write[table_name] = True
+        
+        if not options.groups_rows:
+            pq_writer.write_table(options.sort(table))
+            return
+        pending = self.pending_row_groups.setdefault(table_name, [])
+        pending.append(table)
+        num_rows = sum(t.num_rows for t in pending)
+        if options.row_group_full(num_rows, sum(t.nbytes for t in pending)):
+            # Filled by size in bytes, the collected rows make one row group
+            by_bytes = options.row_group_rows is None or num_rows < options.row_group_rows
+            rest = self._write_row_groups(pq_writer, options, pa.concat_tables(pending), final=by_bytes)
+            self.pending_row_groups[table_name] = [rest] if rest.num_rows else []
+    
+    def options_for(self, table_name: str) -> ParquetOptions:
+        """Return the Parquet encoding settings of a table."""
+        return self.table_parquet_options.get(table_name, self.parquet_options)
+    
+    @staticmethod
+    def _write_row_groups(
+        pq_writer: pq.ParquetWriter,
+        options: ParquetOptions,
+        table: pa.Table,
+        final: bool = False
+    ) -> pa.Table:
+        """
+        Write rows as row groups of row_group_rows rows, each sorted if
+        sort_by is set, and return the rows too few to fill another group;
+        with final, or without a row count target, every row is written.
+        """
+        table = table.combine_chunks()
+        size = options.row_group_rows or max(table.num_rows, 1)
+        stop = table.num_rows if final else table.num_rows - table.num_rows % size
+        for start in range(0, stop, size):
+            pq_writer.write_table(options.sort(table.slice(start, min(size, stop - start))))
+        return table.slice(stop)
+    
+    def _is_partitioned(self, table_name: str) -> bool:
+        # Shard writers write plain part files, which merge_shard partitions
+        return self.partition_by is not None and self.shard is None and table_name in config.PARTITIONED_TABLES
+    
+    def index_orders(self, orders: pa.Table, part: int):
+        """
+        Remember the partition of each order of a shard, so that the rows
+        derived from the orders are partitioned alike even if they lack the
+        partition column. Does nothing unless this writer partitions tables.
+        
+        Must be called with every block of orders before its derived rows
+        are written. Orders of a new shard replace the previous shard's.
+        
+        Args:
+            orders: Block of orders
+            part: Index of the order shard
+        """
+        if not self._is_partitioned('orders'):
+            return
+        keys = partition_keys('orders', orders, self.partition_by)
+        self._order_partitions.add(orders['order_id'].to_numpy(), keys, part)
+    
+    def _write_partitions(self, table_name: str, table: pa.Table, keys: np.ndarray):
+        """Write a batch to a table's partitioned dataset, replacing an old dataset first."""
+        dataset = self.datasets.get(table_name)
+        if dataset is None:
+            table_dir = os.path.join(self.parquet_dir, table_name)
+            if table_name not in self.table_first_write:
+                clear_dataset(table_dir)
+                self.table_first_write[table_name] = True
+            dataset = PartitionedDataset(
+                table_name, table_dir, self.partition_by, self.partition_file_size, self.options_for(table_name)
+            )
+            self.datasets[table_name] = dataset
+        dataset.write(table, keys)
+    
+    def _file_path(self, table_name: str) -> str:
+        """Return the path of the Parquet file this writer writes a table to."""
+        if self.shard is None:
+            return os.path.join(self.parquet_dir, f"{table_name}.parquet")
+        return self._shard_path(table_name, self.shard)
+    
+    def _shard_path(self, table_name: str, shard: int) -> str:
+        """Return the path of a table's part file for one shard."""
+        return os.path.join(self.parquet_dir, SHARD_DIR, f"{table_name}-{shard:05d}.parquet")
+    
+    def shard_writer(self, shard: int) -> 'DataWriter':
+        """
+        Return a copy of the writer for one shard of a sharded table.
+        
+        For Parquet the copy writes every table to a part file of its own,
+        which merge_shard later appends to the table's file. For PostgreSQL
+        it loads straight into the tables created by prepare_tables, over a
+        connection of its own.
+        
+        Args:
+            shard: Index of the shard
+            
+        Returns:
+            DataWriter for the shard
+        """
+        writer = copy.copy(self)
+        writer.shard = shard
+        return writer
+    
+    def prepare_tables(self, table_names: Iterable[str], replace: bool = True):
+        """
+        Create empty PostgreSQL tables up front, so that several writers can
+        load into them concurrently. For Parquet, clear the datasets of the
+        partitioned tables instead, which merge_shard then writes to.
+        
+        Args:
+            table_names: Names of the tables to create
+            replace: Drop existing tables first; otherwise existing tables
+                are kept and appended to
+        """
+        if self.output_type == 'parquet' and self.partition_by is not None:
+            self.flush()
+            for table_name in table_names:
+                if not self._is_partitioned(table_name):
+                    continue
+                if replace:
+                    clear_dataset(os.path.join(self.parquet_dir, table_name))
+                for writer in [self] + self._thread_writers:
+                    writer.table_first_write[table_name] = True
+            return
+        if self.output_type != 'postgres':
+            return
+        
+        # Queued writes to the tables go first
+        self.flush()
+        self._create_tables(table_names, replace)
+    
+    def _create_tables(self, table_names: Iterable[str], replace: bool = True):
+        """Create PostgreSQL tables and mark them created for every thread's writer."""
+        if self._pg_connection is None:
+            self._pg_connection = self.engine.raw_connection()
+        try:
+            with self._pg_connection.cursor() as cursor:
+                for table_name in table_names:
+                    self._create_table(cursor, table_name, replace)
+            self._pg_connection.commit()
+        except Exception:
+            self._pg_connection.rollback()
+            raise
+        
+        for writer in [self] + self._thread_writers:
+            for table_name in table_names:
+                writer.table_first_write[table_name] = True
+    
+    def _create_table(self, cursor, table_name: str, replace: bool = True):
+        """Create a PostgreSQL table, and the enum types it uses if enabled."""
+        if replace:
+            cursor.execute(f'DROP TABLE IF EXISTS "{table_name}" CASCADE')
+        if self.pg_enums:
+            for statement in postgres_create_enum_types(table_name):
+                cursor.execute(statement)
+        cursor.execute(postgres_create_table(
+            table_name, if_not_exists=not replace, enums=self.pg_enums, unlogged=self.pg_staging and replace
+        ))
+    
+    def merge_shard(self, shard: int, table_names: Iterable[str]):
+        """
+        Append a shard's part files to the tables' Parquet files. Row groups
+        are copied one at a time, so merging never holds more than one row
+        group in memory. Does nothing for PostgreSQL output.
+        
+        Partitioned tables are split into their datasets as they are merged,
+        so every partition keeps one file open across all shards instead of
+        starting small files for each shard.
+        
+        Shards must be merged in shard order. Each part file is removed once
+        merged, so the part files never hold a second copy of the tables; a
+        run interrupted before the tables are closed generates the merged
+        shards again.
+        
+        Args:
+            shard: Index of the shard
+            table_names: Names of the tables the shard wrote
+        """
+        if self.output_type != 'parquet':
+            return
+        
+        for table_name in table_names:
+            if self.writer_threads and not self._is_partitioned(table_name):
+                self._enqueue(table_name, '_merge_shard_table', shard)
+            else:
+                self._merge_shard_table(table_name, shard)
+    
+    def _merge_shard_table(self, table_name: str, shard: int):
+        """
+        Append one table's part file of a shard to its Parquet file, or
+        write it to its dataset. The orders must be merged before the tables
+        derived from them, which are partitioned by their order.
+        """
+        path = self._shard_path(table_name, shard)
+        if not os.path.exists(path):
+            return
+        part = pq.ParquetFile(path)
+        for i in range(part.num_row_groups):
+            table = to_arrow_table(table_name, part.read_row_group(i))
+            if not self._is_partitioned(table_name):
+                self._append_row_group(table_name, table)
+                continue
+            if table_name == 'orders':
+                self.index_orders(table, shard)
+            self.write_batch(table_name, table)
+        part.close()
+        os.remove(path)
+    
+    def remove_shard_files(self):
+        """Remove the shard directory, with the part files of shards an interrupted run left unmerged."""
+        if self.output_type == 'parquet' and self.shard is None:
+            shutil.rmtree(os.path.join(self.parquet_dir, SHARD_DIR), ignore_errors=True)
+    
+    def discard_rows(self, id_ranges: Dict[str, List[Tuple[int, Optional[int]]]]):
+        """
+        Remove the rows an interrupted run left behind in tables that are
+        appended to, so they can be written again.
+        
+        From PostgreSQL tables the rows whose ID (the table's first column)
+        falls in one of the ranges are deleted. Parquet files and datasets
+        are always rewritten as a whole, so nothing is removed from them.
+        
+        Args:
+            id_ranges: (start, stop) ID ranges of each table, end-exclusive;
+                a stop of None is open-ended
+        """
+        if self.output_type != 'postgres':
+            return
+        
+        self.flush()
+        statements = []
+        for table_name, ranges in id_ranges.items():
+            column = get_schema(table_name).names[0]
+            for start, stop in ranges:
+                condition = f'"{column}" >= {start}' + (f' AND "{column}" < {stop}' if stop is not None else '')
+                statements.append(f'DELETE FROM "{table_name}" WHERE {condition}')
+        self._execute_concurrently(statements, 1)
+    
+    def table_row_counts(self, table_names: Iterable[str]) -> Dict[str, int]:
+        """
+        Count the rows of PostgreSQL tables; a missing table has none.
+        
+        Args:
+            table_names: Names of the tables
+            
+        Returns:
+            Dict mapping each table to its row count
+        """
+        self.flush()
+        counts = {}
+        connection = self.engine.raw_connection()
+        try:
+            with connection.cursor() as cursor:
+                for table_name in table_names:
+                    cursor.execute('SELECT to_regclass(%s)', (f'"{table_name}"',))
+                    if cursor.fetchone()[0] is None:
+                        counts[table_name] = 0
+                        continue
+                    cursor.execute(f'SELECT count(*) FROM "{table_name}"')
+                    counts[table_name] = cursor.fetchone()[0]
+        finally:
+            connection.close()
+        return counts
+    
+    def _enqueue(self, table_name: str, method: str, *args):
+        """
+        Hand a write to the background thread that owns the table, blocking
+        while its queue is full. Raises the error of a failed earlier write.
+        
+        Chunks of the tables in config.POSTGRES_CHUNKED_TABLES go to the
+        threads in turn instead. Their table is created here first, so no
+        thread copies into it before it exists.
+        """
+        if not self._threads:
+            self._start_threads()
+        self._raise_write_error()
+        index = list(TABLE_SCHEMAS).index(table_name)
+        if method == '_load_chunk' and table_name in config.POSTGRES_CHUNKED_TABLES:
+            if table_name not in self.table_first_write:
+                self._create_tables([table_name])
+            index += args[1]
+        self._queues[index % self.writer_threads].put((method, table_name, args))
+    
+    def _start_threads(self):
+        """Start the background threads, each with a queue and a writer of its own."""
+        for index in range(self.writer_threads):
+            thread_writer = copy.copy(self)
+            thread_writer.writer_threads = 0
+            work = queue.Queue(maxsize=config.WRITE_QUEUE_SIZE)
+            thread = threading.Thread(
+                target=self._drain, args=(work, thread_writer), name=f'writer-{index}', daemon=True
+            )
+            thread.start()
+            self._queues.append(work)
+            self._threads.append(thread)
+            self._thread_writers.append(thread_writer)
+    
+    def _drain(self, work: queue.Queue, writer: 'DataWriter'):
+        """
+        Write queued batches until the stop sentinel arrives. After a write
+        fails the rest are discarded, so producers never block on a full
+        queue, and the error is raised to them instead.
+        """
+        while True:
+            item = work.get()
+            try:
+                if item is None:
+                    return
+                method, table_name, args = item
+                if self._write_error is None:
+                    getattr(writer, method)(table_name, *args)
+            except BaseException as error:
+                if self._write_error is None:
+                    self._write_error = error
+            finally:
+                work.task_done()
+    
+    def _raise_write_error(self):
+        if self._write_error is not None:
+            raise self._write_error
+    
+    def flush(self):
+        """
+        Wait until every queued write has been written. Raises the error of
+        a failed background write. Does nothing for inline writes.
+        """
+        for work in self._queues:
+            work.join()
+        self._raise_write_error()
+    
+    def finish_tables(self, table_names: Iterable[str], jobs: int = 4) -> Dict[str, float]:
+        """
+        Build the keys, constraints and indexes of freshly loaded PostgreSQL
+        tables, then make them durable. Does nothing for Parquet output.
+        Keys and indexes left behind by an interrupted earlier call are
+        dropped first, so this can be run again.
+        
+        Loading into bare UNLOGGED tables (see pg_staging) and building
+        everything afterwards is much faster than maintaining indexes and
+        checking constraints row by row during COPY. Each phase runs over up
+        to jobs connections at once:
+        
+        1. primary keys, one table per connection
+        2. secondary indexes
+        3. foreign keys, added NOT VALID and then validated
+        4. SET LOGGED, referenced tables before the tables referencing them
+        5. ANALYZE
+        
+        Args:
+            table_names: Names of the loaded tables
+            jobs: Number of connections working concurrently
+            
+        Returns:
+            Seconds spent in each phase
+        """
+        if self.output_type != 'postgres':
+            return {}
+        
+        self.flush()
+        table_names = [name for name in TABLE_SCHEMAS if name in set(table_names)]
+        foreign_keys = postgres_foreign_keys(table_names)
+        # Each phase is a list of (statements, connections) steps run one after another. Adding a foreign key
+        # locks both tables but takes no time, so the keys are added on one connection and validated on many
+        phases = [
+            ('primary keys', [
+                (postgres_drop_keys(table_names), 1),
+                ([postgres_primary_key(name) for name in table_names], jobs),
+            ]),
+            ('indexes', [(postgres_indexes(table_names), jobs)]),
+            ('foreign keys', [
+                ([add for _, add, _ in foreign_keys], 1),
+                ([validate for _, _, validate in foreign_keys], jobs),
+            ]),
+        ]
+        if self.pg_staging:
+            phases.append(('set logged', [
+                ([f'ALTER TABLE "{name}" SET LOGGED' for name in wave], jobs)
+                for wave in self._logged_waves(table_names)
+            ]))
+        phases.append(('analyze', [([f'ANALYZE "{name}"' for name in table_names], jobs)]))
+        
+        phase_stats = {}
+        for phase, steps in phases:
+            start = time.perf_counter()
+            for statements, connections in steps:
+                self._execute_concurrently(statements, connections)
+            phase_stats[phase] = time.perf_counter() - start
+        return phase_stats
+    
+    @staticmethod
+    def _logged_waves(table_names: List[str]) -> List[List[str]]:
+        """
+        Group tables into waves that can be set LOGGED together: a logged
+        table may not reference an unlogged one, so every table comes after
+        the tables it references.
+        """
+        references = {name: set() for name in table_names}
+        for table_name, _, referenced in FOREIGN_KEYS:
+            if table_name in references and referenced in references and referenced != table_name:
+                references[table_name].add(referenced)
+        
+        waves, done = [], set()
+        while len(done) < len(table_names):
+            wave = [name for name in table_names if name not in done and references[name] <= done]
+            waves.append(wave)
+            done.update(wave)
+        return waves
+    
+    def _execute_concurrently(self, statements: List[str], jobs: int):
+        """
+        Run statements over up to jobs connections of their own, each
+        statement committed on its own. Statements that lock the same table
+        wait for each other in PostgreSQL.
+        """
+        pending = queue.Queue()
+        for statement in statements:
+            pending.put(statement)
+        
+        def work():
+            connection = self.engine.raw_connection()
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute(f"SET maintenance_work_mem = '{config.POSTGRES_MAINTENANCE_WORK_MEM}'")
+                    while True:
+                        try:
+                            statement = pending.get_nowait()
+                        except queue.Empty:
+                            return
+                        cursor.execute(statement)
+                        connection.commit()
+            finally:
+                connection.close()
+        
+        workers = min(jobs, len(statements))
+        if workers == 0:
+            return
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for future in [pool.submit(work) for _ in range(workers)]:
+                future.result()
+    
+    def add_load_stats(
+        self,
+        load_stats: Dict[str, Tuple[int, float]],
+        connection_stats: Dict[str, Tuple[int, float]] = None
+    ):
+        """Add the per-table and per-connection load statistics of a copy of the writer to this writer's."""
+        for stats, added in [(self.load_stats, load_stats), (self.connection_stats, connection_stats or {})]:
+            for key, (rows, seconds) in added.items():
+                total_rows, total_seconds = stats.get(key, (0, 0.0))
+                stats[key] = (total_rows + rows, total_seconds + seconds)
+    
+    def _copy_table(self, table_name: str, table: pa.Table, create_table: bool):
+        """
+        Bulk load a batch into PostgreSQL with COPY FROM STDIN.
+        
+        The rows are serialized as CSV into an in-memory buffer and streamed
+        over the psycopg2 connection behind the SQLAlchemy engine, which is
+        far faster than the row-by-row INSERTs issued by DataFrame.to_sql.
+        
+        Args:
+            table_name: Name of the table
+            table: Arrow table to load
+            create_table: Drop and recreate the table from its registered
+                schema before loading
+        """
+        start = time.perf_counter()
+        
+        # Nulls are written unquoted and empty, which COPY's CSV format reads as NULL
+        buffer = io.BytesIO()
+        pa_csv.write_csv(table, buffer, pa_csv.WriteOptions(include_header=False))
+        buffer.seek(0)
+        
+        columns = ', '.join(f'"{column}"' for column in table.column_names)
+        sql = f'COPY "{table_name}" ({columns}) FROM STDIN WITH (FORMAT csv)'
+        
+        if self._pg_connection is None:
+            self._pg_connection = self.engine.raw_connection()
+        try:
+            with self._pg_connection.cursor() as cursor:
+                if create_table:
+                    self._create_table(cursor, table_name)
+                cursor.copy_expert(sql, buffer)
+            self._pg_connection.commit()
+        except Exception:
+            self._pg_connection.rollback()
+            raise
+        
+        seconds = time.perf_counter() - start
+        for stats, key in [(self.load_stats, table_name), (self.connection_stats, self._connection_name())]:
+            total_rows, total_seconds = stats.get(key, (0, 0.0))
+            stats[key] = (total_rows + table.num_rows, total_seconds + seconds)
+    
+    @staticmethod
+    def _connection_name() -> str:
+        """Name the connection of the calling thread by its process and thread."""
+        return f'{multiprocessing.current_process().name}/{threading.current_thread().name}'
+    
+    def close(self):
+        """
+        Write everything still queued, stop the background threads and close
+        all open Parquet files and database connections. If a background
+        write failed, the writer is aborted instead and the error raised, so
+        no Parquet file is published with rows missing.
+        """
+        self._stop_threads()
+        if self._write_error is not None:
+            self.abort()
+            raise self._write_error
+        
+        for table_name in list(self.parquet_writers) + list(self.datasets):
+            self._close_table(table_name)
+        
+        if self._pg_connection is not None:
+            self._pg_connection.close()
+            self._pg_connection = None
+    
+    def abort(self):
+        """
+        Stop the background threads, discarding the writes still queued, and
+        close all files and connections without publishing anything: Parquet
+        files being written are deleted instead of renamed to their final
+        names, and PostgreSQL work not yet committed is rolled back. Used
+        when generation or a write failed.
+        """
+        self._stop_threads(abort=True)
+        
+        for table_name, pq_writer in self.parquet_writers.items():
+            try:
+                pq_writer.close()
+            except Exception:
+                pass  # The file is deleted anyway
+            tmp_path = temporary_path(self._file_path(table_name))
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self.parquet_writers = {}
+        self.pending_row_groups = {}
+        
+        for dataset in self.datasets.values():
+            dataset.abort()
+        self.datasets = {}
+        
+        if self._pg_connection is not None:
+            self._pg_connection.close()
+            self._pg_connection = None
+    
+    def _stop_threads(self, abort: bool = False):
+        """
+        Stop the background threads once their queues are drained, and close
+        their writers; with abort, or after a failed write, the queued writes
+        are discarded and the writers aborted.
+        """
+        if not self._threads:
+            return
+        for work in self._queues:
+            while abort:
+                try:
+                    work.get_nowait()
+                except queue.Empty:
+                    break
+                work.task_done()
+            work.put(None)
+        for thread in self._threads:
+            thread.join()
+        
+        for thread_writer in self._thread_writers:
+            if abort or self._write_error is not None:
+                thread_writer.abort()
+                continue
+            try:
+                thread_writer.close()
+            except BaseException as error:
+                self._write_error = error
+                thread_writer.abort()
+                continue
+            self.add_load_stats(thread_writer.load_stats, thread_writer.connection_stats)
+            self.table_first_write.update(thread_writer.table_first_write)
+        self._queues, self._threads, self._thread_writers = [], [], []
+    
+    def close_tables(self, table_names: Iterable[str]):
+        """
+        Write everything still queued or held back for some tables and close
+        their Parquet files, publishing them under their final names. Does
+        nothing for PostgreSQL output.
+        
+        Args:
+            table_names: Names of the tables to close
+        """
+        if self.output_type != 'parquet':
+            return
+        for table_name in table_names:
+            if self.writer_threads:
+                self._enqueue(table_name, '_close_table')
+            else:
+                self._close_table(table_name)
+        self.flush()
+    
+    def _close_table(self, table_name: str):
+        """Close a table's Parquet file or dataset, renaming the file to its final name."""
+        pq_writer = self.parquet_writers.pop(table_name, None)
+        if pq_writer is not None:
+            pending = self.pending_row_groups.pop(table_name, [])
+            if pending:
+                self._write_row_groups(pq_writer, self.options_for(table_name), pa.concat_tables(pending), final=True)
+            pq_writer.close()
+            file_path = self._file_path(table_name)
+            os.replace(temporary_path(file_path), file_path)
+        
+        dataset = self.datasets.pop(table_name, None)
+        if dataset is not None:
+            dataset.close()
+    
+    def __getstate__(self):
+        """
+        Pickle the writer's configuration only, e.g. to hand it to a worker
+        process. Open files and connections are not carried over; the copy
+        opens its own, and a SQLAlchemy engine is recreated from its URL.
+        The tables already created are carried over, so a copy appends to
+        them instead of recreating them. Background threads are not carried
+        over either; a copy starts its own on its first write.
+        """
+        state = self.__dict__.copy()
+        state['engine'] = self.engine.url if self.engine is not None else None
+        state['table_first_write'] = dict(self.table_first_write)
+        state['parquet_writers'] = {}
+        state['pending_row_groups'] = {}
+        state['datasets'] = {}
+        state['_order_partitions'] = OrderPartitions()
+        state['load_stats'] = {}
+        state['connection_stats'] = {}
+        state['_chunks'] = {}
+        state['_pg_connection'] = None
+        state['_queues'] = []
+        state['_threads'] = []
+        state['_thread_writers'] = []
+        state['_write_error'] = None
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.engine is not None:
+            self.engine = create_engine(self.engine)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+
+
+class NullWriter(DataWriter):
+    """
+    Writer that discards everything it is given, for regenerating the
+    tables a row slice depends on without writing them again.
+    """
+    
+    def __init__(self):
+        super().__init__('null')
+    
+    def write_batch(self, table_name: str, data: BatchData) -> int:
+        return to_arrow_table(table_name, data).num_rows
+    
+    def write_dataframe(self, table_name: str, df: pd.DataFrame) -> int:
         return len(df)
 
+
+class BlockBuffer:
+    """
+    Collects independently generated blocks of one table and writes them in
+    batches of BATCH_SIZE rows, so the batches written do not depend on the
+    size of the blocks.
+    """
+    
+    def __init__(self, table_name: str):
+        """
+        Initialize an empty buffer.
+        
+        Args:
+            table_name: Name of the table the buffer is written to
+        """
+        self.table_name = table_name
+        self.tables = []
+        self.num_rows = 0
+    
+    def add(self, writer: DataWriter, data: BatchData) -> int:
+        """
+        Add a block and write every full batch.
+        
+        Args:
+            writer: DataWriter instance
+            data: Block in any form DataWriter.write_batch accepts
+            
+        Returns:
+            Number of rows written
+        """
+        table = to_arrow_table(self.table_name, data)
+        self.tables.append(table)
+        self.num_rows += table.num_rows
+        
+        written = 0
+        while self.num_rows >= config.BATCH_SIZE:
+            written += self._write(writer, config.BATCH_SIZE)
+        return written
+    
+    def flush(self, writer: DataWriter) -> int:
+        """Write the remaining rows as a final, possibly short, batch."""
+        return self._write(writer, self.num_rows) if self.num_rows else 0
+    
+    def _write(self, writer: DataWriter, num_rows: int) -> int:
+        combined = pa.concat_tables(self.tables)
+        rest = combined.slice(num_rows)
+        self.tables = [rest] if rest.num_rows else []
+        self.num_rows = rest.num_rows
+        # One chunk per column, so a batch is encoded the same however it was assembled
+        return writer.write_batch(self.table_name, combined.slice(0, num_rows).combine_chunks())
@@ -0,0 +1,128 @@
+"""
+Benchmark Parquet encoding settings.
+
+Generates a size preset once, then rewrites every table through DataWriter
+with each encoding setting and reports the write throughput (MB/s of
+uncompressed Arrow data) and the size on disk, overall and for the largest
+tables.
+
+Run with: uv run scripts/bench_parquet.py [--preset default] [--workdir DIR]
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import pyarrow.parquet as pq
+
+from faker_ecommerce import config
+from faker_ecommerce.dates import default_as_of
+from faker_ecommerce.parquet_options import ParquetOptions
+from faker_ecommerce.pipeline import run_pipeline
+from faker_ecommerce.schema import TABLE_SCHEMAS
+from faker_ecommerce.writers import DataWriter
+
+# Tables reported on their own besides the totals
+DETAIL_TABLES = ['orders', 'order_items', 'payments']
+
+# Settings compared, as (name, options for every table, options of particular tables)
+SETTINGS = [
+    ('snappy (default)', ParquetOptions(), {}),
+    ('none', ParquetOptions(codec='none'), {}),
+    ('lz4', ParquetOptions(codec='lz4'), {}),
+    ('zstd level 1', ParquetOptions(codec='zstd', level=1), {}),
+    ('zstd', ParquetOptions(codec='zstd'), {}),
+    ('zstd level 9', ParquetOptions(codec='zstd', level=9), {}),
+    ('zstd, 100k-row groups', ParquetOptions(codec='zstd', row_group_rows=100_000), {}),
+    ('zstd, 1M-row groups', ParquetOptions(codec='zstd', row_group_rows=1_000_000), {}),
+    ('zstd, 64 MB groups', ParquetOptions(codec='zstd', row_group_bytes=64 * 2**20), {}),
+    ('zstd, no dictionary', ParquetOptions(codec='zstd', dictionary=False), {}),
+    ('zstd, no statistics', ParquetOptions(codec='zstd', statistics=False), {}),
+    ('zstd, page index', ParquetOptions(codec='zstd', page_index=True), {}),
+    ('zstd, sorted, 100k-row groups', ParquetOptions(codec='zstd', row_group_rows=100_000), {
+        'orders': ParquetOptions(codec='zstd', row_group_rows=100_000, sort_by=('customer_id', 'order_date')),
+        'order_items': ParquetOptions(codec='zstd', row_group_rows=100_000, sort_by=('product_id',)),
+        'payments': ParquetOptions(codec='zstd', row_group_rows=100_000, sort_by=('payment_date',)),
+    }),
+]
+
+
+def parse_args():
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Benchmark Parquet encoding settings.")
+    parser.add_argument(
+        "--preset", choices=sorted(config.PRESETS), default='default',
+        help="Size preset to generate (default: default)"
+    )
+    parser.add_argument(
+        "--workdir", type=str,
+        help="Directory for the generated and rewritten files (default: a temporary directory)"
+    )
+    parser.add_argument("--seed", type=int, default=42, help="Master random seed (default: 42)")
+    return parser.parse_args()
+
+
+def generate(preset: str, directory: str, seed: int):
+    """Generate every table of a preset with default settings."""
+    params = dict(config.PRESETS[preset], as_of=default_as_of())
+    writer = DataWriter('parquet', parquet_dir=directory)
+    run_pipeline(params, writer, seed)
+    writer.close()
+
+
+def rewrite(tables: dict, directory: str, options: ParquetOptions, table_options: dict) -> dict:
+    """
+    Write every table in batches of BATCH_SIZE rows, as generation does.
+
+    Returns:
+        Dict mapping each table to (Arrow bytes, seconds, bytes on disk)
+    """
+    results = {}
+    for table_name, table in tables.items():
+        start = time.perf_counter()
+        writer = DataWriter(
+            'parquet', parquet_dir=directory, parquet_options=options, table_parquet_options=table_options
+        )
+        for offset in range(0, table.num_rows, config.BATCH_SIZE):
+            writer.write_batch(table_name, table.slice(offset, config.BATCH_SIZE))
+        writer.close()
+        seconds = time.perf_counter() - start
+        on_disk = os.path.getsize(os.path.join(directory, f"{table_name}.parquet"))
+        results[table_name] = (table.nbytes, seconds, on_disk)
+    return results
+
+
+def main():
+    args = parse_args()
+    workdir = args.workdir or tempfile.mkdtemp(prefix='bench_parquet_')
+    source_dir = os.path.join(workdir, 'source')
+
+    print(f"Generating the '{args.preset}' preset into {source_dir} ...")
+    config.SHOW_PROGRESS = False
+    generate(args.preset, source_dir, args.seed)
+    tables = {name: pq.read_table(os.path.join(source_dir, f"{name}.parquet")) for name in TABLE_SCHEMAS}
+    total_rows = sum(table.num_rows for table in tables.values())
+    print(f"{len(tables)} tables, {total_rows:,} rows, {sum(t.nbytes for t in tables.values()) / 2**20:,.0f} MB in Arrow\n")
+
+    header = f"{'setting':<32} {'MB/s':>8} {'total MB':>9}" + ''.join(f" {name + ' MB':>15}" for name in DETAIL_TABLES)
+    print(header)
+    print('-' * len(header))
+    for name, options, table_options in SETTINGS:
+        out_dir = os.path.join(workdir, 'out')
+        shutil.rmtree(out_dir, ignore_errors=True)
+        results = rewrite(tables, out_dir, options, table_options)
+
+        arrow_bytes = sum(result[0] for result in results.values())
+        seconds = sum(result[1] for result in results.values())
+        on_disk = sum(result[2] for result in results.values())
+        details = ''.join(f" {results[table][2] / 2**20:>15.1f}" for table in DETAIL_TABLES)
+        print(f"{name:<32} {arrow_bytes / 2**20 / seconds:>8.0f} {on_disk / 2**20:>9.1f}{details}")
+
+    if not args.workdir:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Tests for the weighted categorical sampler.
+
+Sampled frequencies over 100,000 draws with a fixed seed must match the
+configured weights within four standard errors of each proportion.
+"""
+
+import random
+
+import numpy as np
+import pytest
+
+from faker_ecommerce import sampling
+from faker_ecommerce.sampling import Categorical
+
+DRAWS = 100_000
+
+# Every distribution compiled at import
+DISTRIBUTIONS = {
+    name: value for name, value in vars(sampling).items() if isinstance(value, Categorical)
+}
+
+
+def assert_frequencies(distribution: Categorical, indices: np.ndarray):
+    """Check the share of each value among the drawn indices against its probability."""
+    counts = np.bincount(indices, minlength=len(distribution))
+    assert len(counts) == len(distribution)
+    shares = counts / len(indices)
+    p = distribution.probabilities
+    tolerance = 4 * np.sqrt(p * (1 - p) / len(indices)) + 1e-9
+    assert np.all(np.abs(shares - p) <= tolerance), (shares, p)
+
+
+@pytest.mark.parametrize('name', sorted(DISTRIBUTIONS))
+def test_indices_match_weights(name):
+    distribution = DISTRIBUTIONS[name]
+    assert_frequencies(distribution, distribution.indices(np.random.default_rng(42), DRAWS))
+
+
+@pytest.mark.parametrize('name', sorted(DISTRIBUTIONS))
+def test_draw_matches_weights(name):
+    distribution = DISTRIBUTIONS[name]
+    rnd = random.Random(42)
+    position = {value: i for i, value in enumerate(distribution.values.tolist())}
+    indices = np.array([position[distribution.draw(rnd)] for _ in range(DRAWS)])
+    assert_frequencies(distribution, indices)
+
+
+def test_sample_returns_values():
+    distribution = Categorical(['a', 'b', 'c'], [1, 0, 3])
+    values = distribution.sample(np.random.default_rng(7), DRAWS)
+    assert set(values.tolist()) == {'a', 'c'}
+    assert abs((values == 'c').mean() - 0.75) < 0.01
+
+
+def test_zero_weight_is_never_drawn():
+    distribution = Categorical([1, 2, 3], [0, 1, 0])
+    assert set(distribution.indices(np.random.default_rng(1), 1000).tolist()) == {1}
+    assert {distribution.draw(random.Random(1)) for _ in range(1000)} == {2}
+
+
+@pytest.mark.parametrize('values, weights', [
+    ([], None),
+    (['a', 'b'], [1]),
+    (['a', 'b'], [1, -1]),
+    (['a', 'b'], [0, 0]),
+])
+def test_invalid_weights(values, weights):
+    with pytest.raises(ValueError):
+        Categorical(values, weights)